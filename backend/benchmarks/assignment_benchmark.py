@@ -0,0 +1,175 @@
+"""Batch vehicle assignment for 10k pending reservations on 2k vehicles.
+
+Seeds a fleet across several locations and categories, some confirmed
+bookings, and pending reservations picked up at one location over a
+window, then runs POST /api/reservations/auto-assign on a SQLite file. The
+plan is compared with first-fit (the first free vehicle of the category, the
+way staff pick by hand) on vehicles used, relocations and idle time, and is
+checked afterwards in the database: every assignment matches the category
+and no vehicle holds two overlapping blocking reservations.
+
+Usage: python benchmarks/assignment_benchmark.py [--reservations N] [--vehicles N] [--days N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import make_app, db
+from src.models.user import User
+from src.models.customer import Customer
+from src.models.vehicle import VehicleCategory, Vehicle
+from src.models.location import Location
+from src.models.reservation import Reservation
+from src.services.assignment import plan_assignments, _load
+from src.services.availability import BLOCKING_STATUSES
+
+START = datetime(2025, 6, 1)
+LOCATIONS = 4
+CATEGORIES = 5
+
+
+def seed(vehicle_count, reservation_count, days, rng):
+    """Insert the fleet, confirmed bookings and pending reservations with executemany"""
+    locations = [str(uuid.uuid4()) for _ in range(LOCATIONS)]
+    categories = [str(uuid.uuid4()) for _ in range(CATEGORIES)]
+    db.session.execute(Location.__table__.insert(), [
+        {'location_id': location_id, 'location_code': f'L{i}', 'location_name': f'Location {i}',
+         'location_type': 'airport', 'street_address': f'{i} Terminal Road', 'city': 'City', 'country': 'USA'}
+        for i, location_id in enumerate(locations)])
+    db.session.execute(VehicleCategory.__table__.insert(), [
+        {'category_id': category_id, 'category_name': f'Category {i}', 'category_code': f'C{i}',
+         'base_daily_rate': 40, 'deposit_amount': 200, 'passenger_capacity': 4, 'is_active': True}
+        for i, category_id in enumerate(categories)])
+    # Half of the fleet waits at the busy location
+    vehicles = [{
+        'vehicle_id': str(uuid.uuid4()), 'vehicle_number': f'V{i:05d}', 'license_plate': f'P{i:06d}',
+        'vin': f'VIN{i:014d}', 'category_id': categories[i % CATEGORIES], 'make': 'Toyota', 'model': 'Corolla',
+        'year': 2024, 'status': 'available', 'is_active': True,
+        'current_location_id': locations[0] if i % 2 == 0 else locations[rng.randrange(1, LOCATIONS)]
+    } for i in range(vehicle_count)]
+    db.session.execute(Vehicle.__table__.insert(), vehicles)
+
+    user_id = str(uuid.uuid4())
+    db.session.execute(User.__table__.insert(), [{
+        'user_id': user_id, 'email': 'fleet@example.com', 'password_hash': 'x', 'first_name': 'Fleet',
+        'last_name': 'Customer', 'user_type': 'customer', 'status': 'active'}])
+    db.session.execute(Customer.__table__.insert(), [{'customer_id': user_id, 'customer_number': 'CUST00001'}])
+
+    def reservation(i, category_id, pickup, hours, status, vehicle_id=None):
+        return {
+            'reservation_id': str(uuid.uuid4()), 'reservation_number': f'R{i:09d}', 'customer_id': user_id,
+            'vehicle_category_id': category_id, 'assigned_vehicle_id': vehicle_id,
+            'pickup_location_id': locations[0],
+            # Most rentals come back where they started
+            'return_location_id': locations[0] if rng.random() < 0.7 else rng.choice(locations),
+            'pickup_datetime': pickup, 'return_datetime': pickup + timedelta(hours=hours), 'status': status
+        }
+
+    rows = []
+    # One existing booking on every tenth vehicle somewhere in the window
+    for i, vehicle in enumerate(vehicles[::10]):
+        pickup = START + timedelta(hours=rng.randint(0, days * 24))
+        rows.append(reservation(i, vehicle['category_id'], pickup, rng.randint(4, 72), 'confirmed', vehicle['vehicle_id']))
+    for i in range(reservation_count):
+        pickup = START + timedelta(minutes=rng.randint(0, days * 24 * 60 - 1))
+        rows.append(reservation(len(rows) + i, rng.choice(categories), pickup, rng.randint(3, 96), 'pending'))
+    db.session.execute(Reservation.__table__.insert(), rows)
+    db.session.commit()
+    return locations[0]
+
+
+def first_fit(pending, vehicles, bookings):
+    """Give each reservation the first vehicle of its category with no overlap"""
+    taken = {}
+    for vehicle_id, pickup, dropoff, _ in bookings:
+        taken.setdefault(vehicle_id, []).append((pickup, dropoff))
+    by_category = {}
+    for vehicle_id, category_id, location_id in vehicles:
+        by_category.setdefault(category_id, []).append((vehicle_id, location_id))
+    where = {vehicle_id: location_id for vehicle_id, _, location_id in vehicles}
+    used, relocations = set(), 0
+    assigned = 0
+    for _, category_id, pickup_location, return_location, pickup, dropoff in sorted(pending, key=lambda row: row[4]):
+        for vehicle_id, _ in by_category.get(category_id, []):
+            if all(dropoff <= start or pickup >= end for start, end in taken.get(vehicle_id, [])):
+                taken.setdefault(vehicle_id, []).append((pickup, dropoff))
+                relocations += where[vehicle_id] != pickup_location
+                where[vehicle_id] = return_location
+                used.add(vehicle_id)
+                assigned += 1
+                break
+    return assigned, len(used), relocations
+
+
+def check_database(app):
+    """Count category mismatches and overlapping blocking reservations per vehicle"""
+    with app.app_context():
+        rows = db.session.query(
+            Reservation.assigned_vehicle_id, Reservation.pickup_datetime, Reservation.return_datetime,
+            Reservation.vehicle_category_id, Vehicle.category_id
+        ).join(Vehicle, Vehicle.vehicle_id == Reservation.assigned_vehicle_id).filter(
+            Reservation.status.in_(BLOCKING_STATUSES)
+        ).order_by(Reservation.assigned_vehicle_id, Reservation.pickup_datetime).all()
+    mismatched = sum(1 for row in rows if row[3] != row[4])
+    overlaps = sum(1 for previous, row in zip(rows, rows[1:]) if previous[0] == row[0] and row[1] < previous[2])
+    return len(rows), mismatched, overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reservations', type=int, default=10000)
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=14)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'assignment.db')}")
+    with app.app_context():
+        location_id = seed(args.vehicles, args.reservations, args.days, rng)
+        end = START + timedelta(days=args.days)
+        pending, vehicles, bookings, _ = _load(location_id, START, end, None)
+        db.session.rollback()
+
+    started = time.perf_counter()
+    assignments, unassigned = plan_assignments(pending, vehicles, bookings)
+    planned = time.perf_counter() - started
+    relocations = sum(assignment['relocated'] for assignment in assignments)
+    used = len({assignment['vehicle_id'] for assignment in assignments})
+    print(f'plan only: {planned * 1000:7.1f}ms for {len(pending):,} reservations on {len(vehicles):,} vehicles')
+
+    started = time.perf_counter()
+    naive_assigned, naive_used, naive_relocations = first_fit(pending, vehicles, bookings)
+    naive = time.perf_counter() - started
+    print(f'best fit : {len(assignments):,} assigned, {used:,} vehicles, {relocations:,} relocations')
+    print(f'first fit: {naive_assigned:,} assigned, {naive_used:,} vehicles, {naive_relocations:,} relocations '
+          f'({naive:.2f}s)')
+
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/api/reservations/auto-assign', json={
+        'location_id': location_id, 'start': START.isoformat(), 'end': end.isoformat()})
+    elapsed = time.perf_counter() - started
+    summary = response.get_json()['summary']
+    print(f'endpoint : {elapsed * 1000:7.1f}ms (load, plan and one transaction), status {response.status_code}, '
+          f"{summary['assigned']:,} assigned, {summary['unassigned']:,} unassigned, "
+          f"{summary['idle_hours']:,.0f} idle hours between rentals")
+
+    blocking, mismatched, overlaps = check_database(app)
+    ok = response.status_code == 200 and not mismatched and not overlaps and summary['assigned'] == len(assignments)
+    print(f"{'ok  ' if ok else 'FAIL'} {blocking:,} blocking reservations, {mismatched} category mismatches, "
+          f'{overlaps} overlaps')
+
+    again = client.post('/api/reservations/auto-assign', json={
+        'location_id': location_id, 'start': START.isoformat(), 'end': end.isoformat()}).get_json()['summary']
+    ok = ok and again['assigned'] == 0 and again['pending'] == summary['unassigned']
+    print(f"{'ok  ' if ok else 'FAIL'} second run: {again['pending']} pending left, {again['assigned']} assigned")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Authenticated reads with and without the principal cache.
+
+Logs in a few hundred users and has them call GET /api/auth/profile in
+turn, first with the cache off (AUTH_CACHE_TTL=0: JWT decode plus up to two
+queries per call) and then with it on. With the cache every call after the
+first per token must run no SQL at all. Changing a password, suspending a
+user and assigning a role must take effect on the next call.
+
+Usage: python benchmarks/auth_cache_benchmark.py [--users N] [--requests N]
+"""
+import argparse
+import sys
+import time
+
+from common import make_app, db
+from src.main import init_database
+from src.models.user import User, UserRole, UserRoleAssignment
+from src.services.principals import principal_cache
+from src.services.query_stats import count_queries
+
+
+def seed_users(count):
+    users = [User(email=f'agent{i}@example.com', first_name='Agent', last_name=str(i), user_type='employee',
+                  password_hash='x') for i in range(count)]
+    # One real hash, copied: hashing is not what is measured here
+    users[0].set_password('secret123')
+    for user in users[1:]:
+        user.password_hash = users[0].password_hash
+    db.session.add_all(users)
+    db.session.commit()
+
+
+def run(client, engine, app, headers, requests):
+    with app.app_context(), count_queries(engine) as counter:
+        started = time.perf_counter()
+        for i in range(requests):
+            response = client.get('/api/auth/profile', headers=headers[i % len(headers)])
+            assert response.status_code == 200, response.get_json()
+        elapsed = time.perf_counter() - started
+    return elapsed / requests, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    failures = 0
+
+    app = make_app()
+    init_database(app)
+    with app.app_context():
+        seed_users(args.users)
+        engine = db.engine
+    client = app.test_client()
+    headers = []
+    for i in range(args.users):
+        token = client.post('/api/auth/login', json={'email': f'agent{i}@example.com', 'password': 'secret123'}).get_json()['token']
+        headers.append({'Authorization': f'Bearer {token}'})
+
+    ttl = principal_cache.ttl
+    principal_cache.ttl = 0
+    uncached, uncached_queries = run(client, engine, app, headers, args.requests)
+    principal_cache.ttl = ttl
+    run(client, engine, app, headers, len(headers))
+    cached, cached_queries = run(client, engine, app, headers, args.requests)
+    ok = cached_queries == 0
+    failures += not ok
+    print(f'uncached: {uncached * 1e6:6.0f}us per request, {uncached_queries / args.requests:.1f} queries')
+    print(f"{'ok  ' if ok else 'FAIL'} cached:   {cached * 1e6:6.0f}us per request, {cached_queries} queries "
+          f'({uncached / cached:.1f}x), {principal_cache.stats()}')
+
+    # Changes must be visible on the very next request
+    response = client.post('/api/auth/change-password', headers=headers[0],
+                           json={'current_password': 'secret123', 'new_password': 'changed456'})
+    ok = client.get('/api/auth/profile', headers=headers[0]).status_code == 401
+    fresh = {'Authorization': f"Bearer {response.get_json()['token']}"}
+    ok = ok and client.get('/api/auth/profile', headers=fresh).status_code == 200
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} password change revokes the old token, the new one works")
+
+    with app.app_context():
+        user = User.query.filter_by(email='agent1@example.com').one()
+        user.status = 'suspended'
+        role = UserRole.query.filter_by(role_name='Rental Agent').one()
+        db.session.add(UserRoleAssignment(user_id=User.query.filter_by(email='agent2@example.com').one().user_id,
+                                          role_id=role.role_id, assigned_by=user.user_id))
+        db.session.commit()
+    ok = client.get('/api/auth/profile', headers=headers[1]).status_code == 401
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} suspended user is rejected")
+    roles = [role['role_name'] for role in client.get('/api/auth/profile', headers=headers[2]).get_json()['roles']]
+    ok = roles == ['Rental Agent']
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} role assignment shows up: {roles}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
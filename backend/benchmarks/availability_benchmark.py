@@ -0,0 +1,132 @@
+"""Availability search latency with 10k vehicles and 1M reservations.
+
+Also checks that searches running while reservations are added and removed
+never fail, and that when the index expires under concurrent searches only
+one of them reloads it while the others keep using the expired one.
+
+Usage: python benchmarks/availability_benchmark.py [--vehicles N] [--reservations N] [--searches N]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.availability import AvailabilityIndex
+
+
+def generate_rows(vehicle_count, reservation_count, seed=42):
+    """Yield non-overlapping reservations spread evenly across the fleet"""
+    rng = random.Random(seed)
+    per_vehicle = reservation_count // vehicle_count
+    epoch = datetime(2025, 1, 1)
+    for v in range(vehicle_count):
+        vehicle_id = f'vehicle-{v}'
+        cursor = epoch + timedelta(hours=rng.randint(0, 72))
+        for r in range(per_vehicle):
+            pickup = cursor + timedelta(hours=rng.randint(1, 48))
+            dropoff = pickup + timedelta(hours=rng.randint(4, 24 * 7))
+            yield vehicle_id, pickup, dropoff, f'res-{v}-{r}'
+            cursor = dropoff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--searches', type=int, default=200)
+    args = parser.parse_args()
+
+    index = AvailabilityIndex(ttl=0)
+    started = time.perf_counter()
+    index.load(generate_rows(args.vehicles, args.reservations))
+    print(f'Built index for {args.reservations:,} reservations in {time.perf_counter() - started:.2f}s')
+
+    vehicle_ids = [f'vehicle-{v}' for v in range(args.vehicles)]
+    rng = random.Random(7)
+    latencies = []
+    available_total = 0
+    for _ in range(args.searches):
+        pickup = datetime(2025, 1, 1) + timedelta(hours=rng.randint(0, 24 * 700))
+        dropoff = pickup + timedelta(hours=rng.randint(4, 24 * 10))
+        started = time.perf_counter()
+        available_total += len(index.filter_available(vehicle_ids, pickup, dropoff))
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    per_vehicle_us = sum(latencies) / len(latencies) / args.vehicles * 1e6
+    print(f'{args.searches} searches over {args.vehicles:,} vehicles: '
+          f'p50 {p50:.2f}ms, p99 {p99:.2f}ms, {per_vehicle_us:.2f}us per vehicle, '
+          f'avg {available_total / args.searches:.0f} available')
+
+    failures = check_concurrency(index, vehicle_ids[:200])
+    sys.exit(1 if failures else 0)
+
+
+def check_concurrency(index, vehicle_ids):
+    failures = 0
+    errors = []
+    done = threading.Event()
+    searches = [0]
+
+    def search():
+        pickup = datetime(2025, 3, 1)
+        while not done.is_set():
+            try:
+                index.filter_available(vehicle_ids, pickup, pickup + timedelta(days=2))
+                searches[0] += 1
+            except Exception as e:
+                errors.append(repr(e))
+
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(3000):
+        reservation = SimpleNamespace(
+            reservation_id=f'extra-{i % 50}', assigned_vehicle_id=vehicle_ids[i % len(vehicle_ids)],
+            pickup_datetime=datetime(2025, 3, 1) + timedelta(hours=i % 97),
+            return_datetime=datetime(2025, 3, 2) + timedelta(hours=i % 89))
+        index.add_reservation(reservation)
+        if i % 3 == 0:
+            index.remove_reservation(reservation)
+    done.set()
+    for reader in readers:
+        reader.join()
+    ok = not errors
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {searches[0]} searches during 3000 adds/removes, "
+          f"{len(errors)} errors {errors[:3]}")
+
+    # Expire the index and let eight searches find it stale at once
+    reloads = []
+    index.ttl = 60
+    index.rebuild = lambda: (reloads.append(1), time.sleep(0.2), index.load([]))
+    index._built_at = time.monotonic() - 61
+    waited = []
+
+    def stale_search():
+        started = time.perf_counter()
+        index.ensure_loaded()
+        waited.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=stale_search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ok = len(reloads) == 1 and sorted(waited)[-2] < 0.1
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} expired index: {len(reloads)} reload for 8 searches, "
+          f"{sum(1 for seconds in waited if seconds < 0.1)} answered without waiting for it")
+    return failures
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Fail if a hot route makes SQLite scan a large table without an index.
+
+Every statement issued by the requests below is run through EXPLAIN QUERY
+PLAN. A plan step that scans one of the large tables without using an index
+("SCAN reservations" rather than "SCAN reservations USING INDEX ..." or a
+"SEARCH") is reported and makes the script exit non-zero.
+
+Usage: python benchmarks/check_query_plans.py
+"""
+import re
+import sys
+
+from sqlalchemy import event
+
+from common import make_app, seed, db
+from src.models.reservation import Reservation
+
+LARGE_TABLES = {
+    'reservations', 'payments', 'invoices', 'vehicles', 'customers',
+    'maintenance_schedules', 'damage_reports',
+}
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def hot_requests(ids):
+    """(method, path, query string or JSON body) for the routes to check"""
+    customer_id = ids['customers'][0]
+    location_id = ids['locations'][0]
+    return [
+        ('GET', '/api/reservations/', {}),
+        ('GET', '/api/reservations/', {'status': 'confirmed'}),
+        ('GET', '/api/reservations/', {'customer_id': customer_id}),
+        ('GET', '/api/reservations/', {'pickup_date': '2025-01-05'}),
+        ('GET', '/api/reservations/', {'cursor': '', 'per_page': 5}),
+        ('GET', f'/api/customers/{customer_id}/reservations', {}),
+        ('GET', f'/api/customers/{customer_id}/payments', {}),
+        ('GET', '/api/customers/', {}),
+        ('GET', '/api/vehicles/', {'status': 'available', 'location_id': location_id}),
+        ('GET', '/api/vehicles/', {'category_id': ids['category_id']}),
+        ('GET', '/api/vehicles/availability', {
+            'pickup_location_id': location_id, 'category_id': ids['category_id'],
+            'pickup_datetime': '2025-01-03T10:00:00', 'return_datetime': '2025-01-05T10:00:00',
+        }),
+        ('GET', '/api/financial/payments', {}),
+        ('GET', '/api/financial/payments', {'status': 'completed'}),
+        ('GET', '/api/financial/payments', {'customer_id': customer_id}),
+        ('GET', '/api/financial/invoices', {}),
+        ('GET', '/api/financial/invoices', {'status': 'draft'}),
+        ('GET', '/api/maintenance/schedules', {}),
+        ('GET', '/api/maintenance/schedules', {'status': 'scheduled'}),
+        ('GET', '/api/maintenance/damage-reports', {'status': 'reported'}),
+        ('GET', '/api/maintenance/dashboard', {}),
+        # The seeded vehicle is already booked then, so this runs the overlap check and answers 409
+        ('POST', f"/api/reservations/{ids['pending_reservation']}/confirm",
+         {'assigned_vehicle_id': ids['vehicles'][0]}),
+    ]
+
+
+def full_scans(connection, statement, parameters):
+    """Plan steps that read a large table without an index"""
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = FULL_SCAN.match(detail)
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        ids = seed(reservation_count=400, vehicle_count=50, customer_count=40)
+        ids['pending_reservation'] = Reservation.query.filter_by(status='pending').first().reservation_id
+        engine = db.engine
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.append((statement, parameters))
+
+    client = app.test_client()
+    failures = 0
+    for method, path, arguments in hot_requests(ids):
+        statements.clear()
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            if method == 'GET':
+                response = client.get(path, query_string=arguments)
+            else:
+                response = client.post(path, json=arguments)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        problems = []
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                for scan in full_scans(connection, statement, parameters):
+                    problems.append((scan, statement))
+
+        ok = response.status_code < 500 and not problems
+        failures += not ok
+        label = f'{method} {path}' + (f' {arguments}' if arguments and method == 'GET' else '')
+        print(f"{'ok  ' if ok else 'FAIL'} {label[:110]}: {len(statements)} selects, status {response.status_code}")
+        for scan, statement in problems:
+            print(f'      {scan}: {" ".join(statement.split())[:140]}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Shared app construction and data seeding for the benchmark scripts."""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep anything that builds the default app (src.main.app) off the on-disk database
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('ERP_INIT_DB', '0')
+# Scripts that need background jobs run a JobWorker themselves
+os.environ.setdefault('JOBS_IN_PROCESS', '0')
+
+from sqlalchemy.pool import StaticPool
+
+from src.main import create_app
+from src.models.user import db, User
+from src.models.customer import Customer
+from src.models.vehicle import VehicleCategory, Vehicle
+from src.models.location import Location
+from src.models.reservation import Reservation
+from src.models.financial import Payment, Invoice, PricingRule
+from src.models.maintenance import MaintenanceSchedule, DamageReport
+
+
+def make_app(database_uri='sqlite://'):
+    """Build the application on the given database with an empty schema"""
+    config = {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False
+    }
+    if database_uri == 'sqlite://':
+        # Share one in-memory database across threads and connections
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'poolclass': StaticPool,
+            'connect_args': {'check_same_thread': False}
+        }
+    app = create_app(config, init_db=False)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(reservation_count=100, vehicle_count=20, customer_count=10):
+    """Insert a small fleet with customers, reservations and payments"""
+    locations = [
+        Location(location_code=f'LOC{i}', location_name=f'Location {i}', location_type='downtown',
+                 street_address=f'{i} Main Street', city='Downtown', country='USA')
+        for i in range(2)
+    ]
+    category = VehicleCategory(category_name='Economy', category_code='ECON', base_daily_rate=29.99,
+                               deposit_amount=200.00, passenger_capacity=4)
+    db.session.add_all(locations + [category])
+    db.session.flush()
+
+    vehicles = [
+        Vehicle(vehicle_number=f'V{i:05d}', license_plate=f'PLATE{i:05d}', vin=f'VIN{i:014d}',
+                category_id=category.category_id, make='Toyota', model='Corolla', year=2024,
+                current_location_id=locations[i % 2].location_id)
+        for i in range(vehicle_count)
+    ]
+    db.session.add_all(vehicles)
+
+    customers = []
+    for i in range(customer_count):
+        user = User(email=f'customer{i}@example.com', first_name='Test', last_name=f'Customer{i}',
+                    user_type='customer', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        customer = Customer(customer_id=user.user_id, customer_number=f'CUST{i:05d}')
+        db.session.add(customer)
+        customers.append(customer)
+    db.session.flush()
+
+    start = datetime(2025, 1, 1, 10)
+    reservations = []
+    for i in range(reservation_count):
+        confirmed = i % 2 == 0
+        reservations.append(Reservation(
+            reservation_number=f'RES{i:08d}',
+            customer_id=customers[i % customer_count].customer_id,
+            vehicle_category_id=category.category_id,
+            pickup_location_id=locations[0].location_id,
+            return_location_id=locations[i % 2].location_id,
+            pickup_datetime=start + timedelta(hours=6 * i),
+            return_datetime=start + timedelta(hours=6 * i + 30),
+            status='confirmed' if confirmed else 'pending',
+            assigned_vehicle_id=vehicles[i % vehicle_count].vehicle_id if confirmed else None,
+            total_estimated_cost=59.98
+        ))
+    db.session.add_all(reservations)
+    db.session.flush()
+
+    for i, reservation in enumerate(reservations):
+        db.session.add(Payment(
+            reservation_id=reservation.reservation_id,
+            customer_id=reservation.customer_id,
+            payment_type='rental',
+            payment_method='credit_card',
+            amount=59.98,
+            status='completed',
+            processed_at=reservation.pickup_datetime
+        ))
+        if i % 4 == 0:
+            db.session.add(Invoice(
+                invoice_number=f'INV{i:08d}',
+                reservation_id=reservation.reservation_id,
+                customer_id=reservation.customer_id,
+                invoice_date=reservation.pickup_datetime.date(),
+                due_date=reservation.pickup_datetime.date() + timedelta(days=30),
+                subtotal=59.98,
+                tax_amount=4.80,
+                total_amount=64.78,
+                line_items='[{"description": "Rental", "amount": 59.98}]',
+                billing_address='{"city": "Downtown"}'
+            ))
+        if i % 10 == 0 and reservation.assigned_vehicle_id:
+            db.session.add(DamageReport(
+                vehicle_id=reservation.assigned_vehicle_id,
+                reservation_id=reservation.reservation_id,
+                reported_by=reservation.customer_id,
+                incident_date=reservation.return_datetime,
+                damage_type='scratch',
+                damage_severity='minor',
+                damage_description='Scratch on rear bumper',
+                estimated_repair_cost=150.00,
+                photos='["scratch.jpg"]'
+            ))
+
+    for i, vehicle in enumerate(vehicles):
+        db.session.add(MaintenanceSchedule(
+            vehicle_id=vehicle.vehicle_id,
+            service_type='oil_change',
+            scheduled_date=start.date() + timedelta(days=i % 60),
+            estimated_cost=80.00
+        ))
+    db.session.commit()
+
+    return {
+        'locations': [location.location_id for location in locations],
+        'category_id': category.category_id,
+        'vehicles': [vehicle.vehicle_id for vehicle in vehicles],
+        'customers': [customer.customer_id for customer in customers],
+        'reservations': [reservation.reservation_id for reservation in reservations],
+    }
@@ -0,0 +1,121 @@
+"""Concurrent confirmations racing for the same vehicles must never double-book.
+
+Client threads confirm random pending reservations onto a handful of
+vehicles. All reservations overlap, so each vehicle can take only one of
+them. The SQLite writer lock is turned off (SQLITE_SERIALIZE_WRITES=0), so
+only the version_id checks on Vehicle and Reservation keep two requests
+that both passed the conflict query from committing. --delay sleeps before
+each flush to widen that window so races happen on every run.
+
+Afterwards every vehicle must hold at most one overlapping blocking
+reservation; requests that lost a race get 409.
+
+Usage: python benchmarks/confirm_race_stress.py [--clients 32] [--vehicles 8] [--reservations 400] [--delay 0.05]
+"""
+import argparse
+import collections
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['SQLITE_SERIALIZE_WRITES'] = '0'
+
+from common import create_app, seed, db
+from sqlalchemy import event
+from src.models.reservation import Reservation
+from src.models.vehicle import Vehicle
+
+
+def run_client(app, work, vehicle_ids, results, rng):
+    client = app.test_client()
+    while True:
+        try:
+            reservation_id = work.pop()
+        except IndexError:
+            return
+        response = client.post(f'/api/reservations/{reservation_id}/confirm',
+                               json={'assigned_vehicle_id': rng.choice(vehicle_ids)})
+        error = response.get_json().get('error', '') if response.status_code != 200 else ''
+        results.append((response.status_code, error))
+
+
+def double_bookings(app):
+    with app.app_context():
+        rows = db.session.query(
+            Reservation.assigned_vehicle_id, Reservation.pickup_datetime, Reservation.return_datetime
+        ).filter(
+            Reservation.status.in_(('confirmed', 'in_progress')),
+            Reservation.assigned_vehicle_id.isnot(None)
+        ).order_by(Reservation.assigned_vehicle_id, Reservation.pickup_datetime).all()
+    overlaps = sum(1 for previous, row in zip(rows, rows[1:]) if previous[0] == row[0] and row[1] < previous[2])
+    return len(rows), overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--vehicles', type=int, default=8)
+    parser.add_argument('--reservations', type=int, default=400)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds to sleep before each flush')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'app.db')}",
+            'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': args.clients, 'max_overflow': 0}
+        }, init_db=False)
+        with app.app_context():
+            db.create_all()
+            seed(reservation_count=args.reservations, vehicle_count=args.vehicles, customer_count=10)
+            # Make every reservation pending and overlapping, so each vehicle fits exactly one
+            db.session.query(Reservation).update({
+                'status': 'pending', 'assigned_vehicle_id': None,
+                'pickup_datetime': db.func.datetime('2025-03-01 10:00:00'),
+                'return_datetime': db.func.datetime('2025-03-03 10:00:00')
+            }, synchronize_session=False)
+            db.session.commit()
+            pending = [reservation_id for (reservation_id,) in db.session.query(Reservation.reservation_id)]
+            vehicle_ids = [vehicle_id for (vehicle_id,) in db.session.query(Vehicle.vehicle_id)]
+
+            if args.delay:
+                @event.listens_for(db.session, 'before_flush')
+                def widen_race(session, context, instances):
+                    time.sleep(args.delay)
+
+        random.Random(1).shuffle(pending)
+        results = []
+        threads = [threading.Thread(target=run_client, args=(app, pending, vehicle_ids, results, random.Random(i)))
+                   for i in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        outcomes = collections.Counter()
+        for status, error in results:
+            if status == 409 and 'another request' in error:
+                outcomes['409 lost a race (version check)'] += 1
+            elif status == 409:
+                outcomes['409 already reserved'] += 1
+            else:
+                outcomes[f'{status} {error}'.strip()] += 1
+        print(f'{len(results)} confirmations from {args.clients} clients in {elapsed:.2f}s '
+              f'({len(results) / elapsed:.0f}/s), writer lock off')
+        for outcome, count in sorted(outcomes.items()):
+            print(f'  {count:5d} {outcome}')
+
+        blocking, overlaps = double_bookings(app)
+        ok = overlaps == 0 and blocking == outcomes['200'] <= args.vehicles
+        print(f"{'ok  ' if ok else 'FAIL'} {blocking} reservations hold {args.vehicles} vehicles, "
+              f'{overlaps} double bookings')
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Compare bulk customer onboarding with one create_customer call per driver.
+
+Creates the same drivers through POST /api/customers/ one at a time and
+through an onboarding job (POST /api/customers/onboarding, then polling the
+job), each on a fresh SQLite file. The job runs once with password hashing in
+the job thread and once on a process pool. Rows with an email that is taken
+or repeated must be reported per row while the rest are created, and a
+password given in the file must work for login without being stored in
+the job's payload. A job that fails after some chunks are committed must
+resume after them on its retry, a job whose worker died on its last
+attempt must be marked failed rather than run again, and a worker whose
+lease expired must not record its outcome over the attempt that retook it.
+
+Password hashing dominates: the pool pays off with more than one core; on
+a single core both job runs take about as long.
+
+Usage: python benchmarks/customer_onboarding_benchmark.py [--customers N] [--workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from common import make_app, seed, db
+from src.models.user import User
+from src.models.customer import CustomerAddress
+from src.models.job import BackgroundJob
+from src.services import customer_onboarding
+from src.services import jobs
+from src.services.jobs import JobWorker, claim_job, run_job as run_claimed
+from datetime import datetime, timedelta
+
+
+def drivers(count):
+    return [{
+        'email': f'driver{i}@corp.example.com',
+        'first_name': 'Fleet',
+        'last_name': f'Driver{i}',
+        'driver_license_number': f'DL{i:08d}',
+        'driver_license_state': 'CA',
+        'street_address_1': f'{i} Market Street',
+        'city': 'San Francisco',
+        'postal_code': '94105'
+    } for i in range(count)]
+
+
+def fresh_app(worker=True):
+    app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'onboarding.db')}")
+    with app.app_context():
+        seed(reservation_count=1, vehicle_count=1, customer_count=1)
+    if worker:
+        JobWorker(app, poll_interval=0.05).start()
+    return app
+
+
+def counts(app):
+    with app.app_context():
+        return db.session.query(User).count() - 1, db.session.query(CustomerAddress).count()
+
+
+def run_job(client, rows):
+    started = time.perf_counter()
+    response = client.post('/api/customers/onboarding', json={'customers': rows})
+    assert response.status_code == 202, response.get_json()
+    job_id = response.get_json()['job']['job_id']
+    while True:
+        job = client.get(f'/api/customers/onboarding/{job_id}').get_json()['job']
+        if job['status'] in ('succeeded', 'failed'):
+            return job, time.perf_counter() - started
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--customers', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    failures = 0
+
+    app = fresh_app()
+    client = app.test_client()
+    started = time.perf_counter()
+    for row in drivers(args.customers):
+        client.post('/api/customers/', json=row)
+    single = time.perf_counter() - started
+    users, _ = counts(app)
+    print(f'create_customer x {args.customers}: {single:6.2f}s, {users} customers')
+
+    for workers in (0, args.workers):
+        customer_onboarding.ONBOARDING_HASH_WORKERS = workers
+        app = fresh_app()
+        job, elapsed = run_job(app.test_client(), drivers(args.customers))
+        users, addresses = counts(app)
+        ok = job['status'] == 'succeeded' and users == addresses == args.customers
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} onboarding job, {workers} hash processes: {elapsed:6.2f}s, "
+              f'{users} customers, {addresses} addresses, {single / elapsed:.1f}x faster')
+
+    # Row 1 repeats row 0 in another case, row 2 is already registered, row 3 lacks a name
+    app = fresh_app()
+    rows = drivers(5)
+    rows[1]['email'] = rows[0]['email'].upper()
+    rows[2]['email'] = 'customer0@example.com'
+    del rows[3]['last_name']
+    rows[4]['password'] = 'Fleet-Driver-4!'
+    client = app.test_client()
+    job, _ = run_job(client, rows)
+    result = job['result']
+    ok = result['created'] == 2 and [error['row'] for error in result['errors']] == [1, 2, 3]
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} mixed file: {result['created']} created, "
+          f"errors {[(error['row'], error['errors']) for error in result['errors']]}")
+
+    # An app without a job worker keeps the job queued, to look at its payload
+    queue_app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'queued.db')}")
+    response = queue_app.test_client().post('/api/customers/onboarding', json={'customers': [
+        dict(drivers(6)[5], password='Fleet-Driver-5!')]})
+    with queue_app.app_context():
+        payload = db.session.get(BackgroundJob, response.get_json()['job']['job_id']).payload
+    login = client.post('/api/auth/login', json={'email': rows[4]['email'], 'password': 'Fleet-Driver-4!'})
+    ok = login.status_code == 200 and 'Fleet-Driver-5!' not in payload and '"password"' not in payload
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} password from the file: login {login.status_code}, "
+          f"queued payload {'holds' if 'Fleet-Driver-5!' in payload else 'without'} the plain text")
+
+    # Fail once after the second chunk of three rows is committed; the retry
+    # must neither recreate nor reject as existing the rows already created
+    customer_onboarding.ONBOARDING_CHUNK_SIZE = 3
+    jobs.JOBS_RETRY_BASE_SECONDS = 0
+    report_progress = customer_onboarding.report_progress
+    crashed = []
+
+    def crash_once(job_id, current, total=None):
+        report_progress(job_id, current, total)
+        if current >= 6 and not crashed:
+            crashed.append(current)
+            raise RuntimeError('worker lost its database connection')
+
+    customer_onboarding.report_progress = crash_once
+    app = fresh_app()
+    rows = drivers(12)
+    rows[7]['email'] = rows[2]['email']
+    rows[9]['email'] = 'customer0@example.com'
+    job, _ = run_job(app.test_client(), rows)
+    customer_onboarding.report_progress = report_progress
+    result = job['result']
+    users, _ = counts(app)
+    ok = (crashed and job['attempts'] == 2 and result['created'] == users == 10
+          and [error['row'] for error in result['errors']] == [7, 9])
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} retry after a failure with {crashed and crashed[0]} rows done: "
+          f"attempt {job['attempts']}, {result['created']} created ({users} in the database), "
+          f"errors {[(error['row'], error['errors']) for error in result['errors']]}")
+
+    with app.app_context():
+        job = BackgroundJob(job_type='customer_onboarding', status='running', attempts=3, max_attempts=3,
+                            payload='{"rows": []}', locked_by='dead-worker',
+                            locked_until=datetime.utcnow() - timedelta(seconds=1))
+        db.session.add(job)
+        db.session.commit()
+        claimed = claim_job('test-worker')
+        db.session.refresh(job)
+        ok = claimed is None and job.status == 'failed' and job.attempts == 3 and job.payload is None
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} expired lease on the last attempt: {job.status}, "
+              f'attempts {job.attempts}, error {job.error!r}')
+
+    # The first worker outlives its lease, another retakes the job, then the
+    # first one finishes; no worker thread runs here to take the job first
+    app = fresh_app(worker=False)
+    with app.app_context():
+        job = BackgroundJob(job_type='customer_onboarding', payload='{"rows": []}', max_attempts=3,
+                            run_at=datetime.utcnow() - timedelta(seconds=1))
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.job_id
+        first = claim_job('slow-worker')
+        db.session.execute(db.update(BackgroundJob).where(BackgroundJob.job_id == job_id).values(
+            locked_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        second = claim_job('new-worker')
+        late = run_claimed(job_id, 'slow-worker')
+        job = db.session.get(BackgroundJob, job_id)
+        retaken = (job.status, job.locked_by, job.attempts)
+        db.session.rollback()
+        finished = run_claimed(job_id, 'new-worker')
+        job = db.session.get(BackgroundJob, job_id)
+        ok = (first == second == job_id and not late and retaken == ('running', 'new-worker', 2)
+              and finished and job.status == 'succeeded')
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} late result of an expired lease: job stayed {retaken[0]} with "
+              f'{retaken[1]} on attempt {retaken[2]}, then {job.status}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Check that streaming exports use bounded memory regardless of row count.
+
+Payments are bulk inserted into a temporary SQLite file, then
+/api/financial/payments/export is consumed chunk by chunk for growing row
+counts in both formats. Peak traced Python memory while streaming must stay
+within a fixed bound and not grow with the export size. Throughput figures
+include the tracemalloc overhead, which slows streaming several times over.
+
+Usage: python benchmarks/export_memory.py [--rows 10000 50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from common import make_app, seed, db
+from src.models.financial import Payment
+
+# Peak memory allowed while streaming, independent of the number of rows
+MEMORY_BOUND_MB = 16
+
+
+def add_payments(count, reservation_id, customer_id, start):
+    """Insert payments with Core executemany so seeding stays fast"""
+    batch = []
+    for i in range(count):
+        batch.append({
+            'payment_id': str(uuid.uuid4()),
+            'reservation_id': reservation_id,
+            'customer_id': customer_id,
+            'payment_type': 'rental',
+            'payment_method': 'credit_card',
+            'amount': 59.98,
+            'currency': 'USD',
+            'status': 'completed',
+            'processed_at': start + timedelta(minutes=i),
+            'created_at': start + timedelta(minutes=i),
+            'updated_at': start + timedelta(minutes=i)
+        })
+        if len(batch) == 10000:
+            db.session.execute(Payment.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Payment.__table__.insert(), batch)
+    db.session.commit()
+
+
+def stream(client, export_format):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get('/api/financial/payments/export', query_string={'format': export_format},
+                          buffered=False)
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, lines, size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    app = make_app(f"sqlite:///{os.path.join(directory, 'export.db')}")
+    client = app.test_client()
+    with app.app_context():
+        ids = seed(reservation_count=1, vehicle_count=1, customer_count=1)
+        start = datetime(2024, 1, 1)
+
+    failures = 0
+    peaks = {}
+    inserted = 0
+    for rows in sorted(args.rows):
+        with app.app_context():
+            add_payments(rows - inserted, ids['reservations'][0], ids['customers'][0], start)
+            inserted = rows
+        for export_format in ('ndjson', 'csv'):
+            status, lines, size, elapsed, peak = stream(client, export_format)
+            # The seed adds one payment and CSV has a header line
+            expected = rows + 1 + (export_format == 'csv')
+            peak_mb = peak / 1024 / 1024
+            ok = status == 200 and lines == expected and peak_mb <= MEMORY_BOUND_MB
+            failures += not ok
+            peaks.setdefault(export_format, []).append(peak_mb)
+            print(f"{'ok  ' if ok else 'FAIL'} {export_format:6} {rows:>8} rows: {lines} lines, "
+                  f'{size / 1024 / 1024:6.1f} MB in {elapsed:5.2f}s ({rows / elapsed:,.0f} rows/s), '
+                  f'peak {peak_mb:5.2f} MB')
+
+    for export_format, values in peaks.items():
+        growth = values[-1] / values[0]
+        ok = growth < 1.5
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {export_format} peak growth across sizes: {growth:.2f}x")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
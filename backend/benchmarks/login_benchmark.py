@@ -0,0 +1,144 @@
+"""Login throughput per core with the password hashing pool.
+
+Client threads log in concurrently against a SQLite file (writer lock on),
+while another thread keeps requesting GET /api/health. For each setup the
+script prints logins per second, logins per second per core used for
+hashing, and the health check's 95th percentile latency during the burst:
+
+- lock held for the whole login, hashing in the request thread (before);
+- hashing in the request thread, writer lock only around the commit;
+- hashing on the process pool;
+- the pool with a cheaper scrypt cost.
+
+It also checks that hashes made with other parameters are replaced on the
+first login and that later logins leave them alone.
+
+Usage: python benchmarks/login_benchmark.py [--clients N] [--logins N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from common import make_app, db
+from src.models.user import User
+from src.services import passwords
+from src.services.passwords import password_hasher, generate_hash, needs_rehash
+
+CHEAP_METHOD = 'scrypt:16384:8:1'
+
+
+def seed_users(count, password_hash):
+    db.session.execute(User.__table__.insert(), [{
+        'user_id': f'user-{i}', 'email': f'agent{i}@example.com', 'password_hash': password_hash,
+        'first_name': 'Agent', 'last_name': str(i), 'user_type': 'employee', 'status': 'active'
+    } for i in range(count)])
+    db.session.commit()
+
+
+def burst(app, clients, logins, users):
+    """Run logins from client threads while probing /api/health; (logins/s, health p95 seconds)"""
+    counter = iter(range(logins))
+    lock = threading.Lock()
+    failures = []
+    done = threading.Event()
+    probes = []
+
+    def client():
+        test_client = app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            response = test_client.post('/api/auth/login', json={
+                'email': f'agent{i % users}@example.com', 'password': 'secret123'})
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+    def probe():
+        test_client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            test_client.get('/api/health')
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    if failures:
+        raise SystemExit(f'logins failed: {failures[:5]}')
+    probes.sort()
+    return logins / elapsed, probes[int(len(probes) * 0.95)] if probes else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=48)
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    failures = 0
+
+    app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'logins.db')}")
+    with app.app_context():
+        seed_users(args.clients * 4, generate_hash('secret123'))
+    login_view = app.view_functions['auth.login']
+
+    setups = [
+        ('lock held while hashing, in thread', 0, passwords.PASSWORD_HASH_METHOD, False),
+        ('lock around commit, in thread', 0, passwords.PASSWORD_HASH_METHOD, True),
+        (f'pool of {cores}', cores, passwords.PASSWORD_HASH_METHOD, True),
+        (f'pool of {cores}, {CHEAP_METHOD}', cores, CHEAP_METHOD, True),
+    ]
+    default_method = passwords.PASSWORD_HASH_METHOD
+    for label, workers, method, own_lock in setups:
+        password_hasher.shutdown()
+        password_hasher.workers = workers
+        password_hasher.warm_up()
+        login_view.manages_writer_lock = own_lock
+        # Seeded hashes use the default method; a cheaper one would rehash every user once first
+        passwords.PASSWORD_HASH_METHOD = method
+        if method != default_method:
+            burst(app, args.clients, args.clients * 4, args.clients * 4)
+        rate, health_p95 = burst(app, args.clients, args.logins, args.clients * 4)
+        passwords.PASSWORD_HASH_METHOD = default_method
+        # Cores hashing at once: one behind the lock, else the pool or the client threads
+        used = min(cores, workers or args.clients) if own_lock else 1
+        print(f'{label:40s} {rate:6.1f} logins/s, {rate / used:6.1f} '
+              f'per core, /api/health p95 {health_p95 * 1000:6.1f}ms during the burst')
+    login_view.manages_writer_lock = True
+
+    # Rehash on login: users seeded with the cheaper method move to the configured one
+    with app.app_context():
+        db.session.execute(User.__table__.update().values(password_hash=generate_hash('secret123', CHEAP_METHOD)))
+        db.session.commit()
+    client = app.test_client()
+    client.post('/api/auth/login', json={'email': 'agent0@example.com', 'password': 'secret123'})
+    with app.app_context():
+        first = db.session.get(User, 'user-0').password_hash
+    client.post('/api/auth/login', json={'email': 'agent0@example.com', 'password': 'secret123'})
+    with app.app_context():
+        second = db.session.get(User, 'user-0').password_hash
+    ok = not first.startswith(CHEAP_METHOD) and not needs_rehash(first) and first == second
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {CHEAP_METHOD} hash replaced by {first.split('$')[0]} on login, "
+          f"{'kept' if first == second else 'replaced again'} on the next one")
+
+    password_hasher.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Request instrumentation: correct figures at a small cost.
+
+Requests the list endpoints on an instrumented app and checks that the
+statement count in each Server-Timing header matches what count_queries()
+sees on the engine, and that /api/metrics reports every request in its
+histograms, also after statements that fail. Then times the same requests
+with METRICS_ENABLED=0 to show the overhead per request.
+
+Usage: python benchmarks/metrics_overhead.py [--requests N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from common import make_app, seed, db
+from src.services.metrics import metrics_registry
+from src.services.query_stats import count_queries
+
+PATHS = ['/api/vehicles/', '/api/reservations/', '/api/customers/', '/api/financial/payments']
+
+
+def build(enabled):
+    os.environ['METRICS_ENABLED'] = '1' if enabled else '0'
+    app = make_app()
+    with app.app_context():
+        seed(reservation_count=200, vehicle_count=120, customer_count=120)
+    return app
+
+
+def timed(app, requests):
+    client = app.test_client()
+    started = time.perf_counter()
+    for i in range(requests):
+        client.get(PATHS[i % len(PATHS)], query_string={'per_page': 50})
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    failures = 0
+
+    plain_app = build(enabled=False)
+    app = build(enabled=True)
+    with app.app_context():
+        engine = db.engine
+    client = app.test_client()
+    metrics_registry.reset()
+    for path in PATHS:
+        with app.app_context(), count_queries(engine) as counter:
+            response = client.get(path, query_string={'per_page': 50})
+        timing = response.headers.get('Server-Timing', '')
+        reported = re.search(r'desc="(\d+) queries"', timing)
+        ok = reported is not None and int(reported.group(1)) == counter.count
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {path}: Server-Timing: {timing}")
+
+    text = client.get('/api/metrics').get_data(as_text=True)
+    counted = sum(int(value) for value in re.findall(r'^http_request_duration_seconds_count\{[^}]*\} (\d+)$', text, re.M))
+    ok = counted == len(PATHS)
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} /api/metrics: {counted} requests in the latency histograms, "
+          f'{len(text.splitlines())} lines')
+
+    # A statement that raises must not leave its start time behind on the connection
+    with app.app_context():
+        for _ in range(3):
+            try:
+                db.session.execute(db.text('SELECT * FROM no_such_table'))
+            except OperationalError:
+                db.session.rollback()
+        with engine.connect() as connection:
+            left = len(connection.info.get('query_started', []))
+    with count_queries(engine) as counter:
+        response = client.get(PATHS[0], query_string={'per_page': 50})
+    reported = re.search(r'desc="(\d+) queries"', response.headers.get('Server-Timing', ''))
+    ok = left == 0 and reported is not None and int(reported.group(1)) == counter.count
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} after 3 failed statements: {left} start times left on the connection, "
+          f'{reported and reported.group(1)} queries reported for {counter.count} run')
+
+    # Interleaved, best of five, so both apps see the same machine noise
+    runs = [(timed(plain_app, args.requests), timed(app, args.requests)) for _ in range(5)]
+    plain, instrumented = (min(times) for times in zip(*runs))
+    overhead = instrumented - plain
+    print(f'{args.requests:,} requests (best of 5): {plain * 1e3:.2f}ms without, {instrumented * 1e3:.2f}ms with metrics '
+          f'({overhead * 1e6:+.0f}us per request, {overhead / plain:+.1%})')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
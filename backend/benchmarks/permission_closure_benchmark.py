@@ -0,0 +1,239 @@
+"""Permission checks against a precomputed role hierarchy.
+
+Builds a forest of roles (parent_role_id chains up to --depth deep) with
+random grants, then:
+- checks every role's mask against a recursive walk of its parents;
+- times permission checks from the resolver against that walk done with
+  the ORM per check, the way it would be without the resolver;
+- grants a permission to a root role through the ORM and checks that all
+  of its descendants see it without a reload or any SQL, timing the
+  incremental update against a full compile;
+- calls a route guarded by require_permission() before and after a grant;
+- checks from several threads while the resolver recompiles and applies
+  grants, none of which may be denied a permission the role holds or fail;
+- drops a role and checks that its children keep only their own grants.
+
+Usage: python benchmarks/permission_closure_benchmark.py [--roles N] [--permissions N] [--depth N]
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from common import make_app, db
+from flask import g
+from src.models.user import User, UserRole, UserRoleAssignment, Permission, RolePermission
+from src.services.permissions import permission_resolver, require_permission
+from src.services.query_stats import count_queries
+
+
+def seed(role_count, permission_count, depth, rng):
+    admin = User(email='admin@example.com', first_name='Admin', last_name='User', user_type='admin',
+                 password_hash='x')
+    admin.set_password('secret123')
+    db.session.add(admin)
+    permissions = [Permission(permission_name=f'resource{i // 4}.{("read", "create", "update", "delete")[i % 4]}',
+                              resource_type=f'resource{i // 4}', action_type='read') for i in range(permission_count)]
+    db.session.add_all(permissions)
+    db.session.flush()
+    roles = []
+    for i in range(role_count):
+        # Roots every `depth` roles, otherwise a parent among the last few
+        parent = None if i % depth == 0 else rng.choice(roles[-(i % depth):])
+        role = UserRole(role_name=f'Role {i}', parent_role_id=parent.role_id if parent else None)
+        db.session.add(role)
+        db.session.flush()
+        roles.append(role)
+    db.session.add_all(RolePermission(role_id=role.role_id, permission_id=permission.permission_id,
+                                      granted_by=admin.user_id)
+                       for role in roles for permission in rng.sample(permissions, 3))
+    db.session.commit()
+    return admin, roles, permissions
+
+
+def walk(role_id, parents, grants):
+    """Names granted to a role or any of its ancestors, recursively"""
+    if role_id is None:
+        return set()
+    return grants.get(role_id, set()) | walk(parents[role_id], parents, grants)
+
+
+def orm_allows(role_id, name):
+    """The per-request check without the resolver: walk the parents with the ORM"""
+    role = db.session.get(UserRole, role_id)
+    while role is not None:
+        if any(grant.permission.permission_name == name for grant in role.permissions):
+            return True
+        role = role.parent
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--roles', type=int, default=2000)
+    parser.add_argument('--permissions', type=int, default=400)
+    parser.add_argument('--depth', type=int, default=8)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    failures = 0
+
+    app = make_app()
+
+    @app.route('/api/guarded')
+    @require_permission('reports.export')
+    def guarded():
+        return {'user_id': g.principal.user_id}
+
+    with app.app_context():
+        admin, roles, permissions = seed(args.roles, args.permissions, args.depth, rng)
+        parents = {role.role_id: role.parent_role_id for role in roles}
+        grants = {}
+        for role_id, name in db.session.query(RolePermission.role_id, Permission.permission_name).join(Permission):
+            grants.setdefault(role_id, set()).add(name)
+        role_ids = [role.role_id for role in roles]
+        names = [permission.permission_name for permission in permissions]
+
+        started = time.perf_counter()
+        permission_resolver.load()
+        loaded = time.perf_counter() - started
+        wrong = sum(set(permission_resolver.names((role_id,))) != walk(role_id, parents, grants) for role_id in role_ids)
+        failures += bool(wrong)
+        print(f"{'ok  ' if not wrong else 'FAIL'} {len(role_ids):,} roles, {len(names)} permissions loaded and "
+              f'closed in {loaded * 1000:.1f}ms; {wrong} masks differ from a recursive walk')
+
+        checks = [((rng.choice(role_ids),), rng.choice(names)) for _ in range(100000)]
+        started = time.perf_counter()
+        allowed = sum(permission_resolver.allows(held, (name,)) for held, name in checks)
+        resolver_time = (time.perf_counter() - started) / len(checks)
+        sample = checks[:500]
+        db.session.expire_all()
+        with count_queries(db.engine) as counter:
+            started = time.perf_counter()
+            orm_allowed = [orm_allows(held[0], name) for held, name in sample]
+            orm_time = (time.perf_counter() - started) / len(sample)
+        ok = orm_allowed == [permission_resolver.allows(held, (name,)) for held, name in sample]
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} check: {resolver_time * 1e9:.0f}ns with bitsets vs "
+              f'{orm_time * 1e6:.0f}us walking parents with the ORM ({counter.count / len(sample):.1f} queries '
+              f'per check cold); {allowed:,} of {len(checks):,} allowed')
+
+        # Incremental: a new permission granted to a root reaches its whole subtree
+        root = roles[0]
+        subtree = [role_id for role_id in role_ids if 'reports.export' in walk(role_id, parents, {root.role_id: {'reports.export'}})]
+        export = Permission(permission_name='reports.export', resource_type='reports', action_type='export')
+        db.session.add(export)
+        db.session.flush()
+        db.session.add(RolePermission(role_id=root.role_id, permission_id=export.permission_id, granted_by=admin.user_id))
+        applied = []
+        apply = permission_resolver.apply
+
+        def timed_apply(changes):
+            started = time.perf_counter()
+            apply(changes)
+            applied.append(time.perf_counter() - started)
+
+        permission_resolver.apply = timed_apply
+        db.session.commit()
+        permission_resolver.apply = apply
+        with count_queries(db.engine) as counter:
+            reached = [role_id for role_id in role_ids if permission_resolver.allows((role_id,), ('reports.export',))]
+        ok = reached == subtree and counter.count == 0
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} grant on a root reached {len(reached)} roles ({len(subtree)} expected) "
+              f'with {counter.count} queries; incremental update {sum(applied) * 1000:.2f}ms vs full '
+              f'load {loaded * 1000:.1f}ms')
+
+        # The decorator, through the principal of a user holding a leaf role
+        leaf = subtree[-1]
+        other = next(role_id for role_id in role_ids if role_id not in subtree)
+        admin_id = admin.user_id
+        db.session.add(UserRoleAssignment(user_id=admin_id, role_id=other, assigned_by=admin_id))
+        db.session.commit()
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'admin@example.com', 'password': 'secret123'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    denied = client.get('/api/guarded', headers=headers).status_code
+    with app.app_context():
+        db.session.add(UserRoleAssignment(user_id=admin_id, role_id=leaf, assigned_by=admin_id))
+        db.session.commit()
+    allowed = client.get('/api/guarded', headers=headers).status_code
+    anonymous = client.get('/api/guarded').status_code
+    listed = client.get('/api/auth/permissions', headers=headers).get_json()['permissions']
+    ok = (anonymous, denied, allowed) == (401, 403, 200) and 'reports.export' in listed
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} require_permission: {anonymous} without a token, {denied} before the "
+          f"grant, {allowed} after; /api/auth/permissions lists {len(listed)} permissions")
+
+    # Checks during reloads and incremental changes must never see half-built masks
+    with app.app_context():
+        permissions = db.session.query(Permission.permission_id, Permission.permission_name).all()
+        hierarchy = db.session.query(UserRole.role_id, UserRole.parent_role_id).all()
+        granted = db.session.query(RolePermission.role_id, RolePermission.permission_id).all()
+        grant = ('grant', db.session.merge(root).role_id, db.session.merge(export).permission_id)
+    held = [((role_id,), name) for role_id in role_ids for name in walk(role_id, parents, grants)][:2000]
+    denied, checked, errors, finished = [], [0], [], []
+    stop = threading.Event()
+
+    def check_continuously():
+        # The checks reload from the database when a grant bumps the version
+        try:
+            with app.app_context():
+                while not stop.is_set():
+                    for role_ids_held, name in held:
+                        if not permission_resolver.allows(role_ids_held, (name,)):
+                            denied.append(name)
+                        checked[0] += 1
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            if not stop.is_set():
+                finished.append(threading.current_thread().name)
+
+    threads = [threading.Thread(target=check_continuously) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    reloads = 0
+    deadline = time.monotonic() + 2
+    try:
+        with app.app_context():
+            while time.monotonic() < deadline:
+                permission_resolver.compile(permissions, hierarchy, granted)
+                permission_resolver.apply([grant])
+                reloads += 1
+    finally:
+        stop.set()
+    for thread in threads:
+        thread.join()
+    ok = checked[0] and not denied and not errors and not finished
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {checked[0]:,} checks during {reloads} reloads and grants, "
+          f'{len(denied)} denied, {len(errors)} errors {errors[:1]}, {len(finished)} threads stopped early')
+
+    # Dropping a role leaves its children as roots with only their own grants
+    dropped = next(role_id for role_id in role_ids if parents[role_id] is None
+                   and any(parents[child] == role_id for child in role_ids))
+    children = [role_id for role_id in role_ids if parents[role_id] == dropped]
+    with app.app_context():
+        grants = {}
+        for role_id, name in db.session.query(RolePermission.role_id, Permission.permission_name).join(Permission):
+            grants.setdefault(role_id, set()).add(name)
+        permission_resolver.load()
+        permission_resolver.apply([('drop_role', dropped)])
+        remaining = {role_id: None if parent == dropped else parent
+                     for role_id, parent in parents.items() if role_id != dropped}
+        wrong = sum(set(permission_resolver.names((role_id,))) != walk(role_id, remaining, grants)
+                    for role_id in remaining)
+        ghost = permission_resolver.names((dropped,))
+        restored = dropped in permission_resolver._masks.closure
+    ok = not wrong and not ghost and not restored
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} dropped a role with {len(children)} children: {wrong} masks differ, "
+          f"{len(ghost)} permissions left on the dropped role{', which has a mask again' if restored else ''}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Check that list endpoints issue a bounded number of SQL statements.
+
+Each endpoint is requested with a small and a large page, with and without a
+?fields= projection; all must stay within the budget, so the statement count
+cannot grow with page size and a projection cannot trigger lazy loads.
+
+Usage: python benchmarks/query_budget.py
+"""
+import sys
+
+from common import make_app, seed, db
+from src.services.query_stats import count_queries
+
+# Maximum statements per request: one COUNT for pagination plus the page query
+QUERY_BUDGETS = {
+    '/api/vehicles/': 2,
+    '/api/reservations/': 2,
+    '/api/customers/': 2,
+    '/api/financial/payments': 2,
+    '/api/financial/invoices': 2,
+}
+
+# A narrow ?fields= selection per endpoint, including nested relation fields
+FIELD_SELECTIONS = {
+    '/api/vehicles/': 'vehicle_id,license_plate,status,category.category_code',
+    '/api/reservations/': 'reservation_number,rental_duration_days,customer.user.email,assigned_vehicle.license_plate',
+    '/api/customers/': 'customer_number,user.email',
+    '/api/financial/payments': 'amount,status,reservation.reservation_number',
+    '/api/financial/invoices': 'invoice_number,balance_due,customer',
+}
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        seed(reservation_count=200, vehicle_count=120, customer_count=120)
+        engine = db.engine
+
+    client = app.test_client()
+    failures = 0
+    for path, budget in QUERY_BUDGETS.items():
+        for per_page, fields in ((10, None), (100, None), (100, FIELD_SELECTIONS[path])):
+            query_string = {'per_page': per_page}
+            if fields:
+                query_string['fields'] = fields
+            with app.app_context(), count_queries(engine) as counter:
+                response = client.get(path, query_string=query_string)
+            ok = response.status_code == 200 and counter.count <= budget
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {path} per_page={per_page}{' fields' if fields else ''}: "
+                  f'{counter.count} statements (budget {budget}), status {response.status_code}')
+            if not ok:
+                for statement in counter.statements:
+                    print('     ', statement.splitlines()[0][:120])
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
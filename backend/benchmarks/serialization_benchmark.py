@@ -0,0 +1,104 @@
+"""Compare to_dict() + jsonify with the compiled encoders + json_response.
+
+Pages of 100 rows with the same nesting as the list routes are encoded both
+ways; the decoded JSON must be identical. Reports the time per page.
+
+Usage: python benchmarks/serialization_benchmark.py [--pages N]
+"""
+import argparse
+import json
+import time
+
+from flask import jsonify
+from sqlalchemy.orm import joinedload
+
+from common import make_app, seed, db
+from src.models.customer import Customer
+from src.models.reservation import Reservation
+from src.models.vehicle import Vehicle
+from src.models.financial import Payment, Invoice
+from src.services import serialization
+from src.services.serialization import serialize, json_response
+
+
+def reservation_page_old(reservations):
+    page = []
+    for reservation in reservations:
+        data = reservation.to_dict()
+        data['customer'] = reservation.customer.to_dict()
+        data['customer']['user'] = reservation.customer.user.to_dict()
+        data['vehicle_category'] = reservation.vehicle_category.to_dict()
+        data['pickup_location'] = reservation.pickup_location.to_dict()
+        data['return_location'] = reservation.return_location.to_dict()
+        if reservation.assigned_vehicle:
+            data['assigned_vehicle'] = reservation.assigned_vehicle.to_dict()
+        page.append(data)
+    return page
+
+
+def reservation_page_new(reservations):
+    page = []
+    for reservation in reservations:
+        data = serialize(reservation)
+        data['customer'] = serialize(reservation.customer)
+        data['customer']['user'] = serialize(reservation.customer.user)
+        data['vehicle_category'] = serialize(reservation.vehicle_category)
+        data['pickup_location'] = serialize(reservation.pickup_location)
+        data['return_location'] = serialize(reservation.return_location)
+        if reservation.assigned_vehicle:
+            data['assigned_vehicle'] = serialize(reservation.assigned_vehicle)
+        page.append(data)
+    return page
+
+
+def flat_page_old(rows):
+    return [row.to_dict() for row in rows]
+
+
+def flat_page_new(rows):
+    return [serialize(row) for row in rows]
+
+
+def measure(render, pages):
+    started = time.perf_counter()
+    for _ in range(pages):
+        response = render()
+    return (time.perf_counter() - started) / pages, response.get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=300)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.test_request_context():
+        seed(reservation_count=400, vehicle_count=100, customer_count=100)
+        cases = {
+            'reservations (nested)': (
+                Reservation.query.options(
+                    joinedload(Reservation.customer).joinedload(Customer.user),
+                    joinedload(Reservation.vehicle_category),
+                    joinedload(Reservation.pickup_location),
+                    joinedload(Reservation.return_location),
+                    joinedload(Reservation.assigned_vehicle),
+                ).limit(100).all(),
+                reservation_page_old, reservation_page_new
+            ),
+            'vehicles': (Vehicle.query.limit(100).all(), flat_page_old, flat_page_new),
+            'payments': (Payment.query.limit(100).all(), flat_page_old, flat_page_new),
+            'invoices': (Invoice.query.limit(100).all(), flat_page_old, flat_page_new),
+        }
+
+        backend = 'orjson' if serialization.orjson is not None else 'json'
+        print(f'{args.pages} pages of up to 100 rows, fast path backend: {backend}')
+        for name, (rows, old, new) in cases.items():
+            old_time, old_body = measure(lambda: jsonify({'items': old(rows)}), args.pages)
+            new_time, new_body = measure(lambda: json_response({'items': new(rows)}), args.pages)
+            assert json.loads(old_body) == json.loads(new_body), name
+            print(f'{name:24} to_dict+jsonify {old_time * 1000:7.2f} ms   '
+                  f'encoders+{backend} {new_time * 1000:7.2f} ms   {old_time / new_time:4.1f}x')
+
+
+if __name__ == '__main__':
+    main()
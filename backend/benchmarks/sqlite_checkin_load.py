@@ -0,0 +1,135 @@
+"""Check-in throughput on a SQLite file database under concurrent clients.
+
+Each client thread checks in confirmed reservations taken from a shared
+queue until none are left. Run with --no-serialize to turn off the writer
+lock and see the "database is locked" failures it prevents. With the lock
+on, it also checks that read-only POSTs (quotes, token checks) are answered
+while another writer holds the lock.
+
+Usage: python benchmarks/sqlite_checkin_load.py [--clients 50] [--reservations 2000] [--no-serialize]
+"""
+import argparse
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from common import create_app, seed, db
+from src.services.sqlite_mode import writer_lock_for
+from src.models.reservation import Reservation
+
+
+def run_client(app, work, results):
+    client = app.test_client()
+    while True:
+        try:
+            reservation_id = work.get_nowait()
+        except queue.Empty:
+            return
+        started = time.perf_counter()
+        response = client.post(f'/api/reservations/{reservation_id}/checkin', json={'pickup_mileage': 100})
+        elapsed = time.perf_counter() - started
+        error = None if response.status_code == 200 else response.get_json().get('error', response.status_code)
+        results.append((elapsed, error))
+
+
+def read_only_posts_while_locked(app, seeded):
+    """Status codes of a quote and a token check sent while another thread holds
+    the writer lock, or None for a request still waiting after 5 seconds"""
+    held, done = threading.Event(), threading.Event()
+
+    def writer():
+        with app.app_context(), writer_lock_for(app):
+            held.set()
+            done.wait(10)
+
+    statuses = {}
+
+    def reader():
+        client = app.test_client()
+        statuses['quotes'] = client.post('/api/vehicles/quotes', json=[{
+            'category_id': seeded['category_id'], 'pickup_location_id': seeded['locations'][0],
+            'pickup_datetime': '2030-01-01T10:00:00', 'return_datetime': '2030-01-04T10:00:00'}]).status_code
+        statuses['verify-token'] = client.post('/api/auth/verify-token', json={'token': 'x'}).status_code
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    held.wait()
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    reader_thread.join(5)
+    done.set()
+    writer_thread.join()
+    return {path: statuses.get(path) for path in ('quotes', 'verify-token')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--reservations', type=int, default=2000)
+    parser.add_argument('--no-serialize', action='store_true', help='disable the SQLite writer lock')
+    args = parser.parse_args()
+
+    if args.no_serialize:
+        os.environ['SQLITE_SERIALIZE_WRITES'] = '0'
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'app.db')}",
+            'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+            # One connection per client so the pool is not the bottleneck
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': args.clients, 'max_overflow': 0}
+        }, init_db=False)
+        with app.app_context():
+            db.create_all()
+            # Every other seeded reservation is confirmed with a vehicle assigned
+            seeded = seed(reservation_count=args.reservations * 2, vehicle_count=200, customer_count=100)
+            confirmed = [reservation_id for (reservation_id,) in
+                         db.session.query(Reservation.reservation_id).filter_by(status='confirmed')]
+            journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+        work = queue.Queue()
+        for reservation_id in confirmed:
+            work.put(reservation_id)
+
+        results = []
+        threads = [threading.Thread(target=run_client, args=(app, work, results)) for _ in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        read_only_statuses = None if args.no_serialize else read_only_posts_while_locked(app, seeded)
+
+        with app.app_context():
+            checked_in = Reservation.query.filter_by(status='in_progress').count()
+            db.engine.dispose()
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+
+    print(f"journal_mode={journal_mode}, writer lock {'off' if args.no_serialize else 'on'}, {args.clients} clients")
+    print(f'{len(results)} check-ins in {elapsed:.2f}s: {len(results) / elapsed:,.0f}/s, '
+          f'{checked_in} committed, {sum(errors.values())} failed')
+    print(f'latency p50 {statistics.median(latencies) * 1000:.1f} ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms')
+    for error, count in sorted(errors.items(), key=lambda item: -item[1]):
+        print(f'  {count} x {str(error)[:100]}')
+    blocked = False
+    if read_only_statuses is not None:
+        blocked = read_only_statuses != {'quotes': 200, 'verify-token': 200}
+        print(f"{'FAIL' if blocked else 'ok  '} read-only POSTs while the writer lock is held: {read_only_statuses}")
+
+    sys.exit(1 if errors or blocked or checked_in != len(confirmed) else 0)
+
+
+if __name__ == '__main__':
+    main()
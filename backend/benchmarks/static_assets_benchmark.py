@@ -0,0 +1,162 @@
+"""Static files from the in-memory manifest against the previous catch-all route.
+
+Builds a frontend the way Vite lays it out (index.html, a hashed JS and CSS
+bundle under assets/, favicon.ico) in a temporary static folder and checks
+the caching headers: immutable for hashed bundles, a short max-age for
+index.html and client-side routes, 304 for If-None-Match and
+If-Modified-Since, compressed bodies that decode to the file, and 404
+rather than index.html for a bundle of an older build. Then times a page
+load (index.html plus the bundles) against the previous route, which
+checked os.path.exists() and sent each file uncompressed from disk, and
+compares the bytes sent.
+
+Usage: python benchmarks/static_assets_benchmark.py [--loads N]
+"""
+import argparse
+import gzip
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+from flask import send_from_directory
+
+from common import make_app
+from src.services import static_assets
+from src.services.static_assets import precompress
+
+BUNDLE = 'assets/index-BqRZ3x5e.js'
+STYLES = 'assets/index-C8xT0aQf.css'
+PAGE_LOAD = ['/', '/' + BUNDLE, '/' + STYLES, '/favicon.ico']
+
+
+def build_frontend(folder):
+    """A static folder shaped like `vite build` output, ~600KB of JS"""
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))) for _ in range(800)]
+    script = '\n'.join(f'function {random.choice(words)}{i}(a,b){{return a.{random.choice(words)}(b)+"{random.choice(words)}"}}'
+                       for i in range(12000))
+    styles = '\n'.join(f'.{random.choice(words)}-{i}{{margin:{i % 16}px;color:#{i % 4096:03x}}}' for i in range(6000))
+    os.makedirs(os.path.join(folder, 'assets'))
+    files = {
+        'index.html': f'<!doctype html><html><head><script type="module" src="/{BUNDLE}"></script>'
+                      f'<link rel="stylesheet" href="/{STYLES}"></head><body><div id="root"></div></body></html>',
+        BUNDLE: script,
+        STYLES: styles,
+    }
+    for name, content in files.items():
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(content)
+    with open(os.path.join(folder, 'favicon.ico'), 'wb') as f:
+        f.write(bytes(16) * 900)
+
+
+def legacy_app(folder):
+    """The app with the catch-all route as it was: a stat per request, files sent as they are"""
+    app = make_app()
+    app.static_folder = folder
+
+    def serve(path):
+        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
+            return send_from_directory(app.static_folder, path)
+        return send_from_directory(app.static_folder, 'index.html')
+    app.view_functions['serve'] = serve
+    return app
+
+
+def page_loads(app, loads, headers):
+    """(seconds per page load, bytes per page load)"""
+    client = app.test_client()
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(loads):
+        for path in PAGE_LOAD:
+            response = client.get(path, headers=headers)
+            sent += len(response.get_data())
+            response.close()
+    return (time.perf_counter() - started) / loads, sent // loads
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return not ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--loads', type=int, default=300)
+    args = parser.parse_args()
+    failures = 0
+
+    folder = tempfile.mkdtemp()
+    build_frontend(folder)
+    started = time.perf_counter()
+    written = precompress(folder)
+    print(f'precompressed {written} files in {time.perf_counter() - started:.2f}s '
+          f'(brotli {"on" if static_assets.brotli else "not installed"})')
+
+    app = make_app()
+    app.static_folder = folder
+    client = app.test_client()
+    with open(os.path.join(folder, BUNDLE), 'rb') as f:
+        bundle = f.read()
+
+    response = client.get('/' + BUNDLE, headers={'Accept-Encoding': 'gzip'})
+    failures += check(f"hashed bundle: {response.headers['Cache-Control']}, "
+                      f"{len(bundle)} bytes sent as {len(response.data)} {response.content_encoding}",
+                      response.headers['Cache-Control'] == static_assets.IMMUTABLE_CACHE_CONTROL
+                      and response.content_encoding == 'gzip' and gzip.decompress(response.data) == bundle
+                      and 'Accept-Encoding' in response.vary)
+    if static_assets.brotli:
+        response = client.get('/' + BUNDLE, headers={'Accept-Encoding': 'gzip, br'})
+        failures += check(f'brotli preferred: {len(response.data)} bytes',
+                          response.content_encoding == 'br'
+                          and static_assets.brotli.decompress(response.data) == bundle)
+    response = client.get('/' + BUNDLE)
+    failures += check('identity without Accept-Encoding', response.data == bundle and not response.content_encoding)
+
+    response = client.get('/' + BUNDLE, headers={'Accept-Encoding': 'gzip'})
+    etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+    response = client.get('/' + BUNDLE, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    failures += check(f'If-None-Match {etag}: {response.status_code}, {len(response.data)} bytes',
+                      response.status_code == 304 and not response.data)
+    response = client.get('/' + BUNDLE, headers={'If-Modified-Since': last_modified})
+    failures += check(f'If-Modified-Since {last_modified}: {response.status_code}', response.status_code == 304)
+    response = client.get('/' + BUNDLE, headers={'If-None-Match': '"stale"', 'If-Modified-Since': last_modified})
+    failures += check(f'stale ETag wins over If-Modified-Since: {response.status_code}', response.status_code == 200)
+
+    for path in ('/', '/reservations/42'):
+        response = client.get(path)
+        failures += check(f"{path}: index.html with {response.headers['Cache-Control']}",
+                          b'<div id="root">' in response.data
+                          and response.headers['Cache-Control'].startswith(
+                              f'public, max-age={static_assets.STATIC_INDEX_MAX_AGE},'))
+    response = client.get('/favicon.ico')
+    failures += check(f"favicon.ico: {response.headers['Cache-Control']}",
+                      response.headers['Cache-Control'] == f'public, max-age={static_assets.STATIC_MAX_AGE}')
+    response = client.get('/assets/index-Old1234x.js')
+    failures += check(f'bundle of an older build: {response.status_code}', response.status_code == 404)
+
+    browser = {'Accept-Encoding': 'gzip, deflate, br'}
+    old = legacy_app(folder)
+    page_loads(old, 10, browser)
+    page_loads(app, 10, browser)
+    old_time, old_bytes = page_loads(old, args.loads, browser)
+    new_time, new_bytes = page_loads(app, args.loads, browser)
+    print(f'previous route:  {old_time * 1000:6.2f}ms, {old_bytes / 1024:7.1f}KB per page load')
+    print(f'manifest:        {new_time * 1000:6.2f}ms, {new_bytes / 1024:7.1f}KB per page load')
+    failures += check(f'{old_time / new_time:.1f}x faster, {old_bytes / new_bytes:.1f}x fewer bytes',
+                      new_time < old_time and new_bytes < old_bytes)
+
+    revalidation = {**browser, 'If-None-Match': client.get('/', headers=browser).headers['ETag']}
+    started = time.perf_counter()
+    for _ in range(args.loads):
+        client.get('/', headers=revalidation)
+    print(f'index.html revalidation: {(time.perf_counter() - started) / args.loads * 1000:.2f}ms per 304')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
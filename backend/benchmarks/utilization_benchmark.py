@@ -0,0 +1,149 @@
+"""Fleet utilization over 1M reservations.
+
+Times compute_utilization() on 1M reservation intervals for 10k vehicles
+with daily buckets over a year and checks it against a plain Python loop
+on a sample. Then times GET /api/financial/reports/utilization end to end
+on a SQLite file, which adds loading the rows from the database.
+
+Usage: python benchmarks/utilization_benchmark.py [--reservations N] [--vehicles N] [--db-reservations N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from common import make_app, db
+from src.models.vehicle import Vehicle, VehicleCategory
+from src.models.location import Location
+from src.models.reservation import Reservation
+from src.models.user import User
+from src.models.customer import Customer
+from src.services.utilization import compute_utilization, bucket_edges
+
+START = datetime(2025, 1, 1)
+END = datetime(2026, 1, 1)
+EPOCH = datetime(1970, 1, 1)
+
+
+def intervals(reservations, vehicles, rng):
+    """Back-to-back rentals of 2 hours to 5 days per vehicle with gaps of up to 2 days"""
+    per_vehicle = -(-reservations // vehicles)
+    durations = rng.integers(2 * 3600, 5 * 86400, (vehicles, per_vehicle))
+    gaps = rng.integers(0, 2 * 86400, (vehicles, per_vehicle))
+    # Start a week before the range so some rentals cross its start
+    first = int((START - timedelta(days=7) - EPOCH).total_seconds()) + rng.integers(0, 86400, (vehicles, 1))
+    returns = first + np.cumsum(gaps + durations, axis=1)
+    pickups = returns - durations
+    vehicle_index = np.repeat(np.arange(vehicles), per_vehicle)
+    revenue = rng.uniform(30, 900, vehicles * per_vehicle).round(2)
+    keep = slice(0, reservations)
+    return (vehicle_index[keep], pickups.ravel()[keep].astype(np.int64), returns.ravel()[keep].astype(np.int64),
+            revenue[keep])
+
+
+def reference(vehicle_count, vehicle_index, pickups, returns, revenue, start, end, edges):
+    """The same figures with a Python loop over every reservation and bucket"""
+    occupied = [0.0] * vehicle_count
+    earned = [0.0] * vehicle_count
+    bucket_occupied = [0.0] * (len(edges) - 1)
+    bucket_revenue = [0.0] * (len(edges) - 1)
+    for vehicle, pickup, dropoff, amount in zip(vehicle_index, pickups, returns, revenue):
+        rate = amount / max(dropoff - pickup, 1)
+        inside = max(min(dropoff, end) - max(pickup, start), 0)
+        occupied[vehicle] += inside
+        earned[vehicle] += inside * rate
+        for b in range(len(edges) - 1):
+            overlap = max(min(dropoff, edges[b + 1]) - max(pickup, edges[b]), 0)
+            bucket_occupied[b] += overlap
+            bucket_revenue[b] += overlap * rate
+    return occupied, earned, bucket_occupied, bucket_revenue
+
+
+def seed_database(count, vehicle_count, rng):
+    location_id, category_id, user_id = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    db.session.execute(Location.__table__.insert(), [{
+        'location_id': location_id, 'location_code': 'L0', 'location_name': 'Airport', 'location_type': 'airport',
+        'street_address': '1 Terminal Road', 'city': 'City', 'country': 'USA'}])
+    db.session.execute(VehicleCategory.__table__.insert(), [{
+        'category_id': category_id, 'category_name': 'Economy', 'category_code': 'ECON', 'base_daily_rate': 40,
+        'deposit_amount': 200, 'passenger_capacity': 4, 'is_active': True}])
+    vehicle_ids = [str(uuid.uuid4()) for _ in range(vehicle_count)]
+    db.session.execute(Vehicle.__table__.insert(), [{
+        'vehicle_id': vehicle_id, 'vehicle_number': f'V{i:05d}', 'license_plate': f'P{i:06d}', 'vin': f'VIN{i:014d}',
+        'category_id': category_id, 'make': 'Toyota', 'model': 'Corolla', 'year': 2024, 'status': 'available',
+        'is_active': True, 'current_location_id': location_id} for i, vehicle_id in enumerate(vehicle_ids)])
+    db.session.execute(User.__table__.insert(), [{
+        'user_id': user_id, 'email': 'fleet@example.com', 'password_hash': 'x', 'first_name': 'Fleet',
+        'last_name': 'Customer', 'user_type': 'customer', 'status': 'active'}])
+    db.session.execute(Customer.__table__.insert(), [{'customer_id': user_id, 'customer_number': 'CUST00001'}])
+
+    vehicle_index, pickups, returns, revenue = intervals(count, vehicle_count, rng)
+    for offset in range(0, count, 50000):
+        db.session.execute(Reservation.__table__.insert(), [{
+            'reservation_id': str(uuid.uuid4()), 'reservation_number': f'R{i:09d}', 'customer_id': user_id,
+            'vehicle_category_id': category_id, 'assigned_vehicle_id': vehicle_ids[vehicle_index[i]],
+            'pickup_location_id': location_id, 'return_location_id': location_id,
+            'pickup_datetime': EPOCH + timedelta(seconds=int(pickups[i])),
+            'return_datetime': EPOCH + timedelta(seconds=int(returns[i])),
+            'status': 'completed', 'total_actual_cost': float(revenue[i])
+        } for i in range(offset, min(offset + 50000, count))])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--db-reservations', type=int, default=200000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+    failures = 0
+
+    edges = bucket_edges(START, END, 'day')
+    start, end = int(edges[0]), int(edges[-1])
+    data = intervals(args.reservations, args.vehicles, rng)
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        (occupied, earned, _), (bucket_occupied, bucket_revenue) = compute_utilization(
+            args.vehicles, *data, start, end, edges)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    ok = best < 1.0
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} compute: {args.reservations:,} reservations, {args.vehicles:,} vehicles, "
+          f'{len(edges) - 1} daily buckets in {best * 1000:.0f}ms (best of 5)')
+
+    # Python loop on a sample, per bucket, as the reference
+    sample = [column[:2000] for column in data]
+    expected = reference(args.vehicles, *sample, start, end, edges)
+    (occupied, earned, _), (bucket_occupied, bucket_revenue) = compute_utilization(args.vehicles, *sample, start, end, edges)
+    ok = all(np.allclose(got, want, rtol=1e-9, atol=1e-3) for got, want in
+             zip((occupied, earned, bucket_occupied, bucket_revenue), expected))
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} matches a Python loop over {len(sample[0]):,} reservations and every bucket")
+
+    app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'utilization.db')}")
+    with app.app_context():
+        seed_database(args.db_reservations, 2000, rng)
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.get('/api/financial/reports/utilization?start_date=2025-01-01&end_date=2025-12-31&bucket=week')
+    elapsed = time.perf_counter() - started
+    report = response.get_json()
+    ok = response.status_code == 200 and report['summary']['rentals'] > 0
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} endpoint: {args.db_reservations:,} reservations from SQLite in "
+          f"{elapsed * 1000:.0f}ms, utilization {report['summary']['utilization']:.1%}, "
+          f"{report['summary']['revenue_per_available_day']} revenue per available vehicle-day")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
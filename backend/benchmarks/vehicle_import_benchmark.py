@@ -0,0 +1,139 @@
+"""Compare one bulk import with one create_vehicle call per vehicle.
+
+Imports the same fleet through POST /api/vehicles/ per vehicle and through
+POST /api/vehicles/import as JSON and CSV, each on a fresh SQLite file, and
+checks that rejected rows are reported without blocking the valid ones.
+An import stopped after some chunks are committed and resumed from its
+last checkpoint must end with the result of an uninterrupted one.
+
+Usage: python benchmarks/vehicle_import_benchmark.py [--vehicles N]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+from common import make_app, seed, db
+from src.models.vehicle import Vehicle
+from src.services.vehicle_import import import_vehicles
+
+
+def fleet(count, category_id):
+    return [{
+        'vehicle_number': f'NEW{i:06d}',
+        'license_plate': f'NP{i:06d}',
+        'vin': f'NEWVIN{i:011d}',
+        'category_id': category_id,
+        'make': 'Honda',
+        'model': 'Civic',
+        'year': 2025,
+        'purchase_date': '2025-03-01',
+        'purchase_price': 24500
+    } for i in range(count)]
+
+
+def fresh_app():
+    app = make_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import.db')}")
+    with app.app_context():
+        ids = seed(reservation_count=1, vehicle_count=1, customer_count=1)
+    return app, ids
+
+
+def vehicle_count(app):
+    with app.app_context():
+        return db.session.query(Vehicle).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=2000)
+    args = parser.parse_args()
+    failures = 0
+
+    app, ids = fresh_app()
+    client = app.test_client()
+    started = time.perf_counter()
+    for vehicle in fleet(args.vehicles, ids['category_id']):
+        client.post('/api/vehicles/', json=vehicle)
+    single = time.perf_counter() - started
+    print(f'create_vehicle x {args.vehicles}: {single:6.2f}s, {vehicle_count(app) - 1} vehicles')
+
+    app, ids = fresh_app()
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/api/vehicles/import', json=fleet(args.vehicles, ids['category_id']))
+    bulk = time.perf_counter() - started
+    ok = response.status_code == 201 and response.get_json()['imported'] == args.vehicles
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} JSON import:  {bulk:6.2f}s, {vehicle_count(app) - 1} vehicles, "
+          f'{single / bulk:.0f}x faster')
+
+    app, ids = fresh_app()
+    client = app.test_client()
+    buffer = io.StringIO()
+    rows = fleet(args.vehicles, ids['category_id'])
+    for row in rows:
+        del row['category_id']
+        row['category_code'] = 'econ'
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    started = time.perf_counter()
+    response = client.post('/api/vehicles/import', data=buffer.getvalue(), content_type='text/csv')
+    elapsed = time.perf_counter() - started
+    ok = response.status_code == 201 and response.get_json()['imported'] == args.vehicles
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} CSV import:   {elapsed:6.2f}s, {vehicle_count(app) - 1} vehicles")
+
+    # Row 1 repeats row 0, row 2 reuses the seeded plate, row 3 lacks a year,
+    # rows 4-6 hold an object, a list and a number where strings belong
+    app, ids = fresh_app()
+    client = app.test_client()
+    mixed = fleet(8, ids['category_id'])
+    mixed[1]['vin'] = mixed[0]['vin']
+    mixed[2]['license_plate'] = 'PLATE00000'
+    del mixed[3]['year']
+    mixed[4]['make'] = {}
+    mixed[5]['color'] = []
+    del mixed[6]['category_id']
+    mixed[6]['category_code'] = 5
+    response = client.post('/api/vehicles/import', json={'vehicles': mixed})
+    result = response.get_json()
+    ok = (response.status_code == 207 and result['imported'] == 2
+          and [error['row'] for error in result['errors']] == [1, 2, 3, 4, 5, 6])
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} mixed batch: status {response.status_code}, {result['imported']} imported, "
+          f"errors {[(error['row'], error['errors']) for error in result['errors']]}")
+
+    # Stop after the second chunk of three rows, as a job whose worker fails
+    # would, then resume from the checkpoint saved with the last commit
+    app, ids = fresh_app()
+    mixed = fleet(12, ids['category_id'])
+    mixed[7]['vin'] = mixed[2]['vin']
+    mixed[9]['license_plate'] = 'PLATE00000'
+    checkpoints = []
+
+    def stop_after_two_chunks(done):
+        if done >= 6:
+            raise RuntimeError('worker stopped')
+
+    with app.app_context():
+        try:
+            import_vehicles(mixed, chunk_size=3, on_progress=stop_after_two_chunks, on_commit=checkpoints.append)
+        except RuntimeError:
+            pass
+        result = import_vehicles(mixed, chunk_size=3, resume=checkpoints[-1], on_commit=checkpoints.append)
+    ok = (result['imported'] == vehicle_count(app) - 1 == 10
+          and [error['row'] for error in result['errors']] == [7, 9])
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} resumed at row {checkpoints[1]['next_row']}: {result['imported']} imported, "
+          f"errors {[(error['row'], error['errors']) for error in result['errors']]}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Gunicorn configuration for the Car Rental ERP API.
+
+Usage: gunicorn -c gunicorn.conf.py src.main:app
+
+Every setting can be overridden from the environment. The schema and sample
+data are created once in the master process before workers are forked, so
+workers start without racing on db.create_all() and the admin seeding, and
+the static files are precompressed there too.
+"""
+import multiprocessing
+import os
+
+# Server socket
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5001')}")
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+# Worker processes: the usual (2 x cores) + 1, threaded by default because
+# requests spend most of their time waiting on the database
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Restart workers periodically to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Logging
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Workers inherit this and skip database initialization in create_app()
+os.environ['ERP_INIT_DB'] = '0'
+
+# Background jobs are processed by `flask --app src.main jobs worker`, not web workers
+os.environ.setdefault('JOBS_IN_PROCESS', '0')
+
+# Each worker holds its own pool; size it for the worker's threads unless set
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+
+def on_starting(server):
+    """Create the schema and default data once, before any worker starts"""
+    from src.main import create_app, init_database, db
+    from src.services.static_assets import precompress
+
+    app = create_app(init_db=False)
+    init_database(app)
+    try:
+        # Workers load these instead of each compressing the frontend build
+        server.log.info('Static files compressed: %d', precompress(app.static_folder))
+    except OSError as e:
+        server.log.warning('Static files not precompressed, workers compress in memory: %s', e)
+    with app.app_context():
+        # Don't hand connections opened in the master to forked workers
+        db.engine.dispose()
+    server.log.info('Database initialized')
+
+
+def post_fork(server, worker):
+    """Drop any pooled connections inherited from the master and hash
+    passwords on this worker's own process pool"""
+    from src.main import app, db
+    from src.services.passwords import password_hasher, PASSWORD_HASH_WORKERS
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    password_hasher.workers = PASSWORD_HASH_WORKERS
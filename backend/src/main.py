@@ -3,8 +3,10 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, current_app
 from flask_cors import CORS
+from sqlalchemy.exc import IntegrityError
+import click
 
 # Import all models
 from src.models.user import db, User, UserRole, UserRoleAssignment, Permission, RolePermission
@@ -12,8 +14,9 @@ from src.models.customer import Customer, CustomerAddress
 from src.models.vehicle import VehicleCategory, Vehicle, VehicleFeature, VehicleFeatureAssignment
 from src.models.location import Location
 from src.models.reservation import Reservation, RentalAgreement
-from src.models.financial import Payment, Invoice, PricingRule
+from src.models.financial import Payment, Invoice, PricingRule, DailyRevenueSummary, DailyReservationSummary
 from src.models.maintenance import MaintenanceSchedule, DamageReport
+from src.models.job import BackgroundJob
 
 # Import routes
 from src.routes.user import user_bp
@@ -24,156 +27,267 @@ from src.routes.location import location_bp
 from src.routes.reservation import reservation_bp
 from src.routes.financial import financial_bp
 from src.routes.maintenance import maintenance_bp
+from src.routes.jobs import jobs_bp
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'car_rental_erp_secret_key_2025'
-
-# Enable CORS for all routes
-CORS(app, origins="*")
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(user_bp, url_prefix='/api/users')
-app.register_blueprint(customer_bp, url_prefix='/api/customers')
-app.register_blueprint(vehicle_bp, url_prefix='/api/vehicles')
-app.register_blueprint(location_bp, url_prefix='/api/locations')
-app.register_blueprint(reservation_bp, url_prefix='/api/reservations')
-app.register_blueprint(financial_bp, url_prefix='/api/financial')
-app.register_blueprint(maintenance_bp, url_prefix='/api/maintenance')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Create all database tables
-with app.app_context():
-    db.create_all()
-    
-    # Create default admin user if it doesn't exist
-    admin_user = User.query.filter_by(email='admin@carrental.com').first()
-    if not admin_user:
-        admin_user = User(
-            email='admin@carrental.com',
-            first_name='System',
-            last_name='Administrator',
-            user_type='admin',
-            status='active',
-            email_verified=True
-        )
-        admin_user.set_password('admin123')
-        db.session.add(admin_user)
-        
-        # Create default roles
-        admin_role = UserRole(
-            role_name='System Administrator',
-            role_description='Full system access and administration',
-            is_system_role=True
-        )
-        manager_role = UserRole(
-            role_name='Business Manager',
-            role_description='Business operations and reporting access',
-            is_system_role=True
-        )
-        agent_role = UserRole(
-            role_name='Rental Agent',
-            role_description='Customer service and rental operations',
-            is_system_role=True
-        )
-        
-        db.session.add_all([admin_role, manager_role, agent_role])
-        db.session.commit()
-        
-        # Assign admin role to admin user
-        admin_assignment = UserRoleAssignment(
-            user_id=admin_user.user_id,
-            role_id=admin_role.role_id,
-            assigned_by=admin_user.user_id
-        )
-        db.session.add(admin_assignment)
-        
-        # Create sample vehicle categories
-        economy_category = VehicleCategory(
-            category_name='Economy',
-            category_code='ECON',
-            description='Compact and fuel-efficient vehicles',
-            base_daily_rate=29.99,
-            base_hourly_rate=4.99,
-            deposit_amount=200.00,
-            passenger_capacity=4,
-            luggage_capacity=2,
-            transmission_type='automatic',
-            fuel_type='gasoline'
-        )
-        
-        suv_category = VehicleCategory(
-            category_name='SUV',
-            category_code='SUV',
-            description='Sport Utility Vehicles for families and groups',
-            base_daily_rate=59.99,
-            base_hourly_rate=9.99,
-            deposit_amount=400.00,
-            passenger_capacity=7,
-            luggage_capacity=5,
-            transmission_type='automatic',
-            fuel_type='gasoline'
-        )
-        
-        db.session.add_all([economy_category, suv_category])
-        
-        # Create sample location
-        main_location = Location(
-            location_code='MAIN',
-            location_name='Main Office',
-            location_type='downtown',
-            street_address='123 Main Street',
-            city='Downtown',
-            state_province='CA',
-            postal_code='90210',
-            country='USA',
-            phone_number='(555) 123-4567',
-            capacity=50
-        )
-        main_location.set_operating_hours({
-            'monday': {'open': '08:00', 'close': '18:00'},
-            'tuesday': {'open': '08:00', 'close': '18:00'},
-            'wednesday': {'open': '08:00', 'close': '18:00'},
-            'thursday': {'open': '08:00', 'close': '18:00'},
-            'friday': {'open': '08:00', 'close': '18:00'},
-            'saturday': {'open': '09:00', 'close': '17:00'},
-            'sunday': {'open': '10:00', 'close': '16:00'}
-        })
-        
-        db.session.add(main_location)
-        db.session.commit()
-        
-        print("Database initialized with sample data")
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "Car Rental ERP API Server - Backend is running!", 200
-
-@app.route('/api/health')
-def health_check():
-    """Health check endpoint"""
-    return {
-        'status': 'healthy',
-        'service': 'Car Rental ERP API',
-        'version': '1.0.0'
+# Import CLI commands
+from src.services.revenue_rollup import rollup_cli
+from src.migrations import migrations_cli, run_migrations
+from src.services.jobs import jobs_cli, start_in_process_worker
+from src.services.static_assets import StaticAssets, assets_cli
+
+# Import database setup
+from src.services.sqlite_mode import configure_sqlite
+from src.services.cache import response_cache
+from src.services.metrics import configure_metrics
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def database_config():
+    """SQLAlchemy settings from the environment.
+
+    DATABASE_URL selects the database (SQLite under src/database by default).
+    Server databases get a connection pool sized by DB_POOL_SIZE and
+    DB_MAX_OVERFLOW, checked with pre-ping and recycled after DB_POOL_RECYCLE
+    seconds so connections dropped by MySQL's wait_timeout are not handed out.
+    """
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        database_dir = os.path.join(os.path.dirname(__file__), 'database')
+        os.makedirs(database_dir, exist_ok=True)
+        database_url = f"sqlite:///{os.path.join(database_dir, 'app.db')}"
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False
     }
+    if not database_url.startswith('sqlite'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', 'true')
+        }
+    return config
+
+
+def create_app(config=None, init_db=None):
+    """Build the Flask application.
+
+    config overrides the settings read from the environment. The schema and
+    sample data are created unless init_db is False or ERP_INIT_DB=0; the
+    gunicorn configuration does that once in the master process so workers
+    start without touching the schema.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'car_rental_erp_secret_key_2025')
+
+    # Enable CORS for all routes
+    CORS(app, origins=os.environ.get('CORS_ORIGINS', '*'))
+
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(user_bp, url_prefix='/api/users')
+    app.register_blueprint(customer_bp, url_prefix='/api/customers')
+    app.register_blueprint(vehicle_bp, url_prefix='/api/vehicles')
+    app.register_blueprint(location_bp, url_prefix='/api/locations')
+    app.register_blueprint(reservation_bp, url_prefix='/api/reservations')
+    app.register_blueprint(financial_bp, url_prefix='/api/financial')
+    app.register_blueprint(maintenance_bp, url_prefix='/api/maintenance')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+
+    # Register CLI commands (flask --app src.main rollup|migrations|jobs|assets|init-db)
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(migrations_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(init_db_command)
+
+    # Database configuration
+    app.config.update(config or database_config())
+    db.init_app(app)
+
+    # Server-Timing headers and per-route histograms at /api/metrics; registered
+    # first so the time spent waiting for the SQLite writer lock is included
+    configure_metrics(app, db)
+
+    # WAL pragmas and a serialized writer when running on a SQLite file
+    configure_sqlite(app, db)
+
+    # Background jobs run in this process unless a `flask jobs worker` handles them
+    if _env_flag('JOBS_IN_PROCESS', 'true'):
+        start_in_process_worker(app)
+
+    # The frontend build, served from memory with precompressed variants
+    static_assets = StaticAssets(app)
+    app.extensions['static_assets'] = static_assets
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        return static_assets.serve(path)
+
+    @app.route('/api/health')
+    def health_check():
+        """Health check endpoint"""
+        return {
+            'status': 'healthy',
+            'service': 'Car Rental ERP API',
+            'version': '1.0.0'
+        }
+
+    @app.route('/api/cache/stats')
+    def cache_stats():
+        """Response cache hit/miss counters"""
+        return response_cache.stats()
+
+    if init_db is None:
+        init_db = os.environ.get('ERP_INIT_DB', '1') != '0'
+    if init_db:
+        init_database(app)
+
+    return app
+
+
+def init_database(app):
+    """Create all tables, apply pending migrations and add the default admin
+    user, roles and sample data.
+
+    Safe to run repeatedly and from several processes at once: if another
+    process seeds first, the unique constraints reject our copy and we roll
+    back.
+    """
+    with app.app_context():
+        db.create_all()
+        run_migrations(db.engine, log=app.logger.info)
+        if User.query.filter_by(email='admin@carrental.com').first():
+            return
+        try:
+            _seed_sample_data()
+        except IntegrityError:
+            db.session.rollback()
+
+
+def _seed_sample_data():
+    # Create default admin user
+    admin_user = User(
+        email='admin@carrental.com',
+        first_name='System',
+        last_name='Administrator',
+        user_type='admin',
+        status='active',
+        email_verified=True
+    )
+    admin_user.set_password('admin123')
+    db.session.add(admin_user)
+    
+    # Create default roles
+    admin_role = UserRole(
+        role_name='System Administrator',
+        role_description='Full system access and administration',
+        is_system_role=True
+    )
+    manager_role = UserRole(
+        role_name='Business Manager',
+        role_description='Business operations and reporting access',
+        is_system_role=True
+    )
+    agent_role = UserRole(
+        role_name='Rental Agent',
+        role_description='Customer service and rental operations',
+        is_system_role=True
+    )
+    
+    db.session.add_all([admin_role, manager_role, agent_role])
+    db.session.commit()
+    
+    # Assign admin role to admin user
+    admin_assignment = UserRoleAssignment(
+        user_id=admin_user.user_id,
+        role_id=admin_role.role_id,
+        assigned_by=admin_user.user_id
+    )
+    db.session.add(admin_assignment)
+    
+    # Create sample vehicle categories
+    economy_category = VehicleCategory(
+        category_name='Economy',
+        category_code='ECON',
+        description='Compact and fuel-efficient vehicles',
+        base_daily_rate=29.99,
+        base_hourly_rate=4.99,
+        deposit_amount=200.00,
+        passenger_capacity=4,
+        luggage_capacity=2,
+        transmission_type='automatic',
+        fuel_type='gasoline'
+    )
+    
+    suv_category = VehicleCategory(
+        category_name='SUV',
+        category_code='SUV',
+        description='Sport Utility Vehicles for families and groups',
+        base_daily_rate=59.99,
+        base_hourly_rate=9.99,
+        deposit_amount=400.00,
+        passenger_capacity=7,
+        luggage_capacity=5,
+        transmission_type='automatic',
+        fuel_type='gasoline'
+    )
+    
+    db.session.add_all([economy_category, suv_category])
+    
+    # Create sample location
+    main_location = Location(
+        location_code='MAIN',
+        location_name='Main Office',
+        location_type='downtown',
+        street_address='123 Main Street',
+        city='Downtown',
+        state_province='CA',
+        postal_code='90210',
+        country='USA',
+        phone_number='(555) 123-4567',
+        capacity=50
+    )
+    main_location.set_operating_hours({
+        'monday': {'open': '08:00', 'close': '18:00'},
+        'tuesday': {'open': '08:00', 'close': '18:00'},
+        'wednesday': {'open': '08:00', 'close': '18:00'},
+        'thursday': {'open': '08:00', 'close': '18:00'},
+        'friday': {'open': '08:00', 'close': '18:00'},
+        'saturday': {'open': '09:00', 'close': '17:00'},
+        'sunday': {'open': '10:00', 'close': '16:00'}
+    })
+    
+    db.session.add(main_location)
+    db.session.commit()
+    
+    print("Database initialized with sample data")
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create the schema and default data."""
+    init_database(current_app)
+    click.echo('Database ready')
+
+
+def __getattr__(name):
+    # `app` (gunicorn src.main:app, flask --app src.main) is built on first
+    # access rather than on import: processes started with the spawn method
+    # import the parent's main module again, and must not build an app
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    create_app().run(host='0.0.0.0', port=5001, debug=True)
 
@@ -0,0 +1,82 @@
+from sqlalchemy import MetaData, Table, Column, String, DateTime, select
+from sqlalchemy.exc import IntegrityError
+from flask.cli import AppGroup
+from datetime import datetime
+import click
+
+from src.migrations import m0001_hot_path_indexes, m0002_optimistic_locking, m0003_revenue_rollups
+
+# Applied in order; a migration's VERSION must never change once released
+MIGRATIONS = [
+    m0001_hot_path_indexes,
+    m0002_optimistic_locking,
+    m0003_revenue_rollups,
+]
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('version', String(20), primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def pending_migrations(engine):
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration.VERSION not in applied]
+
+
+def run_migrations(engine, log=None):
+    """Apply every migration that is not yet recorded in schema_migrations.
+
+    Each migration runs in its own transaction together with its bookkeeping
+    row. Migrations must be idempotent (e.g. create indexes with
+    checkfirst=True), because db.create_all() already builds the current
+    schema on a fresh database.
+    """
+    applied = []
+    for migration in pending_migrations(engine):
+        try:
+            with engine.begin() as connection:
+                migration.upgrade(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=migration.VERSION,
+                    name=migration.NAME,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another process recorded this version first
+            continue
+        applied.append(migration.VERSION)
+        if log:
+            log(f'Applied migration {migration.VERSION} {migration.NAME}')
+    return applied
+
+
+migrations_cli = AppGroup('migrations', help='Apply versioned schema migrations.')
+
+
+@migrations_cli.command('upgrade')
+def upgrade_command():
+    """Apply all pending migrations."""
+    from src.models.user import db
+    applied = run_migrations(db.engine, log=click.echo)
+    click.echo(f'{len(applied)} migrations applied')
+
+
+@migrations_cli.command('status')
+def status_command():
+    """List migrations and whether they have been applied."""
+    from src.models.user import db
+    pending = {migration.VERSION for migration in pending_migrations(db.engine)}
+    for migration in MIGRATIONS:
+        state = 'pending' if migration.VERSION in pending else 'applied'
+        click.echo(f'{migration.VERSION} {migration.NAME}: {state}')
@@ -0,0 +1,57 @@
+"""Secondary indexes for the filter and sort columns used by the list routes,
+availability checks, dashboards and revenue rollups.
+
+The indexes are declared in the models' __table_args__; this migration adds
+them to databases created before they existed.
+"""
+from src.models.user import db
+
+VERSION = '0001'
+NAME = 'hot_path_indexes'
+
+INDEXES = {
+    'reservations': (
+        'ix_reservations_vehicle_status_period',
+        'ix_reservations_status_pickup',
+        'ix_reservations_pickup',
+        'ix_reservations_customer_created',
+        'ix_reservations_customer_pickup',
+    ),
+    'payments': (
+        'ix_payments_created',
+        'ix_payments_status_created',
+        'ix_payments_status_processed',
+        'ix_payments_customer_created',
+    ),
+    'invoices': (
+        'ix_invoices_created',
+        'ix_invoices_status_created',
+        'ix_invoices_customer_created',
+    ),
+    'vehicles': (
+        'ix_vehicles_location_status_category',
+        'ix_vehicles_status',
+        'ix_vehicles_category',
+    ),
+    'maintenance_schedules': (
+        'ix_maintenance_schedules_scheduled',
+        'ix_maintenance_schedules_status_scheduled',
+        'ix_maintenance_schedules_vehicle_scheduled',
+    ),
+    'damage_reports': (
+        'ix_damage_reports_incident',
+        'ix_damage_reports_status_incident',
+        'ix_damage_reports_vehicle_incident',
+        'ix_damage_reports_created',
+    ),
+    'customers': (
+        'ix_customers_created',
+    ),
+}
+
+
+def upgrade(connection):
+    for table_name, index_names in INDEXES.items():
+        indexes = {index.name: index for index in db.metadata.tables[table_name].indexes}
+        for index_name in index_names:
+            indexes[index_name].create(connection, checkfirst=True)
@@ -0,0 +1,18 @@
+"""version_id columns for optimistic locking of vehicles and reservations.
+
+Existing rows start at version 1; the mappers bump the column on every
+UPDATE and refuse to overwrite a row whose version changed since it was read.
+"""
+from sqlalchemy import inspect, text
+
+VERSION = '0002'
+NAME = 'optimistic_locking'
+
+TABLES = ('vehicles', 'reservations')
+
+
+def upgrade(connection):
+    for table_name in TABLES:
+        existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+        if 'version_id' not in existing:
+            connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN version_id INTEGER NOT NULL DEFAULT 1'))
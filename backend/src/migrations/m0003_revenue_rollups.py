@@ -0,0 +1,20 @@
+"""Daily revenue and reservation rollups behind the revenue report.
+
+db.create_all() adds the two tables to an existing database, but empty: the
+routes only record changes made after the upgrade. This migration fills them
+from every payment and reservation already stored, the same rebuild as
+`flask rollup backfill`.
+"""
+from src.models.user import db
+from src.services.revenue_rollup import backfill, history_bounds
+
+VERSION = '0003'
+NAME = 'revenue_rollups'
+
+TABLES = ('daily_revenue_summaries', 'daily_reservation_summaries')
+
+
+def upgrade(connection):
+    for table_name in TABLES:
+        db.metadata.tables[table_name].create(connection, checkfirst=True)
+    backfill(*history_bounds(connection), connection=connection)
@@ -30,6 +30,10 @@ class Customer(db.Model):
     payments = db.relationship('Payment', backref='customer', lazy=True)
     invoices = db.relationship('Invoice', backref='customer', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_customers_created', 'created_at', 'customer_id'),
+    )
+    
     def __repr__(self):
         return f'<Customer {self.customer_number}>'
     
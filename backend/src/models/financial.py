@@ -23,6 +23,14 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_payments_created', 'created_at', 'payment_id'),
+        db.Index('ix_payments_status_created', 'status', 'created_at'),
+        # Revenue rollup backfill and consistency checks
+        db.Index('ix_payments_status_processed', 'status', 'processed_at'),
+        db.Index('ix_payments_customer_created', 'customer_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Payment {self.payment_id} - {self.amount} {self.currency}>'
     
@@ -80,6 +88,12 @@ class Invoice(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_invoices_created', 'created_at', 'invoice_id'),
+        db.Index('ix_invoices_status_created', 'status', 'created_at'),
+        db.Index('ix_invoices_customer_created', 'customer_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
     
@@ -186,3 +200,43 @@ class PricingRule(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+class DailyRevenueSummary(db.Model):
+    __tablename__ = 'daily_revenue_summaries'
+    
+    summary_date = db.Column(db.Date, primary_key=True)
+    payment_type = db.Column(db.String(20), primary_key=True)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0.00)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyRevenueSummary {self.summary_date} {self.payment_type}>'
+    
+    def to_dict(self):
+        return {
+            'summary_date': self.summary_date.isoformat() if self.summary_date else None,
+            'payment_type': self.payment_type,
+            'total_amount': float(self.total_amount) if self.total_amount else 0.00,
+            'payment_count': self.payment_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class DailyReservationSummary(db.Model):
+    __tablename__ = 'daily_reservation_summaries'
+    
+    summary_date = db.Column(db.Date, primary_key=True)
+    reservations_started = db.Column(db.Integer, nullable=False, default=0)
+    reservations_completed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyReservationSummary {self.summary_date}>'
+    
+    def to_dict(self):
+        return {
+            'summary_date': self.summary_date.isoformat() if self.summary_date else None,
+            'reservations_started': self.reservations_started,
+            'reservations_completed': self.reservations_completed,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,76 @@
+from src.models.user import db
+from datetime import datetime
+import json
+import uuid
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    
+    job_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.Text)  # JSON arguments for the handler, cleared once the job finishes
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # earliest next attempt
+    locked_by = db.Column(db.String(100))  # worker holding the job while running
+    locked_until = db.Column(db.DateTime)  # lease; an expired lease lets another worker retake the job
+    progress_current = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer)
+    result = db.Column(db.Text)  # JSON
+    checkpoint = db.Column(db.Text)  # JSON handler state saved with each committed chunk, so a retry resumes there
+    error = db.Column(db.Text)
+    created_by = db.Column(db.String(36), db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_background_jobs_type_created', 'job_type', 'created_at'),
+        # Claiming: the oldest due job among the queued ones
+        db.Index('ix_background_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    def __repr__(self):
+        return f'<BackgroundJob {self.job_type} {self.job_id}>'
+    
+    def get_result(self):
+        """Get the result as a dictionary"""
+        if self.result:
+            try:
+                return json.loads(self.result)
+            except (json.JSONDecodeError, TypeError):
+                return None
+        return None
+    
+    def get_payload(self):
+        """Get the handler arguments as a dictionary"""
+        if self.payload:
+            try:
+                return json.loads(self.payload)
+            except (json.JSONDecodeError, TypeError):
+                return {}
+        return {}
+    
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'progress': {
+                'current': self.progress_current,
+                'total': self.progress_total
+            },
+            'result': self.get_result(),
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'locked_by': self.locked_by,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
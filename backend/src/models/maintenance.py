@@ -23,6 +23,13 @@ class MaintenanceSchedule(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_maintenance_schedules_scheduled', 'scheduled_date', 'schedule_id'),
+        # Overdue and upcoming counts on the dashboard
+        db.Index('ix_maintenance_schedules_status_scheduled', 'status', 'scheduled_date'),
+        db.Index('ix_maintenance_schedules_vehicle_scheduled', 'vehicle_id', 'scheduled_date'),
+    )
+    
     def __repr__(self):
         return f'<MaintenanceSchedule {self.service_type} for {self.vehicle_id}>'
     
@@ -89,6 +96,13 @@ class DamageReport(db.Model):
     reporter = db.relationship('User', backref='damage_reports')
     reservation = db.relationship('Reservation', backref='damage_reports')
     
+    __table_args__ = (
+        db.Index('ix_damage_reports_incident', 'incident_date', 'report_id'),
+        db.Index('ix_damage_reports_status_incident', 'status', 'incident_date'),
+        db.Index('ix_damage_reports_vehicle_incident', 'vehicle_id', 'incident_date'),
+        db.Index('ix_damage_reports_created', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<DamageReport {self.report_id} - {self.damage_type}>'
     
@@ -23,6 +23,7 @@ class Reservation(db.Model):
     created_by = db.Column(db.String(36), db.ForeignKey('users.user_id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version_id = db.Column(db.Integer, nullable=False, default=1)  # optimistic lock, see __mapper_args__
     
     # Relationships
     rental_agreement = db.relationship('RentalAgreement', backref='reservation', uselist=False)
@@ -30,6 +31,22 @@ class Reservation(db.Model):
     invoices = db.relationship('Invoice', backref='reservation', lazy=True)
     creator = db.relationship('User', backref='created_reservations')
     
+    __table_args__ = (
+        # Overlap checks for one vehicle
+        db.Index('ix_reservations_vehicle_status_period', 'assigned_vehicle_id', 'status', 'pickup_datetime', 'return_datetime'),
+        # Status filters and the availability index rebuild, newest pickups first
+        db.Index('ix_reservations_status_pickup', 'status', 'pickup_datetime'),
+        # Default list order and pickup-day filters
+        db.Index('ix_reservations_pickup', 'pickup_datetime', 'reservation_id'),
+        # A customer's reservations, most recent first
+        db.Index('ix_reservations_customer_created', 'customer_id', 'created_at'),
+        db.Index('ix_reservations_customer_pickup', 'customer_id', 'pickup_datetime'),
+    )
+    
+    # Every ORM UPDATE checks and bumps version_id; two requests changing the
+    # same reservation cannot both commit
+    __mapper_args__ = {'version_id_col': version_id}
+    
     def __repr__(self):
         return f'<Reservation {self.reservation_number}>'
     
@@ -75,8 +92,10 @@ class RentalAgreement(db.Model):
     agreement_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     reservation_id = db.Column(db.String(36), db.ForeignKey('reservations.reservation_id'), nullable=False)
     agreement_number = db.Column(db.String(20), unique=True, nullable=False)
-    customer_signature = db.Column(db.LargeBinary)  # Store signature as binary data
-    employee_signature = db.Column(db.LargeBinary)
+    # Signatures are stored as binary data and left out of to_dict(), so they
+    # are only loaded when accessed
+    customer_signature = db.deferred(db.Column(db.LargeBinary))
+    employee_signature = db.deferred(db.Column(db.LargeBinary))
     signed_at = db.Column(db.DateTime)
     terms_and_conditions = db.Column(db.Text, nullable=False)
     pickup_mileage = db.Column(db.Integer)
@@ -75,6 +75,7 @@ class Vehicle(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version_id = db.Column(db.Integer, nullable=False, default=1)  # optimistic lock, see __mapper_args__
     
     # Relationships
     reservations = db.relationship('Reservation', backref='assigned_vehicle', lazy=True)
@@ -82,6 +83,17 @@ class Vehicle(db.Model):
     damage_reports = db.relationship('DamageReport', backref='vehicle', lazy=True)
     feature_assignments = db.relationship('VehicleFeatureAssignment', backref='vehicle', lazy=True)
     
+    __table_args__ = (
+        # Availability search: available vehicles waiting at a location, optionally by category
+        db.Index('ix_vehicles_location_status_category', 'current_location_id', 'status', 'category_id'),
+        db.Index('ix_vehicles_status', 'status'),
+        db.Index('ix_vehicles_category', 'category_id'),
+    )
+    
+    # Every ORM UPDATE checks and bumps version_id, so a write based on a
+    # stale read fails with StaleDataError instead of overwriting a change
+    __mapper_args__ = {'version_id_col': version_id}
+    
     def __repr__(self):
         return f'<Vehicle {self.vehicle_number}>'
     
@@ -1,9 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.models.user import db, User, UserRole, UserRoleAssignment
 from src.models.customer import Customer
+from src.services.principals import authenticate, bearer_token, password_stamp, secret_key
+from src.services.permissions import permission_resolver
+from src.services.passwords import PasswordHashBusy
+from src.services.sqlite_mode import manages_writer_lock, read_only, writer_lock_for
 from datetime import datetime, timedelta
 import jwt
-import os
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,22 +16,24 @@ def generate_token(user):
         'user_id': user.user_id,
         'email': user.email,
         'user_type': user.user_type,
+        'pwd': password_stamp(user.password_hash),
         'exp': datetime.utcnow() + timedelta(hours=24)
     }
-    return jwt.encode(payload, os.environ.get('SECRET_KEY', 'car_rental_erp_secret_key_2025'), algorithm='HS256')
+    return jwt.encode(payload, secret_key(), algorithm='HS256')
+
+def hashing_busy(e):
+    """503 telling the client to retry when the password hashing queue is full"""
+    return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
 
 def verify_token(token):
     """Verify JWT token and return user"""
-    try:
-        payload = jwt.decode(token, os.environ.get('SECRET_KEY', 'car_rental_erp_secret_key_2025'), algorithms=['HS256'])
-        user = User.query.get(payload['user_id'])
-        return user
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+    principal = authenticate(token)
+    if principal is None:
         return None
+    return db.session.get(User, principal.user_id)
 
 @auth_bp.route('/login', methods=['POST'])
+@manages_writer_lock
 def login():
     """User login endpoint"""
     try:
@@ -47,9 +52,11 @@ def login():
         if user.status != 'active':
             return jsonify({'error': 'Account is not active'}), 401
         
-        # Update last login time
-        user.last_login_at = datetime.utcnow()
-        db.session.commit()
+        # Update last login time, saving a rehashed password with it; the
+        # writer lock is taken only now, after the slow hash check
+        with writer_lock_for(current_app):
+            user.last_login_at = datetime.utcnow()
+            db.session.commit()
         
         # Generate token
         token = generate_token(user)
@@ -69,10 +76,13 @@ def login():
             'roles': roles
         }), 200
         
+    except PasswordHashBusy as e:
+        return hashing_busy(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/register', methods=['POST'])
+@manages_writer_lock
 def register():
     """User registration endpoint"""
     try:
@@ -100,23 +110,24 @@ def register():
         )
         user.set_password(data['password'])
         
-        db.session.add(user)
-        db.session.flush()  # Get user_id
-        
-        # If registering as customer, create customer record
-        if user.user_type == 'customer':
-            customer = Customer(
-                customer_id=user.user_id,
-                customer_number=f'CUST{user.user_id[:8].upper()}',
-                driver_license_number=data.get('driver_license_number'),
-                driver_license_state=data.get('driver_license_state'),
-                driver_license_country=data.get('driver_license_country', 'USA'),
-                preferred_language=data.get('preferred_language', 'en'),
-                marketing_opt_in=data.get('marketing_opt_in', False)
-            )
-            db.session.add(customer)
-        
-        db.session.commit()
+        with writer_lock_for(current_app):
+            db.session.add(user)
+            db.session.flush()  # Get user_id
+            
+            # If registering as customer, create customer record
+            if user.user_type == 'customer':
+                customer = Customer(
+                    customer_id=user.user_id,
+                    customer_number=f'CUST{user.user_id[:8].upper()}',
+                    driver_license_number=data.get('driver_license_number'),
+                    driver_license_state=data.get('driver_license_state'),
+                    driver_license_country=data.get('driver_license_country', 'USA'),
+                    preferred_language=data.get('preferred_language', 'en'),
+                    marketing_opt_in=data.get('marketing_opt_in', False)
+                )
+                db.session.add(customer)
+            
+            db.session.commit()
         
         # Generate token
         token = generate_token(user)
@@ -127,6 +138,9 @@ def register():
             'message': 'User registered successfully'
         }), 201
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return hashing_busy(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -135,35 +149,32 @@ def register():
 def get_profile():
     """Get current user profile"""
     try:
-        token = request.headers.get('Authorization')
+        token = bearer_token()
         if not token:
             return jsonify({'error': 'Authorization token required'}), 401
         
-        # Remove 'Bearer ' prefix if present
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
-        user = verify_token(token)
-        if not user:
+        # Served from the principal cache without touching the users table
+        principal = authenticate(token)
+        if not principal:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
-        # Get user roles
-        roles = []
-        for assignment in user.role_assignments:
-            if assignment.is_active:
-                roles.append({
-                    'role_id': assignment.role.role_id,
-                    'role_name': assignment.role.role_name
-                })
-        
-        profile_data = user.to_dict()
-        profile_data['roles'] = roles
+        return jsonify(principal.profile), 200
         
-        # Add customer data if user is a customer
-        if user.customer:
-            profile_data['customer'] = user.customer.to_dict()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/permissions', methods=['GET'])
+def get_permissions():
+    """Effective permissions of the current user, including inherited ones"""
+    try:
+        principal = authenticate(bearer_token())
+        if not principal:
+            return jsonify({'error': 'Invalid or expired token'}), 401
         
-        return jsonify(profile_data), 200
+        return jsonify({
+            'roles': principal.profile['roles'],
+            'permissions': permission_resolver.names(principal.role_ids)
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -225,6 +236,7 @@ def update_profile():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/change-password', methods=['POST'])
+@manages_writer_lock
 def change_password():
     """Change user password"""
     try:
@@ -254,18 +266,27 @@ def change_password():
             return jsonify({'error': 'New password must be at least 6 characters long'}), 400
         
         user.set_password(new_password)
-        user.updated_at = datetime.utcnow()
-        user.updated_by = user.user_id
         
-        db.session.commit()
+        with writer_lock_for(current_app):
+            user.updated_at = datetime.utcnow()
+            user.updated_by = user.user_id
+            db.session.commit()
         
-        return jsonify({'message': 'Password changed successfully'}), 200
+        # Tokens issued before the change are revoked; hand out a fresh one
+        return jsonify({
+            'message': 'Password changed successfully',
+            'token': generate_token(user)
+        }), 200
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return hashing_busy(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/verify-token', methods=['POST'])
+@read_only
 def verify_user_token():
     """Verify if token is valid"""
     try:
@@ -275,13 +296,14 @@ def verify_user_token():
         if not token:
             return jsonify({'error': 'Token is required'}), 400
         
-        user = verify_token(token)
-        if not user:
+        principal = authenticate(token)
+        if not principal:
             return jsonify({'valid': False}), 200
         
+        user = {key: value for key, value in principal.profile.items() if key not in ('roles', 'customer')}
         return jsonify({
             'valid': True,
-            'user': user.to_dict()
+            'user': user
         }), 200
         
     except Exception as e:
@@ -3,6 +3,14 @@ from src.models.user import db, User
 from src.models.customer import Customer, CustomerAddress
 from src.models.reservation import Reservation
 from src.models.financial import Payment, Invoice
+from src.models.job import BackgroundJob
+from src.services.customer_onboarding import MAX_ONBOARDING_ROWS, seal_passwords
+from src.services.jobs import enqueue
+from src.services.loading import with_loading
+from src.services.pagination import paginate
+from src.services.projection import requested_fields, render_rows
+from src.services.serialization import serialize, serialize_many, json_response
+from src.services.uploads import read_rows
 from datetime import datetime
 from sqlalchemy import or_
 
@@ -13,14 +21,14 @@ def get_customers():
     """Get all customers with optional filtering"""
     try:
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         search = request.args.get('search', '')
         status = request.args.get('status', '')
         risk_level = request.args.get('risk_level', '')
         
+        fields = requested_fields('customer.get_customers')
+        
         # Build query
-        query = db.session.query(Customer).join(User)
+        query = with_loading(db.session.query(Customer).join(User), 'customer.get_customers', fields)
         
         # Apply filters
         if search:
@@ -39,35 +47,16 @@ def get_customers():
         if risk_level:
             query = query.filter(Customer.risk_level == risk_level)
         
-        # Order by creation date
-        query = query.order_by(Customer.created_at.desc())
-        
-        # Paginate
-        customers = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        # Format response
-        customer_list = []
-        for customer in customers.items:
-            customer_data = customer.to_dict()
-            customer_data['user'] = customer.user.to_dict()
-            customer_list.append(customer_data)
+        # Paginate by creation date
+        customers = paginate(query, Customer.created_at, Customer.customer_id, descending=True)
         
-        return jsonify({
-            'customers': customer_list,
-            'pagination': {
-                'page': customers.page,
-                'pages': customers.pages,
-                'per_page': customers.per_page,
-                'total': customers.total,
-                'has_next': customers.has_next,
-                'has_prev': customers.has_prev
-            }
-        }), 200
+        return json_response({
+            'customers': render_rows('customer.get_customers', customers.items, fields),
+            'pagination': customers.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -159,6 +148,44 @@ def create_customer():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@customer_bp.route('/onboarding', methods=['POST'])
+def start_customer_onboarding():
+    """Create customers in bulk from a CSV file or JSON array in a background job"""
+    try:
+        rows = read_rows(request, 'customers')
+        if not rows:
+            return jsonify({'error': 'No customers to onboard'}), 400
+        if len(rows) > MAX_ONBOARDING_ROWS:
+            return jsonify({'error': f'At most {MAX_ONBOARDING_ROWS} customers per onboarding job'}), 400
+        
+        # Passwords are queued encrypted, and the payload is cleared when the job ends
+        rows, passwords = seal_passwords(rows)
+        job_id = enqueue('customer_onboarding', {'rows': rows, 'passwords': passwords}, total=len(rows))
+        
+        return jsonify({
+            'job': BackgroundJob.query.get(job_id).to_dict(),
+            'message': 'Customer onboarding started'
+        }), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@customer_bp.route('/onboarding/<job_id>', methods=['GET'])
+def get_customer_onboarding(job_id):
+    """Get progress and, once finished, the per-row result of an onboarding job"""
+    try:
+        job = BackgroundJob.query.filter_by(job_id=job_id, job_type='customer_onboarding').first()
+        if not job:
+            return jsonify({'error': 'Onboarding job not found'}), 404
+        
+        return jsonify({'job': job.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @customer_bp.route('/<customer_id>', methods=['PUT'])
 def update_customer(customer_id):
     """Update customer information"""
@@ -288,44 +315,31 @@ def get_customer_reservations(customer_id):
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         status = request.args.get('status', '')
         
-        query = Reservation.query.filter_by(customer_id=customer_id)
+        query = with_loading(Reservation.query.filter_by(customer_id=customer_id), 'customer.get_customer_reservations')
         
         if status:
             query = query.filter(Reservation.status == status)
         
-        query = query.order_by(Reservation.created_at.desc())
-        
-        reservations = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        reservations = paginate(query, Reservation.created_at, Reservation.reservation_id, descending=True)
         
         reservation_list = []
         for reservation in reservations.items:
-            res_data = reservation.to_dict()
+            res_data = serialize(reservation)
             if reservation.assigned_vehicle:
-                res_data['vehicle'] = reservation.assigned_vehicle.to_dict()
+                res_data['vehicle'] = serialize(reservation.assigned_vehicle)
             if reservation.vehicle_category:
-                res_data['category'] = reservation.vehicle_category.to_dict()
+                res_data['category'] = serialize(reservation.vehicle_category)
             reservation_list.append(res_data)
         
-        return jsonify({
+        return json_response({
             'reservations': reservation_list,
-            'pagination': {
-                'page': reservations.page,
-                'pages': reservations.pages,
-                'per_page': reservations.per_page,
-                'total': reservations.total,
-                'has_next': reservations.has_next,
-                'has_prev': reservations.has_prev
-            }
-        }), 200
+            'pagination': reservations.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -337,27 +351,16 @@ def get_customer_payments(customer_id):
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        
-        payments = Payment.query.filter_by(customer_id=customer_id)\
-            .order_by(Payment.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        query = Payment.query.filter_by(customer_id=customer_id)
+        payments = paginate(query, Payment.created_at, Payment.payment_id, descending=True)
         
-        payment_list = [payment.to_dict() for payment in payments.items]
-        
-        return jsonify({
-            'payments': payment_list,
-            'pagination': {
-                'page': payments.page,
-                'pages': payments.pages,
-                'per_page': payments.per_page,
-                'total': payments.total,
-                'has_next': payments.has_next,
-                'has_prev': payments.has_prev
-            }
-        }), 200
+        return json_response({
+            'payments': serialize_many(payments.items),
+            'pagination': payments.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
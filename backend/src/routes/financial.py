@@ -1,66 +1,99 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.models.user import db
 from src.models.financial import Payment, Invoice, PricingRule
 from src.models.reservation import Reservation
 from src.models.customer import Customer
+from src.services.cache import cached_response, response_cache
+from src.services.export import export_options, export_response, export_to_file
+from src.services.jobs import enqueue, job_handler, job_accepted, wants_async, report_progress, result_path
+from src.services.loading import with_loading
+from src.services.pagination import paginate
+from src.services.projection import requested_fields, render_rows
+from src.services.pricing import pricing_engine
+from src.services.revenue_rollup import record_payment_completed, record_payment_refunded, revenue_summary
+from src.services.serialization import json_response
+from src.services.sqlite_mode import writer_lock_for
+from src.services.utilization import utilization_report
 from datetime import datetime, date, timedelta
 from sqlalchemy import func
 import uuid
 
 financial_bp = Blueprint('financial', __name__)
 
+def filter_payments(query, args):
+    """Apply the payment list filters from the query string args"""
+    status = args.get('status', '')
+    customer_id = args.get('customer_id', '')
+    payment_type = args.get('payment_type', '')
+    
+    if status:
+        query = query.filter(Payment.status == status)
+    
+    if customer_id:
+        query = query.filter(Payment.customer_id == customer_id)
+    
+    if payment_type:
+        query = query.filter(Payment.payment_type == payment_type)
+    
+    return query
+
+def filter_invoices(query, args):
+    """Apply the invoice list filters from the query string args"""
+    status = args.get('status', '')
+    customer_id = args.get('customer_id', '')
+    
+    if status:
+        query = query.filter(Invoice.status == status)
+    
+    if customer_id:
+        query = query.filter(Invoice.customer_id == customer_id)
+    
+    return query
+
 @financial_bp.route('/payments', methods=['GET'])
 def get_payments():
     """Get all payments with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        status = request.args.get('status', '')
-        customer_id = request.args.get('customer_id', '')
-        payment_type = request.args.get('payment_type', '')
-        
-        query = Payment.query
-        
-        if status:
-            query = query.filter(Payment.status == status)
+        fields = requested_fields('financial.get_payments')
         
-        if customer_id:
-            query = query.filter(Payment.customer_id == customer_id)
+        query = filter_payments(with_loading(Payment.query, 'financial.get_payments', fields), request.args)
         
-        if payment_type:
-            query = query.filter(Payment.payment_type == payment_type)
+        payments = paginate(query, Payment.created_at, Payment.payment_id, descending=True)
         
-        query = query.order_by(Payment.created_at.desc())
+        return json_response({
+            'payments': render_rows('financial.get_payments', payments.items, fields),
+            'pagination': payments.to_dict()
+        })
         
-        payments = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        payment_list = []
-        for payment in payments.items:
-            payment_data = payment.to_dict()
-            payment_data['customer'] = payment.customer.to_dict()
-            if payment.reservation:
-                payment_data['reservation'] = payment.reservation.to_dict()
-            payment_list.append(payment_data)
-        
-        return jsonify({
-            'payments': payment_list,
-            'pagination': {
-                'page': payments.page,
-                'pages': payments.pages,
-                'per_page': payments.per_page,
-                'total': payments.total,
-                'has_next': payments.has_next,
-                'has_prev': payments.has_prev
-            }
-        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@financial_bp.route('/payments/export', methods=['GET'])
+def export_payments():
+    """Stream all payments matching the list filters as NDJSON or CSV"""
+    try:
+        export_format, keys = export_options(request.args, Payment)
+        if wants_async():
+            return job_accepted(enqueue('export_payments', {'args': request.args.to_dict()}))
+        return export_response(payments_export_query(request.args), Payment, 'payments', export_format, keys)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def payments_export_query(args):
+    return filter_payments(Payment.query, args).order_by(Payment.created_at, Payment.payment_id)
+
+@job_handler('export_payments')
+def export_payments_job(job_id, payload):
+    args = payload['args']
+    export_format, keys = export_options(args, Payment)
+    return export_to_file(result_path(job_id, export_format), payments_export_query(args), Payment, 'payments',
+                          export_format, keys, lambda rows: report_progress(job_id, rows))
+
 @financial_bp.route('/payments', methods=['POST'])
 def create_payment():
     """Create new payment"""
@@ -102,6 +135,7 @@ def create_payment():
             payment.processed_at = datetime.utcnow()
         
         db.session.add(payment)
+        record_payment_completed(payment)
         db.session.commit()
         
         return jsonify({
@@ -135,6 +169,7 @@ def refund_payment(payment_id):
         payment.refunded_at = datetime.utcnow()
         payment.updated_at = datetime.utcnow()
         
+        record_payment_refunded(payment)
         db.session.commit()
         
         return jsonify({
@@ -150,49 +185,46 @@ def refund_payment(payment_id):
 def get_invoices():
     """Get all invoices with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        status = request.args.get('status', '')
-        customer_id = request.args.get('customer_id', '')
-        
-        query = Invoice.query
+        fields = requested_fields('financial.get_invoices')
         
-        if status:
-            query = query.filter(Invoice.status == status)
+        query = filter_invoices(with_loading(Invoice.query, 'financial.get_invoices', fields), request.args)
         
-        if customer_id:
-            query = query.filter(Invoice.customer_id == customer_id)
+        invoices = paginate(query, Invoice.created_at, Invoice.invoice_id, descending=True)
         
-        query = query.order_by(Invoice.created_at.desc())
+        return json_response({
+            'invoices': render_rows('financial.get_invoices', invoices.items, fields),
+            'pagination': invoices.to_dict()
+        })
         
-        invoices = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        invoice_list = []
-        for invoice in invoices.items:
-            invoice_data = invoice.to_dict()
-            invoice_data['customer'] = invoice.customer.to_dict()
-            invoice_data['reservation'] = invoice.reservation.to_dict()
-            invoice_list.append(invoice_data)
-        
-        return jsonify({
-            'invoices': invoice_list,
-            'pagination': {
-                'page': invoices.page,
-                'pages': invoices.pages,
-                'per_page': invoices.per_page,
-                'total': invoices.total,
-                'has_next': invoices.has_next,
-                'has_prev': invoices.has_prev
-            }
-        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@financial_bp.route('/invoices/export', methods=['GET'])
+def export_invoices():
+    """Stream all invoices matching the list filters as NDJSON or CSV"""
+    try:
+        export_format, keys = export_options(request.args, Invoice)
+        if wants_async():
+            return job_accepted(enqueue('export_invoices', {'args': request.args.to_dict()}))
+        return export_response(invoices_export_query(request.args), Invoice, 'invoices', export_format, keys)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def invoices_export_query(args):
+    return filter_invoices(Invoice.query, args).order_by(Invoice.created_at, Invoice.invoice_id)
+
+@job_handler('export_invoices')
+def export_invoices_job(job_id, payload):
+    args = payload['args']
+    export_format, keys = export_options(args, Invoice)
+    return export_to_file(result_path(job_id, export_format), invoices_export_query(args), Invoice, 'invoices',
+                          export_format, keys, lambda rows: report_progress(job_id, rows))
+
 @financial_bp.route('/invoices', methods=['POST'])
 def create_invoice():
     """Create new invoice"""
@@ -204,33 +236,13 @@ def create_invoice():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        # Verify customer and reservation exist
-        customer = Customer.query.get(data['customer_id'])
-        reservation = Reservation.query.get(data['reservation_id'])
+        if wants_async():
+            return job_accepted(enqueue('create_invoice', data))
         
-        if not customer or not reservation:
+        invoice = build_invoice(data)
+        if invoice is None:
             return jsonify({'error': 'Customer or reservation not found'}), 404
         
-        # Generate invoice number
-        invoice_number = f'INV{str(uuid.uuid4())[:8].upper()}'
-        
-        invoice = Invoice(
-            invoice_number=invoice_number,
-            reservation_id=data['reservation_id'],
-            customer_id=data['customer_id'],
-            due_date=datetime.strptime(data['due_date'], '%Y-%m-%d').date(),
-            subtotal=data['subtotal'],
-            tax_amount=data.get('tax_amount', 0.00),
-            total_amount=data['total_amount'],
-            payment_terms=data.get('payment_terms'),
-            notes=data.get('notes')
-        )
-        
-        invoice.set_line_items(data['line_items'])
-        
-        if data.get('billing_address'):
-            invoice.set_billing_address(data['billing_address'])
-        
         db.session.add(invoice)
         db.session.commit()
         
@@ -243,6 +255,47 @@ def create_invoice():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def build_invoice(data):
+    """Build an Invoice from validated request data, or None if the customer or reservation is missing"""
+    # Verify customer and reservation exist
+    customer = Customer.query.get(data['customer_id'])
+    reservation = Reservation.query.get(data['reservation_id'])
+    
+    if not customer or not reservation:
+        return None
+    
+    # Generate invoice number
+    invoice_number = f'INV{str(uuid.uuid4())[:8].upper()}'
+    
+    invoice = Invoice(
+        invoice_number=invoice_number,
+        reservation_id=data['reservation_id'],
+        customer_id=data['customer_id'],
+        due_date=datetime.strptime(data['due_date'], '%Y-%m-%d').date(),
+        subtotal=data['subtotal'],
+        tax_amount=data.get('tax_amount', 0.00),
+        total_amount=data['total_amount'],
+        payment_terms=data.get('payment_terms'),
+        notes=data.get('notes')
+    )
+    
+    invoice.set_line_items(data['line_items'])
+    
+    if data.get('billing_address'):
+        invoice.set_billing_address(data['billing_address'])
+    
+    return invoice
+
+@job_handler('create_invoice')
+def create_invoice_job(job_id, data):
+    invoice = build_invoice(data)
+    if invoice is None:
+        raise LookupError('Customer or reservation not found')
+    with writer_lock_for(current_app):
+        db.session.add(invoice)
+        db.session.commit()
+    return {'invoice': invoice.to_dict()}
+
 @financial_bp.route('/reports/revenue', methods=['GET'])
 def revenue_report():
     """Generate revenue report"""
@@ -258,63 +311,65 @@ def revenue_report():
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Total revenue from completed payments
-        total_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.status == 'completed',
-            Payment.processed_at >= start_date,
-            Payment.processed_at <= end_date
-        ).scalar() or 0
-        
-        # Revenue by payment type
-        revenue_by_type = db.session.query(
-            Payment.payment_type,
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.status == 'completed',
-            Payment.processed_at >= start_date,
-            Payment.processed_at <= end_date
-        ).group_by(Payment.payment_type).all()
-        
-        # Daily revenue
-        daily_revenue = db.session.query(
-            func.date(Payment.processed_at).label('date'),
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.status == 'completed',
-            Payment.processed_at >= start_date,
-            Payment.processed_at <= end_date
-        ).group_by(func.date(Payment.processed_at)).all()
-        
-        # Total reservations
-        total_reservations = Reservation.query.filter(
-            Reservation.pickup_datetime >= start_date,
-            Reservation.pickup_datetime <= end_date
-        ).count()
-        
-        # Completed reservations
-        completed_reservations = Reservation.query.filter(
-            Reservation.pickup_datetime >= start_date,
-            Reservation.pickup_datetime <= end_date,
-            Reservation.status == 'completed'
-        ).count()
-        
-        return jsonify({
-            'period': {
+        if wants_async():
+            return job_accepted(enqueue('revenue_report', {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
-            },
-            'total_revenue': float(total_revenue),
-            'total_reservations': total_reservations,
-            'completed_reservations': completed_reservations,
-            'completion_rate': (completed_reservations / total_reservations * 100) if total_reservations > 0 else 0,
-            'revenue_by_type': [{'type': r[0], 'total': float(r[1])} for r in revenue_by_type],
-            'daily_revenue': [{'date': r[0].isoformat(), 'total': float(r[1])} for r in daily_revenue]
-        }), 200
+            }))
+        
+        return jsonify(build_revenue_report(start_date, end_date)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def build_revenue_report(start_date, end_date):
+    # Read the daily rollups instead of scanning payments and reservations
+    summary = revenue_summary(start_date, end_date)
+    
+    return {
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        },
+        **summary
+    }
+
+@job_handler('revenue_report')
+def revenue_report_job(job_id, payload):
+    return build_revenue_report(date.fromisoformat(payload['start_date']), date.fromisoformat(payload['end_date']))
+
+@financial_bp.route('/reports/utilization', methods=['GET'])
+def utilization_report_route():
+    """Fleet utilization, idle time and revenue per available vehicle-day"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if not start_date or not end_date:
+            # Default to last 30 days
+            end_date = date.today()
+            start_date = end_date - timedelta(days=30)
+        else:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        
+        report = utilization_report(
+            start_date,
+            end_date,
+            bucket=request.args.get('bucket', 'day'),
+            category_id=request.args.get('category_id'),
+            location_id=request.args.get('location_id'),
+            include_vehicles=request.args.get('vehicles', 'true').lower() not in ('0', 'false', 'no')
+        )
+        return json_response(report)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @financial_bp.route('/pricing-rules', methods=['GET'])
+@cached_response('pricing_rules')
 def get_pricing_rules():
     """Get all pricing rules"""
     try:
@@ -354,6 +409,8 @@ def create_pricing_rule():
         
         db.session.add(rule)
         db.session.commit()
+        pricing_engine.invalidate()
+        response_cache.invalidate('pricing_rules')
         
         return jsonify({
             'pricing_rule': rule.to_dict(),
@@ -0,0 +1,71 @@
+from flask import Blueprint, request, jsonify, send_file
+from src.models.job import BackgroundJob
+from src.services.jobs import result_path
+from src.services.pagination import paginate
+import os
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/', methods=['GET'])
+def get_jobs():
+    """List background jobs, newest first, with optional filtering"""
+    try:
+        status = request.args.get('status', '')
+        job_type = request.args.get('job_type', '')
+        
+        query = BackgroundJob.query
+        
+        if status:
+            query = query.filter(BackgroundJob.status == status)
+        
+        if job_type:
+            query = query.filter(BackgroundJob.job_type == job_type)
+        
+        jobs = paginate(query, BackgroundJob.created_at, BackgroundJob.job_id, descending=True)
+        
+        return jsonify({
+            'jobs': [job.to_dict() for job in jobs.items],
+            'pagination': jobs.to_dict()
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and progress of a job"""
+    try:
+        job = BackgroundJob.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({'job': job.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get the result of a finished job; jobs that wrote a file (exports) return the file"""
+    try:
+        job = BackgroundJob.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        if job.status != 'succeeded':
+            return jsonify({'error': f'Job is {job.status}', 'job': job.to_dict()}), 409
+        
+        result = job.get_result() or {}
+        if 'filename' not in result:
+            return jsonify({'result': result}), 200
+        
+        path = result_path(job.job_id, result['format'])
+        if not os.path.exists(path):
+            return jsonify({'error': 'Result file no longer exists'}), 410
+        
+        return send_file(path, mimetype=result['mimetype'], as_attachment=True, download_name=result['filename'])
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.location import Location
+from src.services.cache import cached_response, response_cache
 from datetime import datetime
 from sqlalchemy import or_
 
 location_bp = Blueprint('location', __name__)
 
 @location_bp.route('/', methods=['GET'])
+@cached_response('locations')
 def get_locations():
     """Get all locations"""
     try:
@@ -94,6 +96,7 @@ def create_location():
         
         db.session.add(location)
         db.session.commit()
+        response_cache.invalidate('locations')
         
         return jsonify({
             'location': location.to_dict(),
@@ -139,6 +142,7 @@ def update_location(location_id):
         
         location.updated_at = datetime.utcnow()
         db.session.commit()
+        response_cache.invalidate('locations')
         
         return jsonify({
             'location': location.to_dict(),
@@ -3,8 +3,12 @@ from src.models.user import db
 from src.models.maintenance import MaintenanceSchedule, DamageReport
 from src.models.vehicle import Vehicle
 from src.models.reservation import Reservation
+from src.services.loading import with_loading
+from src.services.pagination import paginate
+from src.services.serialization import serialize, json_response
 from datetime import datetime, date
 from sqlalchemy import or_
+from sqlalchemy.orm.exc import StaleDataError
 
 maintenance_bp = Blueprint('maintenance', __name__)
 
@@ -12,14 +16,12 @@ maintenance_bp = Blueprint('maintenance', __name__)
 def get_maintenance_schedules():
     """Get all maintenance schedules with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         vehicle_id = request.args.get('vehicle_id', '')
         status = request.args.get('status', '')
         service_type = request.args.get('service_type', '')
         overdue_only = request.args.get('overdue_only', '').lower() == 'true'
         
-        query = MaintenanceSchedule.query
+        query = with_loading(MaintenanceSchedule.query, 'maintenance.get_maintenance_schedules')
         
         if vehicle_id:
             query = query.filter(MaintenanceSchedule.vehicle_id == vehicle_id)
@@ -37,32 +39,21 @@ def get_maintenance_schedules():
                 MaintenanceSchedule.status.in_(['scheduled', 'in_progress'])
             )
         
-        query = query.order_by(MaintenanceSchedule.scheduled_date)
-        
-        schedules = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        schedules = paginate(query, MaintenanceSchedule.scheduled_date, MaintenanceSchedule.schedule_id)
         
         schedule_list = []
         for schedule in schedules.items:
-            schedule_data = schedule.to_dict()
-            schedule_data['vehicle'] = schedule.vehicle.to_dict()
+            schedule_data = serialize(schedule)
+            schedule_data['vehicle'] = serialize(schedule.vehicle)
             schedule_list.append(schedule_data)
         
-        return jsonify({
+        return json_response({
             'schedules': schedule_list,
-            'pagination': {
-                'page': schedules.page,
-                'pages': schedules.pages,
-                'per_page': schedules.per_page,
-                'total': schedules.total,
-                'has_next': schedules.has_next,
-                'has_prev': schedules.has_prev
-            }
-        }), 200
+            'pagination': schedules.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -161,13 +152,11 @@ def update_maintenance_schedule(schedule_id):
 def get_damage_reports():
     """Get all damage reports with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         vehicle_id = request.args.get('vehicle_id', '')
         status = request.args.get('status', '')
         severity = request.args.get('severity', '')
         
-        query = DamageReport.query
+        query = with_loading(DamageReport.query, 'maintenance.get_damage_reports')
         
         if vehicle_id:
             query = query.filter(DamageReport.vehicle_id == vehicle_id)
@@ -178,35 +167,24 @@ def get_damage_reports():
         if severity:
             query = query.filter(DamageReport.damage_severity == severity)
         
-        query = query.order_by(DamageReport.incident_date.desc())
-        
-        reports = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        reports = paginate(query, DamageReport.incident_date, DamageReport.report_id, descending=True)
         
         report_list = []
         for report in reports.items:
-            report_data = report.to_dict()
-            report_data['vehicle'] = report.vehicle.to_dict()
-            report_data['reporter'] = report.reporter.to_dict()
+            report_data = serialize(report)
+            report_data['vehicle'] = serialize(report.vehicle)
+            report_data['reporter'] = serialize(report.reporter)
             if report.reservation:
-                report_data['reservation'] = report.reservation.to_dict()
+                report_data['reservation'] = serialize(report.reservation)
             report_list.append(report_data)
         
-        return jsonify({
+        return json_response({
             'damage_reports': report_list,
-            'pagination': {
-                'page': reports.page,
-                'pages': reports.pages,
-                'per_page': reports.per_page,
-                'total': reports.total,
-                'has_next': reports.has_next,
-                'has_prev': reports.has_prev
-            }
-        }), 200
+            'pagination': reports.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -264,6 +242,9 @@ def create_damage_report():
             'message': 'Damage report created successfully'
         }), 201
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'The vehicle was changed by another request; reload and try again'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -305,6 +286,9 @@ def update_damage_report(report_id):
             'message': 'Damage report updated successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'The vehicle was changed by another request; reload and try again'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -4,76 +4,143 @@ from src.models.reservation import Reservation, RentalAgreement
 from src.models.customer import Customer
 from src.models.vehicle import Vehicle, VehicleCategory
 from src.models.location import Location
-from datetime import datetime
+from src.services.assignment import auto_assign, AssignmentConflict
+from src.services.availability import availability_index, parse_datetime
+from src.services.export import export_options, export_response, export_to_file
+from src.services.jobs import enqueue, job_handler, job_accepted, wants_async, report_progress, result_path
+from src.services.loading import with_loading
+from src.services.pagination import paginate
+from src.services.projection import requested_fields, render_rows
+from src.services.pricing import pricing_engine
+from src.services.revenue_rollup import record_reservation_created, record_reservation_completed
+from src.services.serialization import json_response
+from datetime import datetime, timedelta
 from sqlalchemy import or_, and_
+from sqlalchemy.orm.exc import StaleDataError
 import uuid
 
 reservation_bp = Blueprint('reservation', __name__)
 
+CONCURRENT_CHANGE_ERROR = 'The reservation or vehicle was changed by another request; reload and try again'
+
+def filter_reservations(query, args):
+    """Apply the reservation list filters from the query string args"""
+    status = args.get('status', '')
+    customer_id = args.get('customer_id', '')
+    pickup_date = args.get('pickup_date', '')
+    
+    if status:
+        query = query.filter(Reservation.status == status)
+    
+    if customer_id:
+        query = query.filter(Reservation.customer_id == customer_id)
+    
+    if pickup_date:
+        pickup_dt = datetime.strptime(pickup_date, '%Y-%m-%d')
+        query = query.filter(
+            and_(
+                Reservation.pickup_datetime >= pickup_dt,
+                Reservation.pickup_datetime < pickup_dt.replace(hour=23, minute=59, second=59)
+            )
+        )
+    
+    return query
+
 @reservation_bp.route('/', methods=['GET'])
 def get_reservations():
     """Get all reservations with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        status = request.args.get('status', '')
-        customer_id = request.args.get('customer_id', '')
-        pickup_date = request.args.get('pickup_date', '')
-        
-        query = Reservation.query
+        fields = requested_fields('reservation.get_reservations')
         
-        if status:
-            query = query.filter(Reservation.status == status)
+        query = filter_reservations(with_loading(Reservation.query, 'reservation.get_reservations', fields), request.args)
         
-        if customer_id:
-            query = query.filter(Reservation.customer_id == customer_id)
-        
-        if pickup_date:
-            pickup_dt = datetime.strptime(pickup_date, '%Y-%m-%d')
-            query = query.filter(
-                and_(
-                    Reservation.pickup_datetime >= pickup_dt,
-                    Reservation.pickup_datetime < pickup_dt.replace(hour=23, minute=59, second=59)
-                )
-            )
+        reservations = paginate(query, Reservation.pickup_datetime, Reservation.reservation_id, descending=True)
         
-        query = query.order_by(Reservation.pickup_datetime.desc())
-        
-        reservations = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        reservation_list = []
-        for reservation in reservations.items:
-            res_data = reservation.to_dict()
-            res_data['customer'] = reservation.customer.to_dict()
-            res_data['customer']['user'] = reservation.customer.user.to_dict()
-            res_data['vehicle_category'] = reservation.vehicle_category.to_dict()
-            res_data['pickup_location'] = reservation.pickup_location.to_dict()
-            res_data['return_location'] = reservation.return_location.to_dict()
-            
-            if reservation.assigned_vehicle:
-                res_data['assigned_vehicle'] = reservation.assigned_vehicle.to_dict()
-            
-            reservation_list.append(res_data)
-        
-        return jsonify({
-            'reservations': reservation_list,
-            'pagination': {
-                'page': reservations.page,
-                'pages': reservations.pages,
-                'per_page': reservations.per_page,
-                'total': reservations.total,
-                'has_next': reservations.has_next,
-                'has_prev': reservations.has_prev
-            }
-        }), 200
+        return json_response({
+            'reservations': render_rows('reservation.get_reservations', reservations.items, fields),
+            'pagination': reservations.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@reservation_bp.route('/export', methods=['GET'])
+def export_reservations():
+    """Stream all reservations matching the list filters as NDJSON or CSV"""
+    try:
+        export_format, keys = export_options(request.args, Reservation)
+        if wants_async():
+            return job_accepted(enqueue('export_reservations', {'args': request.args.to_dict()}))
+        query = reservations_export_query(request.args)
+        return export_response(query, Reservation, 'reservations', export_format, keys)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def reservations_export_query(args):
+    return filter_reservations(Reservation.query, args).order_by(Reservation.pickup_datetime, Reservation.reservation_id)
+
+@job_handler('export_reservations')
+def export_reservations_job(job_id, payload):
+    args = payload['args']
+    export_format, keys = export_options(args, Reservation)
+    return export_to_file(result_path(job_id, export_format), reservations_export_query(args), Reservation,
+                          'reservations', export_format, keys, lambda rows: report_progress(job_id, rows))
+
+@reservation_bp.route('/auto-assign', methods=['POST'])
+def auto_assign_reservations():
+    """Assign vehicles to the pending reservations picked up at a location in a time window"""
+    try:
+        data = request.get_json() or {}
+        options = auto_assign_options(data)
+        
+        if wants_async():
+            return job_accepted(enqueue('auto_assign', data))
+        
+        return json_response(auto_assign(**options))
+    
+    except AssignmentConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def auto_assign_options(data):
+    """Validate an auto-assign request body into auto_assign() arguments"""
+    if not data.get('location_id'):
+        raise ValueError('location_id is required')
+    if not Location.query.get(data['location_id']):
+        raise LookupError('Location not found')
+    if data.get('category_id') and not VehicleCategory.query.get(data['category_id']):
+        raise LookupError('Vehicle category not found')
+    
+    # Default to the next 24 hours of pickups
+    start = parse_datetime(data['start']) if data.get('start') else datetime.utcnow()
+    end = parse_datetime(data['end']) if data.get('end') else start + timedelta(hours=24)
+    if start >= end:
+        raise ValueError('end must be after start')
+    
+    return {
+        'location_id': data['location_id'],
+        'start': start,
+        'end': end,
+        'category_id': data.get('category_id'),
+        'allow_relocation': bool(data.get('allow_relocation', True)),
+        'dry_run': bool(data.get('dry_run', False))
+    }
+
+@job_handler('auto_assign')
+def auto_assign_job(job_id, data):
+    return auto_assign(**auto_assign_options(data))
+
 @reservation_bp.route('/<reservation_id>', methods=['GET'])
 def get_reservation(reservation_id):
     """Get specific reservation details"""
@@ -120,6 +187,9 @@ def create_reservation():
         category = VehicleCategory.query.get(data['vehicle_category_id'])
         if not category:
             return jsonify({'error': 'Vehicle category not found'}), 404
+        # The pricing engine quotes active categories only
+        if not category.is_active:
+            return jsonify({'error': 'Vehicle category is not active'}), 400
         
         # Verify locations exist
         pickup_location = Location.query.get(data['pickup_location_id'])
@@ -137,9 +207,9 @@ def create_reservation():
         # Generate reservation number
         reservation_number = f'RES{str(uuid.uuid4())[:8].upper()}'
         
-        # Calculate estimated cost
-        rental_days = max(1, (return_dt - pickup_dt).days)
-        estimated_cost = float(category.base_daily_rate) * rental_days
+        # Calculate estimated cost from the active pricing rules
+        quote = pricing_engine.quote(category.category_id, data['pickup_location_id'], pickup_dt, return_dt)
+        estimated_cost = quote.total
         
         reservation = Reservation(
             reservation_number=reservation_number,
@@ -156,6 +226,7 @@ def create_reservation():
         )
         
         db.session.add(reservation)
+        record_reservation_created(reservation)
         db.session.commit()
         
         res_data = reservation.to_dict()
@@ -213,17 +284,24 @@ def confirm_reservation(reservation_id):
                 return jsonify({'error': 'Vehicle is already reserved for this period'}), 409
             
             reservation.assigned_vehicle_id = assigned_vehicle_id
+            # Bump the vehicle's version too: of two requests that passed the
+            # conflict check for this vehicle at once, only the first commits
+            vehicle.updated_at = datetime.utcnow()
         
         reservation.status = 'confirmed'
         reservation.updated_at = datetime.utcnow()
         
         db.session.commit()
+        availability_index.add_reservation(reservation)
         
         return jsonify({
             'reservation': reservation.to_dict(),
             'message': 'Reservation confirmed successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': CONCURRENT_CHANGE_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -247,12 +325,16 @@ def cancel_reservation(reservation_id):
         reservation.updated_at = datetime.utcnow()
         
         db.session.commit()
+        availability_index.remove_reservation(reservation)
         
         return jsonify({
             'reservation': reservation.to_dict(),
             'message': 'Reservation cancelled successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': CONCURRENT_CHANGE_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -292,6 +374,7 @@ def checkin_reservation(reservation_id):
         
         db.session.add(rental_agreement)
         db.session.commit()
+        availability_index.add_reservation(reservation)
         
         return jsonify({
             'reservation': reservation.to_dict(),
@@ -299,6 +382,9 @@ def checkin_reservation(reservation_id):
             'message': 'Customer checked in successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': CONCURRENT_CHANGE_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -348,13 +434,18 @@ def checkout_reservation(reservation_id):
         customer.total_spent += reservation.total_actual_cost
         customer.updated_at = datetime.utcnow()
         
+        record_reservation_completed(reservation)
         db.session.commit()
+        availability_index.remove_reservation(reservation)
         
         return jsonify({
             'reservation': reservation.to_dict(),
             'message': 'Customer checked out successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': CONCURRENT_CHANGE_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
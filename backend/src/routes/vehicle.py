@@ -1,14 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from src.models.user import db
 from src.models.vehicle import VehicleCategory, Vehicle, VehicleFeature, VehicleFeatureAssignment
 from src.models.location import Location
 from src.models.reservation import Reservation
+from src.services.availability import availability_index, parse_datetime
+from src.services.cache import cached_response, response_cache
+from src.services.loading import with_loading
+from src.services.pagination import paginate
+from src.services.projection import requested_fields, render_rows
+from src.services.pricing import pricing_engine
+from src.services.serialization import json_response
+from src.services.sqlite_mode import read_only
+from src.services.uploads import read_rows
+from src.services.vehicle_import import import_vehicles, MAX_IMPORT_ROWS
+from src.services.jobs import (enqueue, job_handler, job_accepted, wants_async, report_progress,
+                               load_checkpoint, save_checkpoint)
 from datetime import datetime
 from sqlalchemy import or_, and_
+from sqlalchemy.orm.exc import StaleDataError
+import json
 
 vehicle_bp = Blueprint('vehicle', __name__)
 
+MAX_BATCH_QUOTES = 1000
+QUOTE_STRING_FIELDS = ('category_id', 'pickup_location_id', 'return_location_id', 'pickup_datetime', 'return_datetime')
+
 @vehicle_bp.route('/categories', methods=['GET'])
+@cached_response('categories')
 def get_vehicle_categories():
     """Get all vehicle categories"""
     try:
@@ -53,6 +71,8 @@ def create_vehicle_category():
         
         db.session.add(category)
         db.session.commit()
+        pricing_engine.invalidate()
+        response_cache.invalidate('categories')
         
         return jsonify({
             'category': category.to_dict(),
@@ -68,15 +88,15 @@ def get_vehicles():
     """Get all vehicles with optional filtering"""
     try:
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         search = request.args.get('search', '')
         category_id = request.args.get('category_id', '')
         status = request.args.get('status', '')
         location_id = request.args.get('location_id', '')
         
+        fields = requested_fields('vehicle.get_vehicles')
+        
         # Build query
-        query = Vehicle.query.join(VehicleCategory)
+        query = with_loading(Vehicle.query.join(VehicleCategory), 'vehicle.get_vehicles', fields)
         
         # Apply filters
         if search:
@@ -99,37 +119,16 @@ def get_vehicles():
         if location_id:
             query = query.filter(Vehicle.current_location_id == location_id)
         
-        # Order by vehicle number
-        query = query.order_by(Vehicle.vehicle_number)
-        
-        # Paginate
-        vehicles = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        # Format response
-        vehicle_list = []
-        for vehicle in vehicles.items:
-            vehicle_data = vehicle.to_dict()
-            vehicle_data['category'] = vehicle.category.to_dict()
-            if vehicle.current_location:
-                vehicle_data['current_location'] = vehicle.current_location.to_dict()
-            vehicle_list.append(vehicle_data)
+        # Paginate by vehicle number
+        vehicles = paginate(query, Vehicle.vehicle_number, Vehicle.vehicle_id)
         
-        return jsonify({
-            'vehicles': vehicle_list,
-            'pagination': {
-                'page': vehicles.page,
-                'pages': vehicles.pages,
-                'per_page': vehicles.per_page,
-                'total': vehicles.total,
-                'has_next': vehicles.has_next,
-                'has_prev': vehicles.has_prev
-            }
-        }), 200
+        return json_response({
+            'vehicles': render_rows('vehicle.get_vehicles', vehicles.items, fields),
+            'pagination': vehicles.to_dict()
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -226,6 +225,36 @@ def create_vehicle():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@vehicle_bp.route('/import', methods=['POST'])
+def import_vehicles_route():
+    """Create many vehicles from a CSV file or JSON array, reporting errors per row"""
+    try:
+        rows = read_rows(request, 'vehicles')
+        if not rows:
+            return jsonify({'error': 'No vehicles to import'}), 400
+        if len(rows) > MAX_IMPORT_ROWS:
+            return jsonify({'error': f'At most {MAX_IMPORT_ROWS} vehicles per import'}), 400
+        
+        if wants_async():
+            return job_accepted(enqueue('vehicle_import', {'rows': rows}, total=len(rows)))
+        
+        result = import_vehicles(rows)
+        
+        # 201 when everything was imported, 207 when some rows were rejected
+        status = 201 if not result['errors'] else 207 if result['imported'] else 422
+        return jsonify(result), status
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@job_handler('vehicle_import')
+def vehicle_import_job(job_id, payload):
+    return import_vehicles(payload['rows'], on_progress=lambda done: report_progress(job_id, done),
+                           resume=load_checkpoint(job_id), on_commit=lambda state: save_checkpoint(job_id, state))
+
 @vehicle_bp.route('/<vehicle_id>', methods=['PUT'])
 def update_vehicle(vehicle_id):
     """Update vehicle information"""
@@ -272,6 +301,9 @@ def update_vehicle(vehicle_id):
             'message': 'Vehicle updated successfully'
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'The vehicle was changed by another request; reload and try again'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -290,33 +322,30 @@ def check_availability():
             return jsonify({'error': 'pickup_datetime, return_datetime, and pickup_location_id are required'}), 400
         
         # Parse datetime strings
-        pickup_dt = datetime.fromisoformat(pickup_datetime.replace('Z', '+00:00'))
-        return_dt = datetime.fromisoformat(return_datetime.replace('Z', '+00:00'))
+        pickup_dt = parse_datetime(pickup_datetime)
+        return_dt = parse_datetime(return_datetime)
         
-        # Build base query for available vehicles
+        if pickup_dt >= return_dt:
+            return jsonify({'error': 'Return datetime must be after pickup datetime'}), 400
+        
+        # Candidate vehicles waiting at the pickup location
         query = Vehicle.query.filter(
             Vehicle.status == 'available',
-            Vehicle.is_active == True
+            Vehicle.is_active == True,
+            Vehicle.current_location_id == pickup_location_id
         )
         
         if category_id:
             query = query.filter(Vehicle.category_id == category_id)
         
-        # Find vehicles that are not reserved during the requested period
-        conflicting_reservations = db.session.query(Reservation.assigned_vehicle_id).filter(
-            and_(
-                Reservation.status.in_(['confirmed', 'in_progress']),
-                or_(
-                    and_(Reservation.pickup_datetime <= pickup_dt, Reservation.return_datetime > pickup_dt),
-                    and_(Reservation.pickup_datetime < return_dt, Reservation.return_datetime >= return_dt),
-                    and_(Reservation.pickup_datetime >= pickup_dt, Reservation.return_datetime <= return_dt)
-                )
-            )
-        ).subquery()
+        candidates = query.all()
         
-        available_vehicles = query.filter(
-            ~Vehicle.vehicle_id.in_(conflicting_reservations)
-        ).all()
+        # Drop vehicles with a confirmed or in-progress reservation in the period
+        availability_index.ensure_loaded()
+        free_ids = set(availability_index.filter_available(
+            [vehicle.vehicle_id for vehicle in candidates], pickup_dt, return_dt
+        ))
+        available_vehicles = [vehicle for vehicle in candidates if vehicle.vehicle_id in free_ids]
         
         # Group by category
         availability_by_category = {}
@@ -342,7 +371,89 @@ def check_availability():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@vehicle_bp.route('/quotes', methods=['POST'])
+@read_only
+def batch_quotes():
+    """Quote many category/location/date combinations in one request"""
+    try:
+        data = request.get_json()
+        items = data.get('quotes') if isinstance(data, dict) else data
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'quotes must be a non-empty list'}), 400
+        
+        if len(items) > MAX_BATCH_QUOTES:
+            return jsonify({'error': f'At most {MAX_BATCH_QUOTES} quotes per request'}), 400
+        
+        pricing_engine.ensure_loaded()
+        all_category_ids = pricing_engine.category_ids()
+        
+        # Everything that can reject an item happens before the response starts:
+        # once the 200 and the opening '[' are sent, an exception truncates the JSON
+        quotes = []
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            result = {
+                'pickup_location_id': item.get('pickup_location_id'),
+                'return_location_id': item.get('return_location_id') or item.get('pickup_location_id'),
+                'pickup_datetime': item.get('pickup_datetime'),
+                'return_datetime': item.get('return_datetime')
+            }
+            period = None
+            try:
+                if not all([result['pickup_location_id'], result['pickup_datetime'], result['return_datetime']]):
+                    raise ValueError('pickup_location_id, pickup_datetime and return_datetime are required')
+                not_strings = [key for key in QUOTE_STRING_FIELDS
+                               if item.get(key) is not None and not isinstance(item[key], str)]
+                if not_strings:
+                    raise ValueError(f"{', '.join(not_strings)} must be a string")
+                pickup_dt = parse_datetime(result['pickup_datetime'])
+                return_dt = parse_datetime(result['return_datetime'])
+                if pickup_dt >= return_dt:
+                    raise ValueError('Return datetime must be after pickup datetime')
+                period = (pickup_dt, return_dt)
+            except ValueError as e:
+                result['error'] = str(e)
+            # Items without a category_id are quoted for every active category
+            category_ids = [item['category_id']] if item.get('category_id') else all_category_ids
+            quotes.extend((category_id, result, period) for category_id in category_ids)
+            if len(quotes) > MAX_BATCH_QUOTES:
+                return jsonify({'error': f'At most {MAX_BATCH_QUOTES} quotes per request, counting an item '
+                                         f'without a category_id once per category'}), 400
+        
+        def quote_item(category_id, result, period):
+            result = {'category_id': category_id, **result}
+            if period is None:
+                return result
+            try:
+                quote = pricing_engine.quote(category_id, result['pickup_location_id'], *period)
+                result.update({
+                    'rental_days': quote.rental_days,
+                    'base_daily_rate': quote.base_daily_rate,
+                    'estimated_cost': quote.total,
+                    'deposit_amount': quote.deposit_amount
+                })
+            except (ValueError, LookupError) as e:
+                result['error'] = str(e)
+            except Exception:
+                current_app.logger.exception('Quote for category %s failed', category_id)
+                result['error'] = 'Quote failed'
+            return result
+        
+        def generate():
+            separator = '['
+            for quote in quotes:
+                yield separator + json.dumps(quote_item(*quote))
+                separator = ','
+            yield ']' if separator == ',' else '[]'
+        
+        return Response(stream_with_context(generate()), status=200, mimetype='application/json')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @vehicle_bp.route('/features', methods=['GET'])
+@cached_response('features')
 def get_vehicle_features():
     """Get all vehicle features"""
     try:
@@ -377,6 +488,7 @@ def create_vehicle_feature():
         
         db.session.add(feature)
         db.session.commit()
+        response_cache.invalidate('features')
         
         return jsonify({
             'feature': feature.to_dict(),
@@ -0,0 +1,268 @@
+from flask import current_app
+from src.models.user import db
+from src.models.reservation import Reservation
+from src.models.vehicle import Vehicle
+from src.services.availability import availability_index, BLOCKING_STATUSES
+from src.services.sqlite_mode import writer_lock_for
+from sqlalchemy import select, bindparam
+from bisect import insort
+from datetime import datetime
+from heapq import heappush, heappop
+
+# Released before any reservation of the batch
+_ALWAYS = datetime.min
+
+
+class AssignmentConflict(Exception):
+    """Reservations or vehicles changed between planning and writing the assignments"""
+
+
+class _Fleet:
+    """Where the vehicles of one category are and when each becomes free.
+
+    Idle vehicles sit in a list per location sorted by the time they were
+    released; busy ones wait in a heap until their return time. upcoming
+    holds the start times of each vehicle's existing bookings, so a
+    reservation only goes to a vehicle it returns before the next one.
+    """
+
+    def __init__(self, vehicles, bookings):
+        self.idle = {}
+        self.released = {}
+        self.returns = []
+        self.busy_until = {}
+        self.upcoming = {}
+        for vehicle_id, location_id in vehicles:
+            self._park(vehicle_id, location_id, _ALWAYS)
+        for vehicle_id, pickup_dt, _, _ in bookings:
+            self.upcoming.setdefault(vehicle_id, []).append(pickup_dt)
+        for starts in self.upcoming.values():
+            starts.sort(reverse=True)
+
+    def _park(self, vehicle_id, location_id, released_at):
+        insort(self.idle.setdefault(location_id, []), (released_at, vehicle_id))
+        self.released[vehicle_id] = (location_id, released_at)
+
+    def _take(self, vehicle_id, until, location_id):
+        parked = self.released.pop(vehicle_id, None)
+        if parked is not None:
+            self.idle[parked[0]].remove((parked[1], vehicle_id))
+        if until > self.busy_until.get(vehicle_id, _ALWAYS):
+            self.busy_until[vehicle_id] = until
+            heappush(self.returns, (until, vehicle_id, location_id))
+        return parked
+
+    def advance(self, now):
+        """Park every vehicle returned by now at its return location"""
+        while self.returns and self.returns[0][0] <= now:
+            until, vehicle_id, location_id = heappop(self.returns)
+            if self.busy_until.get(vehicle_id) == until:
+                del self.busy_until[vehicle_id]
+                self._park(vehicle_id, location_id, until)
+
+    def book(self, vehicle_id, pickup_dt, return_dt, return_location_id):
+        """Take a vehicle for one of its existing bookings"""
+        starts = self.upcoming.get(vehicle_id)
+        if starts and starts[-1] <= pickup_dt:
+            starts.pop()
+        self._take(vehicle_id, return_dt, return_location_id)
+
+    def best_fit(self, location_id, return_dt):
+        """The idle vehicle at location_id released last that is free until return_dt"""
+        parked = self.idle.get(location_id, [])
+        for index in range(len(parked) - 1, -1, -1):
+            released_at, vehicle_id = parked[index]
+            starts = self.upcoming.get(vehicle_id)
+            if not starts or starts[-1] >= return_dt:
+                return released_at, vehicle_id
+        return None
+
+    def assign(self, vehicle_id, return_dt, return_location_id):
+        return self._take(vehicle_id, return_dt, return_location_id)
+
+
+def plan_assignments(pending, vehicles, bookings, allow_relocation=True):
+    """Assign pending reservations to vehicles of their category.
+
+    pending: (reservation_id, category_id, pickup_location_id, return_location_id, pickup, return)
+    vehicles: (vehicle_id, category_id, location_id) for the assignable fleet
+    bookings: (vehicle_id, pickup, return, return_location_id) already confirmed
+
+    Reservations are taken in pickup order (greedy interval partitioning,
+    which uses the fewest vehicles when nothing else is booked). Each goes to
+    the vehicle at its pickup location that was released most recently (best
+    fit, leaving the shortest idle gap), and only when none is free to the
+    vehicle elsewhere that was released most recently, counted as a
+    relocation. Vehicles then stand at the reservation's return location.
+
+    Returns (assignments, unassigned): assignments are dicts with
+    reservation_id, vehicle_id, relocated and idle_hours; unassigned is a
+    list of reservation ids.
+    """
+    fleet_vehicles = {}
+    for vehicle_id, category_id, location_id in vehicles:
+        fleet_vehicles.setdefault(category_id, []).append((vehicle_id, location_id))
+    category_of = {vehicle_id: category_id for vehicle_id, category_id, _ in vehicles}
+    fleet_bookings = {}
+    for booking in bookings:
+        category_id = category_of.get(booking[0])
+        if category_id is not None:
+            fleet_bookings.setdefault(category_id, []).append(booking)
+    fleet_pending = {}
+    for reservation in pending:
+        fleet_pending.setdefault(reservation[1], []).append(reservation)
+
+    assignments = []
+    unassigned = []
+    for category_id, reservations in fleet_pending.items():
+        fleet = _Fleet(fleet_vehicles.get(category_id, []), fleet_bookings.get(category_id, []))
+        # At equal times existing bookings go first; ties between pending
+        # reservations take the longest rental first
+        events = [(pickup_dt, 0, return_dt, vehicle_id, location_id)
+                  for vehicle_id, pickup_dt, return_dt, location_id in fleet_bookings.get(category_id, [])]
+        events.extend((reservation[4], 1, reservation) for reservation in
+                      sorted(reservations, key=lambda reservation: (reservation[4], datetime.max - reservation[5], reservation[0])))
+        events.sort(key=lambda event: (event[0], event[1]))
+
+        for event in events:
+            fleet.advance(event[0])
+            if event[1] == 0:
+                _, _, return_dt, vehicle_id, location_id = event
+                fleet.book(vehicle_id, event[0], return_dt, location_id)
+                continue
+
+            reservation_id, _, pickup_location_id, return_location_id, pickup_dt, return_dt = event[2]
+            choice = fleet.best_fit(pickup_location_id, return_dt)
+            relocated = False
+            if choice is None and allow_relocation:
+                elsewhere = [fleet.best_fit(location_id, return_dt) for location_id in fleet.idle
+                             if location_id != pickup_location_id]
+                elsewhere = [candidate for candidate in elsewhere if candidate]
+                if elsewhere:
+                    choice = max(elsewhere)
+                    relocated = True
+            if choice is None:
+                unassigned.append(reservation_id)
+                continue
+
+            released_at, vehicle_id = choice
+            fleet.assign(vehicle_id, return_dt, return_location_id)
+            idle = (pickup_dt - released_at).total_seconds() / 3600 if released_at != _ALWAYS else None
+            assignments.append({
+                'reservation_id': reservation_id,
+                'vehicle_id': vehicle_id,
+                'relocated': relocated,
+                'idle_hours': round(idle, 2) if idle is not None else None
+            })
+    return assignments, unassigned
+
+
+def _load(location_id, start, end, category_id):
+    pending_query = select(
+        Reservation.reservation_id, Reservation.vehicle_category_id, Reservation.pickup_location_id,
+        Reservation.return_location_id, Reservation.pickup_datetime, Reservation.return_datetime
+    ).where(
+        Reservation.status == 'pending',
+        Reservation.assigned_vehicle_id.is_(None),
+        Reservation.pickup_location_id == location_id,
+        Reservation.pickup_datetime >= start,
+        Reservation.pickup_datetime < end
+    )
+    if category_id:
+        pending_query = pending_query.where(Reservation.vehicle_category_id == category_id)
+    pending = db.session.execute(pending_query).all()
+    if not pending:
+        return [], [], [], {}
+
+    categories = sorted({reservation.vehicle_category_id for reservation in pending})
+    fleet_rows = db.session.execute(
+        select(Vehicle.vehicle_id, Vehicle.category_id, Vehicle.current_location_id, Vehicle.version_id)
+        .where(Vehicle.category_id.in_(categories), Vehicle.status == 'available', Vehicle.is_active.is_(True))
+    ).all()
+    vehicles = [(vehicle_id, category, location) for vehicle_id, category, location, _ in fleet_rows]
+    versions = {row.vehicle_id: row.version_id for row in fleet_rows}
+
+    # Bookings that end before the batch starts or start after it ends cannot conflict
+    latest_return = max(reservation.return_datetime for reservation in pending)
+    fleet = select(Vehicle.vehicle_id).where(Vehicle.category_id.in_(categories))
+    bookings = db.session.execute(
+        select(Reservation.assigned_vehicle_id, Reservation.pickup_datetime,
+               Reservation.return_datetime, Reservation.return_location_id)
+        .where(
+            Reservation.status.in_(BLOCKING_STATUSES),
+            Reservation.assigned_vehicle_id.in_(fleet),
+            Reservation.return_datetime > start,
+            Reservation.pickup_datetime < latest_return
+        )
+    ).all()
+    return pending, vehicles, bookings, versions
+
+
+def _write(assignments, versions, now):
+    # Conditional UPDATEs in the same way the mappers' version_id_col checks
+    # work: a reservation must still be pending and unassigned, and a vehicle
+    # must be at the version read above, or the whole batch is rolled back
+    table = Reservation.__table__
+    statement = table.update().where(
+        table.c.reservation_id == bindparam('target_id'),
+        table.c.status == 'pending',
+        table.c.assigned_vehicle_id.is_(None)
+    ).values(assigned_vehicle_id=bindparam('vehicle_id'), status='confirmed', updated_at=now,
+             version_id=table.c.version_id + 1)
+    result = db.session.execute(statement, [
+        {'target_id': assignment['reservation_id'], 'vehicle_id': assignment['vehicle_id']}
+        for assignment in assignments
+    ])
+    if result.rowcount != len(assignments):
+        raise AssignmentConflict('Some reservations were confirmed or changed while assigning; try again')
+
+    used = sorted({assignment['vehicle_id'] for assignment in assignments})
+    table = Vehicle.__table__
+    statement = table.update().where(
+        table.c.vehicle_id == bindparam('target_id'),
+        table.c.version_id == bindparam('expected_version')
+    ).values(version_id=table.c.version_id + 1, updated_at=now)
+    result = db.session.execute(statement, [
+        {'target_id': vehicle_id, 'expected_version': versions[vehicle_id]} for vehicle_id in used
+    ])
+    if result.rowcount != len(used):
+        raise AssignmentConflict('Some vehicles were booked or changed while assigning; try again')
+
+
+def auto_assign(location_id, start, end, category_id=None, allow_relocation=True, dry_run=False):
+    """Plan and confirm vehicle assignments for the pending reservations picked up
+    at location_id between start and end, all in one transaction.
+
+    With dry_run the plan is returned without writing it. Raises
+    AssignmentConflict, with nothing written, when a reservation or one of
+    the chosen vehicles was changed by someone else in the meantime.
+    """
+    with writer_lock_for(current_app):
+        try:
+            pending, vehicles, bookings, versions = _load(location_id, start, end, category_id)
+            assignments, unassigned = plan_assignments(pending, vehicles, bookings, allow_relocation)
+            if assignments and not dry_run:
+                _write(assignments, versions, datetime.utcnow())
+                db.session.commit()
+            else:
+                db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+    if assignments and not dry_run:
+        availability_index.invalidate()
+
+    idle = [assignment['idle_hours'] for assignment in assignments if assignment['idle_hours'] is not None]
+    return {
+        'assignments': assignments,
+        'unassigned': unassigned,
+        'summary': {
+            'pending': len(pending),
+            'assigned': len(assignments),
+            'unassigned': len(unassigned),
+            'relocations': sum(assignment['relocated'] for assignment in assignments),
+            'vehicles_used': len({assignment['vehicle_id'] for assignment in assignments}),
+            'idle_hours': round(sum(idle), 2),
+            'dry_run': dry_run
+        }
+    }
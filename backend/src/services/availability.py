@@ -0,0 +1,177 @@
+from src.models.user import db
+from src.models.reservation import Reservation
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+import os
+import threading
+import time
+
+# Reservation statuses that block a vehicle for their pickup/return window
+BLOCKING_STATUSES = ('confirmed', 'in_progress')
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 string into a naive UTC datetime like the stored columns"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class VehicleSchedule:
+    """Sorted reservation intervals for a single vehicle.
+
+    Changes are made under AvailabilityIndex's lock; searches read without
+    it, so the lookup lists are rebuilt aside and swapped in as one tuple.
+    """
+
+    __slots__ = ('intervals', 'lookup')
+
+    def __init__(self):
+        self.intervals = []  # (pickup, return, reservation_id), sorted by pickup
+        # (pickup times, running maximum of return times), aligned with intervals
+        self.lookup = ([], [])
+
+    def _rebuild(self):
+        starts = [interval[0] for interval in self.intervals]
+        max_ends = []
+        latest = None
+        for interval in self.intervals:
+            if latest is None or interval[1] > latest:
+                latest = interval[1]
+            max_ends.append(latest)
+        self.lookup = (starts, max_ends)
+
+    def add(self, pickup_dt, return_dt, reservation_id):
+        insort(self.intervals, (pickup_dt, return_dt, reservation_id))
+        self._rebuild()
+
+    def remove(self, reservation_id):
+        remaining = [interval for interval in self.intervals if interval[2] != reservation_id]
+        if len(remaining) != len(self.intervals):
+            self.intervals = remaining
+            self._rebuild()
+
+    def is_free(self, pickup_dt, return_dt):
+        """Check that no interval overlaps [pickup_dt, return_dt)"""
+        # Only intervals starting before return_dt can overlap; among those the
+        # latest return time decides whether any of them reaches past pickup_dt.
+        starts, max_ends = self.lookup
+        idx = bisect_left(starts, return_dt)
+        return idx == 0 or max_ends[idx - 1] <= pickup_dt
+
+
+class AvailabilityIndex:
+    """Per-vehicle interval index of blocking reservations.
+
+    The index is built lazily from the database and kept current by the
+    reservation routes. It is process-local, so it is also rebuilt every
+    AVAILABILITY_INDEX_TTL seconds to pick up changes made by other workers;
+    confirmations still re-check conflicts against the database. One
+    request reloads a stale index while the others keep searching the
+    previous one.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else int(os.environ.get('AVAILABILITY_INDEX_TTL', 60))
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._schedules = {}
+        self._vehicle_by_reservation = {}
+        self._built_at = None
+
+    def _is_stale(self):
+        return self._built_at is None or (self.ttl > 0 and time.monotonic() - self._built_at > self.ttl)
+
+    def load(self, rows):
+        """Replace the index with (vehicle_id, pickup, return, reservation_id) rows"""
+        schedules = {}
+        vehicle_by_reservation = {}
+        for vehicle_id, pickup_dt, return_dt, reservation_id in rows:
+            schedule = schedules.get(vehicle_id)
+            if schedule is None:
+                schedule = schedules[vehicle_id] = VehicleSchedule()
+            schedule.intervals.append((pickup_dt, return_dt, reservation_id))
+            vehicle_by_reservation[reservation_id] = vehicle_id
+
+        for schedule in schedules.values():
+            schedule.intervals.sort()
+            schedule._rebuild()
+
+        with self._lock:
+            self._schedules = schedules
+            self._vehicle_by_reservation = vehicle_by_reservation
+            self._built_at = time.monotonic()
+
+    def rebuild(self):
+        """Load all blocking reservations from the database"""
+        rows = db.session.query(
+            Reservation.assigned_vehicle_id,
+            Reservation.pickup_datetime,
+            Reservation.return_datetime,
+            Reservation.reservation_id
+        ).filter(
+            Reservation.status.in_(BLOCKING_STATUSES),
+            Reservation.assigned_vehicle_id.isnot(None)
+        ).yield_per(10000)
+        self.load(rows)
+
+    def ensure_loaded(self):
+        if not self._is_stale():
+            return
+        if self._built_at is None:
+            # Nothing to search yet (or invalidated): wait for the load
+            self._reload_lock.acquire()
+        elif not self._reload_lock.acquire(blocking=False):
+            # Another request is reloading; the expired index is still usable
+            return
+        try:
+            if self._is_stale():
+                self.rebuild()
+        finally:
+            self._reload_lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def add_reservation(self, reservation):
+        """Track a reservation that now blocks its assigned vehicle"""
+        if not reservation.assigned_vehicle_id or self._built_at is None:
+            return
+        with self._lock:
+            self._remove(reservation.reservation_id)
+            schedule = self._schedules.get(reservation.assigned_vehicle_id)
+            if schedule is None:
+                schedule = self._schedules[reservation.assigned_vehicle_id] = VehicleSchedule()
+            schedule.add(reservation.pickup_datetime, reservation.return_datetime, reservation.reservation_id)
+            self._vehicle_by_reservation[reservation.reservation_id] = reservation.assigned_vehicle_id
+
+    def remove_reservation(self, reservation):
+        """Stop tracking a reservation that no longer blocks a vehicle"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._remove(reservation.reservation_id)
+
+    def _remove(self, reservation_id):
+        vehicle_id = self._vehicle_by_reservation.pop(reservation_id, None)
+        if vehicle_id is not None:
+            self._schedules[vehicle_id].remove(reservation_id)
+
+    def is_available(self, vehicle_id, pickup_dt, return_dt):
+        schedule = self._schedules.get(vehicle_id)
+        return schedule is None or schedule.is_free(pickup_dt, return_dt)
+
+    def filter_available(self, vehicle_ids, pickup_dt, return_dt):
+        """Return the subset of vehicle_ids free for the whole period"""
+        schedules = self._schedules
+        available = []
+        for vehicle_id in vehicle_ids:
+            schedule = schedules.get(vehicle_id)
+            if schedule is None or schedule.is_free(pickup_dt, return_dt):
+                available.append(vehicle_id)
+        return available
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,170 @@
+from flask import Response, request, make_response
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+
+class NamespaceVersions:
+    """Version stamps per cache namespace, bumped on every invalidation.
+
+    With a directory the stamps live in '<directory>/<namespace>.version'
+    files, so an invalidation in one gunicorn worker is seen by the others
+    on their next lookup (one stat() call). Without one they are in-process.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._local = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, namespace):
+        return os.path.join(self.directory, f'{namespace}.version')
+
+    def current(self, namespace):
+        if not self.directory:
+            return self._local.get(namespace, 0)
+        try:
+            stat = os.stat(self._path(namespace))
+        except FileNotFoundError:
+            return 0
+        # A bump replaces the file, so the inode changes even within one mtime tick
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def bump(self, namespace):
+        if not self.directory:
+            with self._lock:
+                self._local[namespace] = self._local.get(namespace, 0) + 1
+            return
+        path = self._path(namespace)
+        temporary = f'{path}.{uuid.uuid4().hex}'
+        with open(temporary, 'w') as handle:
+            handle.write(uuid.uuid4().hex)
+        os.replace(temporary, path)
+
+
+class ResponseCache:
+    """TTL + LRU cache of rendered GET responses for slowly changing data.
+
+    Entries are keyed by namespace and request path with its sorted query
+    string, and remember the namespace version they were rendered under, so
+    invalidate() makes every entry of the namespace stale at once.
+    """
+
+    def __init__(self, ttl, max_entries=256, shared_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = NamespaceVersions(shared_dir)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, namespace, counter):
+        stats = self._stats.setdefault(namespace, {
+            'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0, 'evictions': 0
+        })
+        stats[counter] += 1
+
+    def get(self, namespace, key):
+        version = self.versions.current(namespace)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry and entry['version'] == version and entry['expires'] > now:
+                self._entries.move_to_end((namespace, key))
+                self._count(namespace, 'hits')
+                return entry
+            self._count(namespace, 'misses')
+        return None
+
+    def put(self, namespace, key, body, mimetype, etag, version):
+        """Store a response rendered while the namespace was at version"""
+        entry = {
+            'body': body,
+            'mimetype': mimetype,
+            'etag': etag,
+            'version': version,
+            'expires': time.monotonic() + self.ttl
+        }
+        with self._lock:
+            self._entries[(namespace, key)] = entry
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                (evicted_namespace, _), _ = self._entries.popitem(last=False)
+                self._count(evicted_namespace, 'evictions')
+        return entry
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.versions.bump(namespace)
+            with self._lock:
+                for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == namespace]:
+                    del self._entries[cache_key]
+                self._count(namespace, 'invalidations')
+
+    def record_not_modified(self, namespace):
+        with self._lock:
+            self._count(namespace, 'not_modified')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'shared': self.versions.directory is not None,
+                'namespaces': {namespace: dict(counters) for namespace, counters in self._stats.items()}
+            }
+
+
+response_cache = ResponseCache(
+    ttl=int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256)),
+    shared_dir=os.environ.get('RESPONSE_CACHE_DIR') or None
+)
+
+
+def _request_key():
+    return request.path + '?' + '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+
+
+def _respond(entry, namespace):
+    if request.if_none_match and request.if_none_match.contains(entry['etag']):
+        response_cache.record_not_modified(namespace)
+        response = Response(status=304)
+    else:
+        response = Response(entry['body'], status=200, mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])
+    # Let clients keep the body but revalidate it with If-None-Match
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(namespace):
+    """Serve a GET view from the response cache with ETag revalidation.
+
+    Only 200 responses are stored. Routes that change the underlying data
+    must call response_cache.invalidate(namespace) after committing.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _request_key()
+            entry = response_cache.get(namespace, key)
+            if entry is None:
+                # Read the version first so a concurrent invalidation is not lost
+                version = response_cache.versions.current(namespace)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                entry = response_cache.put(namespace, key, body, response.mimetype, etag, version)
+            return _respond(entry, namespace)
+        return wrapper
+    return decorator
@@ -0,0 +1,311 @@
+from flask import current_app
+from src.models.user import db, User
+from src.models.customer import Customer, CustomerAddress
+from src.services.sqlite_mode import writer_lock_for
+from src.services.jobs import job_handler, report_progress, load_checkpoint, save_checkpoint
+from src.services.principals import secret_key
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.fernet import Fernet
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from src.services.passwords import hash_many
+from datetime import datetime
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import secrets
+import uuid
+
+# Rows inserted per transaction; progress is stored after each chunk
+ONBOARDING_CHUNK_SIZE = int(os.environ.get('ONBOARDING_CHUNK_SIZE', 200))
+# Password hashing processes; 0 hashes in the job thread. A single core
+# gains nothing from a pool, so it defaults to one process per core beyond one.
+ONBOARDING_HASH_WORKERS = int(os.environ.get('ONBOARDING_HASH_WORKERS',
+                                             os.cpu_count() if (os.cpu_count() or 1) > 1 else 0))
+# Below this many rows starting worker processes costs more than it saves
+ONBOARDING_POOL_MIN_ROWS = int(os.environ.get('ONBOARDING_POOL_MIN_ROWS', 200))
+# Passwords per process pool task
+HASH_TASK_SIZE = 20
+MAX_ONBOARDING_ROWS = int(os.environ.get('ONBOARDING_MAX_ROWS', 50000))
+
+REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
+ADDRESS_REQUIRED_FIELDS = ['street_address_1', 'city']
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _text(row, field, default=None):
+    value = row.get(field)
+    return default if _blank(value) else str(value).strip()
+
+
+def _date(row, field, errors):
+    value = row.get(field)
+    if _blank(value):
+        return None
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        errors.append(f'{field} must be a date (YYYY-MM-DD)')
+        return None
+
+
+def _flag(row, field):
+    value = row.get(field)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def _fernet():
+    # A key of its own, derived from SECRET_KEY
+    digest = hashlib.sha256(b'customer-onboarding-passwords:' + secret_key().encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def seal_passwords(rows):
+    """Take the passwords out of the rows before they are queued.
+
+    Returns (rows without passwords, token): the token holds the passwords,
+    by row index, encrypted with a key derived from SECRET_KEY, so the job
+    payload never stores them in plain text. None when no row has one.
+    """
+    passwords = {}
+    sealed = []
+    for index, row in enumerate(rows):
+        if isinstance(row, dict) and 'password' in row:
+            row = dict(row)
+            password = row.pop('password')
+            if not _blank(password):
+                passwords[index] = str(password)
+        sealed.append(row)
+    token = _fernet().encrypt(json.dumps(passwords).encode()).decode() if passwords else None
+    return sealed, token
+
+
+def open_passwords(token):
+    """The passwords sealed by seal_passwords(), by row index"""
+    if not token:
+        return {}
+    return {int(index): password for index, password in json.loads(_fernet().decrypt(token.encode())).items()}
+
+
+def _validate(row, now, password=None):
+    """Build the user, customer and address rows for one driver, or return its errors"""
+    if not isinstance(row, dict):
+        return None, ['Row must be an object']
+    errors = [f'{field} is required' for field in REQUIRED_FIELDS if _blank(row.get(field))]
+
+    user_id = str(uuid.uuid4())
+    user = {
+        'user_id': user_id,
+        'email': _text(row, 'email'),
+        'first_name': _text(row, 'first_name'),
+        'last_name': _text(row, 'last_name'),
+        'phone_number': _text(row, 'phone_number'),
+        'date_of_birth': _date(row, 'date_of_birth', errors),
+        'user_type': 'customer',
+        'status': _text(row, 'status', 'active'),
+        'email_verified': False,
+        'phone_verified': False,
+        'two_factor_enabled': False,
+        'created_at': now,
+        'updated_at': now
+    }
+    customer = {
+        'customer_id': user_id,
+        'customer_number': f'CUST{user_id[:8].upper()}',
+        'driver_license_number': _text(row, 'driver_license_number'),
+        'driver_license_state': _text(row, 'driver_license_state'),
+        'driver_license_country': _text(row, 'driver_license_country', 'USA'),
+        'driver_license_expiry': _date(row, 'driver_license_expiry', errors),
+        'credit_score': None,
+        'preferred_language': _text(row, 'preferred_language', 'en'),
+        'marketing_opt_in': _flag(row, 'marketing_opt_in'),
+        'loyalty_program_member': False,
+        'loyalty_points': 0,
+        'customer_since': now.date(),
+        'total_rentals': 0,
+        'total_spent': 0,
+        'risk_level': _text(row, 'risk_level', 'low'),
+        'notes': _text(row, 'notes'),
+        'created_at': now,
+        'updated_at': now
+    }
+    if not _blank(row.get('credit_score')):
+        try:
+            customer['credit_score'] = int(row['credit_score'])
+        except (TypeError, ValueError):
+            errors.append('credit_score must be an integer')
+
+    address = None
+    if any(not _blank(row.get(field)) for field in ADDRESS_REQUIRED_FIELDS):
+        errors.extend(f'{field} is required for an address' for field in ADDRESS_REQUIRED_FIELDS
+                      if _blank(row.get(field)))
+        address = {
+            'address_id': str(uuid.uuid4()),
+            'customer_id': user_id,
+            'address_type': _text(row, 'address_type', 'home'),
+            'street_address_1': _text(row, 'street_address_1'),
+            'street_address_2': _text(row, 'street_address_2'),
+            'city': _text(row, 'city'),
+            'state_province': _text(row, 'state_province'),
+            'postal_code': _text(row, 'postal_code'),
+            'country': _text(row, 'country', 'USA'),
+            'is_primary': True,
+            'created_at': now,
+            'updated_at': now
+        }
+
+    if errors:
+        return None, errors
+    # Drivers without a password get a random one and must reset it before signing in
+    if password is None:
+        password = row.get('password')
+    if _blank(password):
+        password = secrets.token_urlsafe(16)
+    return (user, customer, address, str(password)), None
+
+
+def _existing_emails(emails):
+    """Lower-cased emails that already have an account, one query per chunk of emails"""
+    taken = set()
+    for start in range(0, len(emails), ONBOARDING_CHUNK_SIZE * 10):
+        chunk = emails[start:start + ONBOARDING_CHUNK_SIZE * 10]
+        query = select(func.lower(User.email)).where(func.lower(User.email).in_(chunk))
+        taken.update(email for (email,) in db.session.execute(query))
+    return taken
+
+
+def _insert(chunk, hashes):
+    users = []
+    for (user, _, _, _), password_hash in zip(chunk, hashes):
+        users.append(dict(user, password_hash=password_hash))
+    db.session.execute(User.__table__.insert(), users)
+    db.session.execute(Customer.__table__.insert(), [customer for _, customer, _, _ in chunk])
+    addresses = [address for _, _, address, _ in chunk if address]
+    if addresses:
+        db.session.execute(CustomerAddress.__table__.insert(), addresses)
+
+
+def _write_chunk(chunk, hashes, errors, save):
+    """Insert one chunk in a transaction, or row by row if a concurrent insert took an email.
+
+    save(next_row, created) runs inside each transaction before it commits.
+    """
+    lock = writer_lock_for(current_app)
+    try:
+        with lock:
+            _insert([values for _, values in chunk], hashes)
+            save(chunk[-1][0] + 1, len(chunk))
+            db.session.commit()
+        return len(chunk)
+    except IntegrityError:
+        db.session.rollback()
+
+    created = 0
+    for (index, values), password_hash in zip(chunk, hashes):
+        try:
+            with lock:
+                _insert([values], [password_hash])
+                save(index + 1, created + 1)
+                db.session.commit()
+            created += 1
+        except IntegrityError as e:
+            db.session.rollback()
+            errors.append({'row': index, 'errors': [f'Integrity error: {e.orig}']})
+    return created
+
+
+def _hash_chunks(chunks):
+    """Yield the password hashes of each chunk in order, hashing ahead on a process pool"""
+    passwords = [password for chunk in chunks for _, _, _, password in chunk]
+    if ONBOARDING_HASH_WORKERS <= 0 or len(passwords) < ONBOARDING_POOL_MIN_ROWS:
+        for chunk in chunks:
+            yield hash_many([password for _, _, _, password in chunk])
+        return
+
+    # Small tasks keep every process busy and the progress fine-grained
+    tasks = [passwords[start:start + HASH_TASK_SIZE] for start in range(0, len(passwords), HASH_TASK_SIZE)]
+    # spawn: forking a threaded web worker can copy held locks into the children
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=ONBOARDING_HASH_WORKERS, mp_context=context) as pool:
+        # map() submits every task up front, so hashing continues while earlier chunks are inserted
+        hashes = (password_hash for task in pool.map(hash_many, tasks) for password_hash in task)
+        for chunk in chunks:
+            yield [next(hashes) for _ in chunk]
+
+
+def onboard_customers(job_id, rows, passwords=None):
+    """Create users, customers and addresses for a spreadsheet of drivers.
+
+    Emails already registered, or repeated in the file, are rejected in
+    memory after one lookup, passwords are hashed on a process pool, and
+    each chunk of rows is written with three executemany INSERTs in its own
+    transaction. Progress is stored on the job after every chunk, and a
+    checkpoint with every transaction, so a retried job skips the rows an
+    earlier attempt created rather than reporting them as existing.
+    passwords (from open_passwords) replace the rows' own password fields.
+    """
+    passwords = passwords or {}
+    checkpoint = load_checkpoint(job_id) if job_id else None
+    next_row = checkpoint['next_row'] if checkpoint else 0
+    now = datetime.utcnow()
+    errors = list(checkpoint['errors']) if checkpoint else []
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows):
+        values, row_errors = _validate(row, now, passwords.get(index))
+        # Rows up to the checkpoint are done; their errors came with it
+        done = index < next_row
+        if row_errors:
+            if not done:
+                errors.append({'row': index, 'errors': row_errors})
+            continue
+        email = values[0]['email'].lower()
+        if email in seen:
+            if not done:
+                errors.append({'row': index, 'errors': [f"Duplicate email in file: {values[0]['email']}"]})
+            continue
+        seen.add(email)
+        if not done:
+            valid.append((index, values))
+
+    taken = _existing_emails(sorted(values[0]['email'].lower() for _, values in valid))
+    accepted = []
+    for index, values in valid:
+        if values[0]['email'].lower() in taken:
+            errors.append({'row': index, 'errors': [f"User with this email already exists: {values[0]['email']}"]})
+        else:
+            accepted.append((index, values))
+
+    done = len(rows) - len(accepted)
+    if job_id:
+        report_progress(job_id, done, len(rows))
+
+    created = checkpoint['created'] if checkpoint else 0
+
+    def save(committed_to, created_now):
+        if job_id:
+            save_checkpoint(job_id, {'next_row': committed_to, 'created': created + created_now,
+                                     'errors': [error for error in errors if error['row'] < committed_to]})
+
+    chunks = [accepted[start:start + ONBOARDING_CHUNK_SIZE] for start in range(0, len(accepted), ONBOARDING_CHUNK_SIZE)]
+    hashed = _hash_chunks([[values for _, values in chunk] for chunk in chunks])
+    for chunk, hashes in zip(chunks, hashed):
+        created += _write_chunk(chunk, hashes, errors, save)
+        done += len(chunk)
+        if job_id:
+            report_progress(job_id, done)
+
+    errors.sort(key=lambda error: error['row'])
+    return {'total': len(rows), 'created': created, 'failed': len(errors), 'errors': errors}
+
+
+@job_handler('customer_onboarding')
+def onboarding_job(job_id, payload):
+    return onboard_customers(job_id, payload['rows'], open_passwords(payload.get('passwords')))
@@ -0,0 +1,134 @@
+from flask import Response, stream_with_context
+from src.services.serialization import encoder_for, field_keys, field_columns, dumps
+from datetime import date
+import csv
+import io
+import json
+import os
+
+# Rows fetched per round trip. The ORM query runs with yield_per, which also
+# requests a server-side cursor (stream_results), so a worker holds at most one
+# batch of rows and one batch of output however large the export is.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def export_options(args, model):
+    """Read format= and fields= for an export of model; raises ValueError when invalid.
+
+    Returns the format and the to_dict() keys to write, in to_dict() order.
+    """
+    export_format = args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    known = field_keys(model)
+    fields = args.get('fields')
+    if fields is None:
+        return export_format, known
+    keys = [key.strip() for key in fields.split(',') if key.strip()]
+    unknown = [key for key in keys if key not in known]
+    if unknown:
+        raise ValueError(f"Unknown field: {unknown[0]}")
+    if not keys:
+        raise ValueError('fields must name at least one field')
+    return export_format, [key for key in known if key in keys]
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def _ndjson_chunks(rows, encode, on_batch):
+    lines = []
+    for row in rows:
+        lines.append(dumps(encode(row)))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            on_batch(len(lines))
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        on_batch(len(lines))
+        yield b'\n'.join(lines) + b'\n'
+
+
+def _csv_chunks(rows, encode, keys, on_batch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    written = 0
+    for row in rows:
+        data = encode(row)
+        writer.writerow([_csv_value(data[key]) for key in keys])
+        written += 1
+        if written >= EXPORT_BATCH_SIZE:
+            on_batch(written)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            written = 0
+    on_batch(written)
+    yield buffer.getvalue().encode('utf-8')
+
+
+def export_chunks(query, model, export_format, keys, on_batch=None):
+    """Encode the rows of a filtered ORM query as NDJSON or CSV byte chunks.
+
+    Each row is the model's to_dict() limited to keys. Only the columns
+    those keys need are selected, and rows come back as plain tuples rather
+    than ORM instances, so nothing accumulates in the session. on_batch is
+    called with the number of rows in each chunk.
+    """
+    columns = field_columns(model, keys)
+    table_columns = [column for column in model.__table__.columns if column.key in columns]
+    rows = query.with_entities(*table_columns).yield_per(EXPORT_BATCH_SIZE)
+    encode = encoder_for(model, keys)
+    on_batch = on_batch or (lambda count: None)
+
+    if export_format == 'csv':
+        return _csv_chunks(rows, encode, keys, on_batch)
+    return _ndjson_chunks(rows, encode, on_batch)
+
+
+def export_filename(name, export_format):
+    return f'{name}-{date.today().isoformat()}.{export_format}'
+
+
+def export_response(query, model, name, export_format, keys):
+    """Stream an export as the response body"""
+    chunks = export_chunks(query, model, export_format, keys)
+    response = Response(stream_with_context(chunks), status=200, mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(name, export_format)}"'
+    return response
+
+
+def export_to_file(path, query, model, name, export_format, keys, on_progress=None):
+    """Write an export to path for a background job and describe the file"""
+    written = {'rows': 0}
+
+    def count(rows):
+        written['rows'] += rows
+        if on_progress:
+            on_progress(written['rows'])
+
+    size = 0
+    temporary = f'{path}.partial'
+    with open(temporary, 'wb') as handle:
+        for chunk in export_chunks(query, model, export_format, keys, count):
+            handle.write(chunk)
+            size += len(chunk)
+    os.replace(temporary, path)
+    return {
+        'filename': export_filename(name, export_format),
+        'format': export_format,
+        'mimetype': EXPORT_FORMATS[export_format],
+        'rows': written['rows'],
+        'bytes': size
+    }
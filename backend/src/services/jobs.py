@@ -0,0 +1,317 @@
+from flask import current_app, request, jsonify
+from flask.cli import AppGroup
+from src.models.user import db
+from src.models.job import BackgroundJob
+from src.services.sqlite_mode import writer_lock_for
+from sqlalchemy import select, update, and_, or_
+from datetime import datetime, timedelta
+import click
+import json
+import os
+import socket
+import threading
+import uuid
+
+# Seconds a claimed job stays locked to its worker. Progress reports renew
+# the lease; when it expires (the worker died) another worker retakes the job.
+JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS', 600))
+# Retry delay after the n-th failed attempt: base * 2 ** (n - 1), capped
+JOBS_RETRY_BASE_SECONDS = float(os.environ.get('JOBS_RETRY_BASE_SECONDS', 5))
+JOBS_RETRY_MAX_SECONDS = float(os.environ.get('JOBS_RETRY_MAX_SECONDS', 300))
+JOBS_POLL_SECONDS = float(os.environ.get('JOBS_POLL_SECONDS', 1))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+# Where jobs that produce files (exports) write them
+JOBS_RESULT_DIR = os.environ.get('JOBS_RESULT_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'job_results')
+
+# Handlers by job type: handler(job_id, payload) returns the JSON result
+JOB_HANDLERS = {}
+
+
+def job_handler(job_type):
+    """Register the function that runs jobs of job_type"""
+    def decorator(function):
+        JOB_HANDLERS[job_type] = function
+        return function
+    return decorator
+
+
+def enqueue(job_type, payload=None, total=None, created_by=None, max_attempts=None, run_at=None):
+    """Queue a job and return its id. Commits the current session."""
+    if job_type not in JOB_HANDLERS:
+        raise LookupError(f'No handler for job type {job_type}')
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=json.dumps(payload) if payload is not None else None,
+        progress_total=total,
+        created_by=created_by,
+        max_attempts=max_attempts or JOBS_MAX_ATTEMPTS,
+        run_at=run_at or datetime.utcnow()
+    )
+    with writer_lock_for(current_app):
+        db.session.add(job)
+        db.session.commit()
+    job_wakeup.set()
+    return job.job_id
+
+
+def _set(job_id, worker_id=None, **values):
+    """Update the job's row and return the number of rows changed.
+
+    With worker_id, only while the job is still leased to that worker.
+    """
+    # A connection of its own, so progress reports do not commit or end the
+    # handler's session transaction (e.g. an export still streaming rows)
+    values['updated_at'] = datetime.utcnow()
+    condition = BackgroundJob.job_id == job_id
+    if worker_id is not None:
+        condition = and_(condition, BackgroundJob.locked_by == worker_id)
+    with writer_lock_for(current_app), db.engine.begin() as connection:
+        return connection.execute(update(BackgroundJob).where(condition).values(**values)).rowcount
+
+
+def report_progress(job_id, current, total=None):
+    """Store how many items of the job are done and renew its lease"""
+    values = {'progress_current': current}
+    if total is not None:
+        values['progress_total'] = total
+    values['locked_until'] = datetime.utcnow() + timedelta(seconds=JOBS_LEASE_SECONDS)
+    _set(job_id, **values)
+
+
+def save_checkpoint(job_id, state):
+    """Record how far the job got, in the session's current transaction.
+
+    Call it before committing the work that state describes, so both commit
+    together: a retry reads it back with load_checkpoint() and carries on
+    after that work instead of repeating it.
+    """
+    db.session.execute(update(BackgroundJob).where(BackgroundJob.job_id == job_id).values(
+        checkpoint=json.dumps(state), updated_at=datetime.utcnow()))
+
+
+def load_checkpoint(job_id):
+    """State last saved by save_checkpoint() for the job, or None on its first attempt"""
+    checkpoint = db.session.execute(
+        select(BackgroundJob.checkpoint).where(BackgroundJob.job_id == job_id)).scalar()
+    return json.loads(checkpoint) if checkpoint else None
+
+
+def result_path(job_id, extension):
+    """Path of the file a job writes its output to"""
+    os.makedirs(JOBS_RESULT_DIR, exist_ok=True)
+    return os.path.join(JOBS_RESULT_DIR, f'{job_id}.{extension}')
+
+
+def wants_async():
+    """Whether the request asked to run as a background job (?async=true)"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted(job_id):
+    """202 response pointing at the queued job"""
+    job = db.session.get(BackgroundJob, job_id)
+    response = jsonify({'job': job.to_dict(), 'message': 'Job queued'})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt after `attempts` failed ones"""
+    return min(JOBS_RETRY_MAX_SECONDS, JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _claimable(now):
+    return or_(
+        and_(BackgroundJob.status == 'queued', BackgroundJob.run_at <= now),
+        and_(BackgroundJob.status == 'running', BackgroundJob.locked_until < now)
+    )
+
+
+def claim_job(worker_id):
+    """Lock the oldest due job to worker_id and return its id, or None.
+
+    The UPDATE repeats the eligibility condition, so when several workers
+    pick the same candidate only one of them changes the row; the others
+    see a rowcount of 0 and look again. A job whose worker died on its last
+    attempt is marked failed instead of run again.
+    """
+    for _ in range(5):
+        now = datetime.utcnow()
+        job = db.session.execute(
+            select(BackgroundJob.job_id, BackgroundJob.status, BackgroundJob.attempts, BackgroundJob.max_attempts)
+            .where(_claimable(now)).order_by(BackgroundJob.run_at).limit(1)
+        ).first()
+        if job is None:
+            db.session.rollback()
+            return None
+        if job.status == 'running' and job.attempts >= job.max_attempts:
+            values = dict(status='failed', error=f'Worker lease expired on attempt {job.attempts}',
+                          payload=None, checkpoint=None, locked_by=None, locked_until=None,
+                          finished_at=now, updated_at=now)
+        else:
+            values = dict(status='running', locked_by=worker_id,
+                          locked_until=now + timedelta(seconds=JOBS_LEASE_SECONDS),
+                          attempts=BackgroundJob.attempts + 1, started_at=now, updated_at=now)
+        with writer_lock_for(current_app):
+            claimed = db.session.execute(
+                update(BackgroundJob).where(BackgroundJob.job_id == job.job_id, _claimable(now)).values(**values)
+            ).rowcount
+            db.session.commit()
+        if claimed and values['status'] == 'running':
+            return job.job_id
+    return None
+
+
+def run_job(job_id, worker_id):
+    """Run a job claimed by worker_id and record its result, or schedule a
+    retry with backoff.
+
+    The outcome is only recorded while the job is still leased to
+    worker_id: if the lease expired and another worker retook the job, this
+    attempt's result is dropped rather than overwriting the new attempt.
+    """
+    job = db.session.get(BackgroundJob, job_id)
+    job_type, payload = job.job_type, job.get_payload()
+    attempts, max_attempts = job.attempts, job.max_attempts
+    db.session.rollback()
+    try:
+        handler = JOB_HANDLERS.get(job_type)
+        if handler is None:
+            raise LookupError(f'No handler for job type {job_type}')
+        result = handler(job_id, payload)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Job %s (%s) attempt %s failed', job_id, job_type, attempts)
+        if attempts < max_attempts:
+            recorded = _set(job_id, worker_id, status='queued', error=str(e), locked_by=None, locked_until=None,
+                            run_at=datetime.utcnow() + timedelta(seconds=retry_delay(attempts)))
+        else:
+            recorded = _set(job_id, worker_id, status='failed', error=str(e), payload=None, checkpoint=None,
+                            locked_by=None, locked_until=None, finished_at=datetime.utcnow())
+        if not recorded:
+            current_app.logger.warning('Job %s attempt %s lost its lease; failure dropped', job_id, attempts)
+        return False
+    recorded = _set(job_id, worker_id, status='succeeded', result=json.dumps(result), error=None, payload=None,
+                    checkpoint=None, locked_by=None, locked_until=None, finished_at=datetime.utcnow())
+    if not recorded:
+        current_app.logger.warning('Job %s attempt %s lost its lease; result dropped', job_id, attempts)
+    return bool(recorded)
+
+
+# Set when a job is queued in this process, so idle workers here start at once
+job_wakeup = threading.Event()
+
+
+class JobWorker:
+    """Runs queued jobs on a pool of threads, each claiming jobs on its own.
+
+    Any number of workers, in any number of processes, can share the
+    queue: claim_job() hands every job to exactly one of them.
+    """
+
+    def __init__(self, app, threads=1, poll_interval=None, name=None):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = JOBS_POLL_SECONDS if poll_interval is None else poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+        self._threads = []
+
+    def run_pending(self, worker_id=None):
+        """Run due jobs until none is left; returns how many ran"""
+        worker_id = worker_id or self.name
+        count = 0
+        with self.app.app_context():
+            try:
+                while not self._stop.is_set():
+                    job_id = claim_job(worker_id)
+                    if job_id is None:
+                        break
+                    run_job(job_id, worker_id)
+                    count += 1
+            finally:
+                db.session.remove()
+        return count
+
+    def _loop(self, index):
+        worker_id = f'{self.name}/{index}'
+        while not self._stop.is_set():
+            try:
+                ran = self.run_pending(worker_id)
+            except Exception:
+                self.app.logger.exception('Job worker %s failed to poll', worker_id)
+                ran = 0
+            if not ran:
+                job_wakeup.wait(self.poll_interval)
+                job_wakeup.clear()
+
+    def start(self):
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(index,), name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def wait(self):
+        """Block until stop() is called"""
+        self._stop.wait()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        job_wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def start_in_process_worker(app):
+    """Run job worker threads inside the web process, started by its first request.
+
+    Meant for development and single-process deployments; under gunicorn
+    run `flask jobs worker` instead (JOBS_IN_PROCESS=0).
+    """
+    threads = int(os.environ.get('JOBS_WORKER_THREADS', 2))
+    state = {'worker': None}
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_job_worker():
+        if state['worker'] is None:
+            with lock:
+                if state['worker'] is None:
+                    state['worker'] = JobWorker(app, threads=threads).start()
+
+    app.extensions['job_worker'] = state
+
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@jobs_cli.command('worker')
+@click.option('--threads', default=lambda: int(os.environ.get('JOBS_WORKER_THREADS', 2)), show_default='2',
+              help='Jobs run concurrently by this process.')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, then exit.')
+def worker_command(threads, once):
+    """Process queued jobs until interrupted."""
+    worker = JobWorker(current_app._get_current_object(), threads=threads)
+    if once:
+        click.echo(f'{worker.run_pending()} jobs run')
+        return
+    click.echo(f'Job worker {worker.name} running {threads} threads')
+    worker.start()
+    try:
+        worker.wait()
+    except KeyboardInterrupt:
+        worker.stop(timeout=30)
+
+
+@jobs_cli.command('status')
+def status_command():
+    """Count jobs by type and status."""
+    counts = db.session.execute(
+        select(BackgroundJob.job_type, BackgroundJob.status, db.func.count())
+        .group_by(BackgroundJob.job_type, BackgroundJob.status)
+    ).all()
+    for job_type, status, count in counts:
+        click.echo(f'{job_type} {status}: {count}')
@@ -0,0 +1,65 @@
+from sqlalchemy.orm import joinedload, contains_eager
+from src.models.customer import Customer
+from src.models.vehicle import Vehicle
+from src.models.reservation import Reservation
+from src.models.financial import Payment, Invoice
+from src.models.maintenance import MaintenanceSchedule, DamageReport
+from src.services.projection import projection_options
+
+# Relationship loading strategies for each list endpoint. Every relationship an
+# endpoint serializes per row is listed here so a page costs a fixed number of
+# statements regardless of its size. Many-to-one relationships use joinedload;
+# the strategies are built lazily because backref attributes only exist once
+# the mappers are configured.
+LOAD_STRATEGIES = {
+    'vehicle.get_vehicles': lambda: (
+        contains_eager(Vehicle.category),
+        joinedload(Vehicle.current_location),
+    ),
+    'reservation.get_reservations': lambda: (
+        joinedload(Reservation.customer).joinedload(Customer.user),
+        joinedload(Reservation.vehicle_category),
+        joinedload(Reservation.pickup_location),
+        joinedload(Reservation.return_location),
+        joinedload(Reservation.assigned_vehicle),
+    ),
+    'customer.get_customers': lambda: (
+        contains_eager(Customer.user),
+    ),
+    'customer.get_customer_reservations': lambda: (
+        joinedload(Reservation.assigned_vehicle),
+        joinedload(Reservation.vehicle_category),
+    ),
+    'financial.get_payments': lambda: (
+        joinedload(Payment.customer),
+        joinedload(Payment.reservation),
+    ),
+    'financial.get_invoices': lambda: (
+        joinedload(Invoice.customer),
+        joinedload(Invoice.reservation),
+    ),
+    'maintenance.get_maintenance_schedules': lambda: (
+        joinedload(MaintenanceSchedule.vehicle),
+    ),
+    'maintenance.get_damage_reports': lambda: (
+        joinedload(DamageReport.vehicle),
+        joinedload(DamageReport.reporter),
+        joinedload(DamageReport.reservation),
+    ),
+}
+
+_compiled_strategies = {}
+
+
+def with_loading(query, endpoint, fields=None):
+    """Apply the declared loading strategy for an endpoint to a query.
+
+    With a ?fields= selection from requested_fields() only the columns and
+    relationships the selection needs are loaded.
+    """
+    if fields is not None:
+        return query.options(*projection_options(endpoint, fields))
+    options = _compiled_strategies.get(endpoint)
+    if options is None:
+        options = _compiled_strategies[endpoint] = LOAD_STRATEGIES[endpoint]()
+    return query.options(*options)
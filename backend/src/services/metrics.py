@@ -0,0 +1,256 @@
+from flask import Response, g, request, has_app_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from contextlib import contextmanager
+from time import perf_counter
+import bisect
+import os
+import threading
+
+# Upper bounds of the histogram buckets (Prometheus defaults for latency)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """What one request spent, collected on flask.g while it runs"""
+
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'serialize_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.response_bytes = 0
+
+    def server_timing(self, elapsed):
+        return (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries", '
+            f'serialize;dur={self.serialize_seconds * 1000:.1f}'
+        )
+
+
+def current_stats():
+    """The running request's stats, or None outside a request"""
+    if not has_app_context():
+        return None
+    return g.get('request_stats')
+
+
+@contextmanager
+def timed_serialization():
+    """Add the time spent in the block to the request's serialization time"""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_stats()
+        if stats is not None:
+            stats.serialize_seconds += perf_counter() - started
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, counting jsonify() encoding as serialization time"""
+
+    def dumps(self, obj, **kwargs):
+        with timed_serialization():
+            return super().dumps(obj, **kwargs)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.bounds):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.bounds, self.counts):
+            running += count
+            yield bound, running
+
+
+class RouteMetrics:
+    """Totals and histograms for one endpoint and method"""
+
+    __slots__ = ('latency', 'sql_queries', 'statuses', 'sql_seconds', 'serialize_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.statuses = {}
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.response_bytes = 0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Per-route request metrics for this process, rendered for Prometheus.
+
+    Each gunicorn worker keeps its own registry, so a scrape reports the
+    worker that answered it; the pid label keeps their series apart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, endpoint, method, status, elapsed, stats):
+        with self._lock:
+            route = self._routes.get((endpoint, method))
+            if route is None:
+                route = self._routes[(endpoint, method)] = RouteMetrics()
+            route.latency.observe(elapsed)
+            route.sql_queries.observe(stats.sql_count)
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            route.sql_seconds += stats.sql_seconds
+            route.serialize_seconds += stats.serialize_seconds
+            route.response_bytes += stats.response_bytes
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        pid = os.getpid()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, attribute):
+            for (endpoint, method), route in routes:
+                labels = f'endpoint="{_label(endpoint)}",method="{method}",pid="{pid}"'
+                metric = getattr(route, attribute)
+                for bound, count in metric.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{_number(bound)}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {metric.count}')
+                lines.append(f'{name}_sum{{{labels}}} {_number(metric.total)}')
+                lines.append(f'{name}_count{{{labels}}} {metric.count}')
+
+        def counter(name, attribute):
+            for (endpoint, method), route in routes:
+                labels = f'endpoint="{_label(endpoint)}",method="{method}",pid="{pid}"'
+                lines.append(f'{name}{{{labels}}} {_number(getattr(route, attribute))}')
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+            family('http_request_duration_seconds', 'histogram', 'Request wall time')
+            histogram('http_request_duration_seconds', 'latency')
+            family('http_request_sql_queries', 'histogram', 'SQL statements executed per request')
+            histogram('http_request_sql_queries', 'sql_queries')
+            family('http_requests_total', 'counter', 'Requests by response status')
+            for (endpoint, method), route in routes:
+                for status, count in sorted(route.statuses.items()):
+                    lines.append(f'http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                                 f'status="{status}",pid="{pid}"}} {count}')
+            family('http_request_sql_seconds_total', 'counter', 'Time spent executing SQL statements')
+            counter('http_request_sql_seconds_total', 'sql_seconds')
+            family('http_request_serialization_seconds_total', 'counter', 'Time spent encoding response bodies')
+            counter('http_request_serialization_seconds_total', 'serialize_seconds')
+            family('http_response_bytes_total', 'counter', 'Response body bytes sent')
+            counter('http_response_bytes_total', 'response_bytes')
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+
+
+def _counted(chunks, stats, finish):
+    """Pass a streamed body through, counting its bytes, and record the request when it ends"""
+    try:
+        for chunk in chunks:
+            stats.response_bytes += len(chunk.encode()) if isinstance(chunk, str) else len(chunk)
+            yield chunk
+    finally:
+        finish()
+
+
+def configure_metrics(app, db, registry=None):
+    """Instrument every request of app unless METRICS_ENABLED=0.
+
+    SQL statements and their time come from engine events; JSON encoding
+    through jsonify() and json_response() counts as serialization time.
+    Responses carry a Server-Timing header and each request is added to the
+    registry served at /api/metrics. A streamed body is recorded once it has
+    been sent, so its header shows only the time to the first byte.
+    """
+    if os.environ.get('METRICS_ENABLED', '1') == '0':
+        return None
+    registry = registry or metrics_registry
+    app.json = TimedJSONProvider(app)
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(perf_counter())
+
+    def record_execute(started):
+        stats = current_stats()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_seconds += perf_counter() - started
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        record_execute(conn.info['query_started'].pop())
+
+    def execute_failed(context):
+        # after_cursor_execute does not fire for a statement that raised
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            record_execute(started.pop())
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_execute)
+        event.listen(db.engine, 'handle_error', execute_failed)
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats()
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        method, status = request.method, response.status_code
+        response.headers['Server-Timing'] = stats.server_timing(perf_counter() - stats.started)
+
+        def finish():
+            registry.observe(endpoint, method, status, perf_counter() - stats.started, stats)
+
+        if response.is_streamed:
+            response.response = _counted(response.response, stats, finish)
+        else:
+            stats.response_bytes = response.content_length or 0
+            finish()
+        return response
+
+    @app.route('/api/metrics')
+    def metrics():
+        """Per-route request metrics in the Prometheus text format"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,160 @@
+from flask import request
+from collections import OrderedDict
+from datetime import datetime, date
+from sqlalchemy import and_, or_
+import base64
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+
+class CountCache:
+    """Small TTL cache for COUNT(*) results keyed by the compiled query"""
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, query):
+        if self.ttl <= 0:
+            return query.order_by(None).count()
+
+        compiled = query.statement.compile()
+        key = (str(compiled), tuple(sorted(compiled.params.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        total = query.order_by(None).count()
+        with self._lock:
+            self._entries[key] = (total, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+
+count_cache = CountCache(ttl=int(os.environ.get('PAGINATION_COUNT_TTL', 30)))
+
+
+def encode_cursor(sort_value, key_value):
+    """Encode the sort and tie-breaker values of the last row into an opaque cursor"""
+    if isinstance(sort_value, datetime):
+        value = ['dt', sort_value.isoformat()]
+    elif isinstance(sort_value, date):
+        value = ['d', sort_value.isoformat()]
+    else:
+        value = ['v', sort_value]
+    payload = json.dumps([value, key_value], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        (kind, value), key_value = json.loads(base64.urlsafe_b64decode(padded))
+        if kind == 'dt':
+            value = datetime.fromisoformat(value)
+        elif kind == 'd':
+            value = date.fromisoformat(value)
+        return value, key_value
+    except (ValueError, TypeError):
+        raise ValueError('Invalid pagination cursor')
+
+
+class OffsetPage:
+    """A page fetched with LIMIT/OFFSET and an exact total"""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = math.ceil(total / per_page) if total else 0
+
+    def to_dict(self):
+        return {
+            'page': self.page,
+            'pages': self.pages,
+            'per_page': self.per_page,
+            'total': self.total,
+            'has_next': self.page < self.pages,
+            'has_prev': self.page > 1
+        }
+
+
+class CursorPage:
+    """A page fetched with a keyset condition on the sort columns"""
+
+    def __init__(self, items, per_page, next_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def to_dict(self):
+        pagination = {
+            'mode': 'cursor',
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'has_next': self.next_cursor is not None
+        }
+        if self.total is not None:
+            pagination['total'] = self.total
+        return pagination
+
+
+def paginate(query, sort_column, key_column, descending=False):
+    """Paginate a query ordered by sort_column with key_column as tie-breaker.
+
+    Offset mode (page/per_page) is the default. Passing a cursor argument,
+    empty for the first page, or pagination=cursor switches to keyset mode,
+    which seeks past the last row instead of scanning OFFSET rows and only
+    counts when include_total=true (served from a short-lived count cache).
+    """
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    per_page = min(per_page if per_page > 0 else DEFAULT_PER_PAGE, MAX_PER_PAGE)
+
+    if descending:
+        ordered = query.order_by(sort_column.desc(), key_column.desc())
+    else:
+        ordered = query.order_by(sort_column.asc(), key_column.asc())
+
+    cursor = request.args.get('cursor')
+    if cursor is None and request.args.get('pagination') != 'cursor':
+        page = max(request.args.get('page', 1, type=int), 1)
+        items = ordered.limit(per_page).offset((page - 1) * per_page).all()
+        total = query.order_by(None).count()
+        return OffsetPage(items, page, per_page, total)
+
+    if cursor:
+        sort_value, key_value = decode_cursor(cursor)
+        if descending:
+            seek = or_(sort_column < sort_value, and_(sort_column == sort_value, key_column < key_value))
+        else:
+            seek = or_(sort_column > sort_value, and_(sort_column == sort_value, key_column > key_value))
+        ordered = ordered.filter(seek)
+
+    rows = ordered.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, key_column.key))
+
+    total = None
+    if request.args.get('include_total', '').lower() == 'true':
+        total = count_cache.count(query)
+
+    return CursorPage(items, per_page, next_cursor, total)
@@ -0,0 +1,130 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+# werkzeug method string: algorithm and cost, e.g. 'scrypt:32768:8:1' or
+# 'pbkdf2:sha256:600000'. Stored hashes made with other parameters are
+# replaced on the next successful login.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+# Hashing processes per gunicorn worker, started by its post_fork hook; 0
+# hashes in the request thread. Everywhere else (development server, CLI
+# commands, seeding) passwords are hashed in the calling thread.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+# Hashes waiting or running per web worker before requests are turned away
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+# Seconds a request waits for a queue slot before PasswordHashBusy
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes are already queued in this worker"""
+
+
+def generate_hash(password, method=None):
+    """Hash a password with the configured method (runs in the calling process)"""
+    return generate_password_hash(password, method=method or PASSWORD_HASH_METHOD)
+
+
+def hash_many(passwords, method=None):
+    """Hash a list of passwords (a process pool task for bulk imports)"""
+    return [generate_hash(password, method) for password in passwords]
+
+
+def _verify_and_rehash(password_hash, password, method, stored):
+    """Check a password and, if it matches a hash whose stored method is not
+    stored, hash it again with method; both in one round trip to the pool"""
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] != stored:
+        return True, generate_hash(password, method)
+    return True, None
+
+
+_stored_methods = {}
+
+
+def stored_method(method=None):
+    """The method prefix werkzeug stores for method, with its defaults filled in"""
+    method = method or PASSWORD_HASH_METHOD
+    stored = _stored_methods.get(method)
+    if stored is None:
+        # 'scrypt' is stored as 'scrypt:32768:8:1'; find out once with a hash
+        # of the empty password rather than copying werkzeug's defaults
+        stored = _stored_methods[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return stored
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != stored_method()
+
+
+class PasswordHasher:
+    """Runs password hashing on a small process pool.
+
+    Hashing is deliberately slow and CPU bound. A fixed number of processes
+    per web worker caps how many cores a burst of logins can take, so the
+    other requests keep their share of the CPU. At most max_pending hashes
+    are queued per worker; beyond that, requests wait up to queue_timeout
+    seconds and then get PasswordHashBusy instead of piling up.
+
+    workers starts at 0, hashing in the calling thread; gunicorn's post_fork
+    hook turns the pool on in web workers only.
+    """
+
+    def __init__(self, workers=0, max_pending=PASSWORD_HASH_QUEUE,
+                 queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Created on first use in each process, so gunicorn workers never
+        # share a pool forked from the master
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    # spawn: forking a threaded web worker can copy held locks into the children
+                    context = multiprocessing.get_context('spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHashBusy('Too many sign-ins in progress, please retry')
+        try:
+            if self.workers <= 0:
+                return function(*args)
+            return self._executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_hash, password, PASSWORD_HASH_METHOD)
+
+    def verify(self, password_hash, password):
+        """(matches, new_hash): new_hash is set when a matching hash should be replaced"""
+        return self._run(_verify_and_rehash, password_hash, password, PASSWORD_HASH_METHOD, stored_method())
+
+    def warm_up(self):
+        """Start the pool's processes now instead of on the first login"""
+        stored_method()
+        if self.workers > 0:
+            executor = self._executor()
+            for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,314 @@
+from flask import g, jsonify
+from sqlalchemy import event
+from functools import wraps
+from itertools import chain
+from src.models.user import db, UserRole, Permission, RolePermission
+from src.services.cache import NamespaceVersions
+from src.services.principals import authenticate, bearer_token
+import os
+import threading
+import time
+
+
+class _Masks:
+    """One consistent set of permission bits and role masks.
+
+    Checks read whichever instance is current without the lock; every change
+    is made to a new instance or a copy, which then replaces it whole.
+    """
+
+    def __init__(self):
+        self.bits = {}      # permission_id -> bit
+        self.names = {}     # permission_id -> permission_name
+        self.by_name = {}   # permission_name -> bit
+        self.next_bit = 0
+        self.own = {}       # role_id -> mask of its direct grants
+        self.parent = {}    # role_id -> parent_role_id
+        self.children = {}  # role_id -> ids of the roles inheriting from it
+        self.closure = {}   # role_id -> effective mask
+        self.combined = {}  # tuple of role ids -> OR of their masks
+
+    def copy(self):
+        masks = _Masks()
+        masks.bits = dict(self.bits)
+        masks.names = dict(self.names)
+        masks.by_name = dict(self.by_name)
+        masks.next_bit = self.next_bit
+        masks.own = dict(self.own)
+        masks.parent = dict(self.parent)
+        masks.children = {role_id: set(children) for role_id, children in self.children.items()}
+        masks.closure = dict(self.closure)
+        return masks
+
+    # Changes, made before the instance is published; resolve() finishes them
+
+    def add_permission(self, permission_id, name):
+        if permission_id in self.bits:
+            self.by_name.pop(self.names[permission_id], None)
+        else:
+            self.bits[permission_id] = 1 << self.next_bit
+            self.next_bit += 1
+        self.names[permission_id] = name
+        self.by_name[name] = self.bits[permission_id]
+
+    def drop_permission(self, permission_id):
+        bit = self.bits.pop(permission_id, None)
+        if bit is None:
+            return
+        self.by_name.pop(self.names.pop(permission_id), None)
+        # The bit is not reused, so clearing it everywhere is enough
+        for masks in (self.own, self.closure):
+            for role_id, mask in masks.items():
+                masks[role_id] = mask & ~bit
+
+    def set_parent(self, role_id, parent_role_id):
+        previous = self.parent.get(role_id)
+        if previous is not None:
+            self.children.get(previous, set()).discard(role_id)
+        self.parent[role_id] = parent_role_id
+        if parent_role_id is not None:
+            self.children.setdefault(parent_role_id, set()).add(role_id)
+
+    def drop_role(self, role_id):
+        # Roles that inherited from it become roots; resolve() recomputes them
+        for child in self.children.pop(role_id, ()):
+            self.parent[child] = None
+        self.set_parent(role_id, None)
+        self.parent.pop(role_id, None)
+        self.own.pop(role_id, None)
+        self.closure.pop(role_id, None)
+
+    def resolve(self, role_ids):
+        """Recompute the masks of role_ids and of every role inheriting from them"""
+        affected = set()
+        pending = [role_id for role_id in role_ids if role_id in self.parent]
+        while pending:
+            role_id = pending.pop()
+            if role_id not in affected:
+                affected.add(role_id)
+                pending.extend(self.children.get(role_id, ()))
+        for role_id in affected:
+            self.closure.pop(role_id, None)
+        for role_id in affected:
+            self._mask_of(role_id)
+        self.combined = {}
+
+    def _mask_of(self, role_id):
+        # Climb to the nearest ancestor with a known mask, then fill in going
+        # back down; a parent cycle is cut where it closes, and a parent that
+        # is not a known role (deleted meanwhile) ends the chain
+        chain, seen = [], set()
+        current = role_id
+        while current in self.parent and current not in self.closure and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            current = self.parent.get(current)
+        mask = self.closure.get(current, 0) if current is not None else 0
+        for role in reversed(chain):
+            mask |= self.own.get(role, 0)
+            self.closure[role] = mask
+        return self.closure[role_id]
+
+    # Checks
+
+    def mask(self, role_ids):
+        combined = self.combined.get(role_ids)
+        if combined is None:
+            combined = 0
+            for role_id in role_ids:
+                combined |= self.closure.get(role_id, 0)
+            self.combined[role_ids] = combined
+        return combined
+
+    def required(self, names):
+        required = 0
+        for name in names:
+            bit = self.by_name.get(name)
+            if bit is None:
+                return None
+            required |= bit
+        return required
+
+
+class PermissionResolver:
+    """Effective permissions of every role as bitsets.
+
+    Each permission is given a bit. A role's mask holds its own grants OR'd
+    with the mask of its parent, so inheritance up the parent_role_id chain
+    is resolved once instead of on every check. Committed changes to roles,
+    permissions and grants are applied incrementally: only the changed role
+    and the roles inheriting from it are recomputed. Other workers see a
+    bumped version stamp (shared through RESPONSE_CACHE_DIR) and reload;
+    PERMISSIONS_CACHE_TTL bounds how long bulk changes made outside the ORM
+    go unnoticed.
+
+    Loads and changes build a new _Masks aside and swap it in, so a check
+    running meanwhile sees either the old masks or the new ones, never a
+    half-built set.
+    """
+
+    def __init__(self, ttl=None, shared_dir=None):
+        self.ttl = ttl if ttl is not None else int(os.environ.get('PERMISSIONS_CACHE_TTL', 300))
+        self.versions = NamespaceVersions(shared_dir)
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._version = None
+        self._masks = _Masks()
+
+    def compile(self, permissions, roles, grants):
+        """Build every mask from (permission_id, name), (role_id, parent_role_id)
+        and (role_id, permission_id) rows"""
+        masks = _Masks()
+        for permission_id, name in permissions:
+            masks.add_permission(permission_id, name)
+        for role_id, parent_role_id in roles:
+            masks.set_parent(role_id, parent_role_id)
+        for role_id, permission_id in grants:
+            bit = masks.bits.get(permission_id)
+            if bit is not None:
+                masks.own[role_id] = masks.own.get(role_id, 0) | bit
+        masks.resolve(list(masks.parent))
+        with self._lock:
+            self._masks = masks
+            self._loaded_at = time.monotonic()
+
+    def load(self):
+        """Load all permissions, roles and grants (three queries)"""
+        version = self.versions.current('permissions')
+        permissions = db.session.query(Permission.permission_id, Permission.permission_name).order_by(
+            Permission.permission_name).all()
+        roles = db.session.query(UserRole.role_id, UserRole.parent_role_id).all()
+        grants = db.session.query(RolePermission.role_id, RolePermission.permission_id).all()
+        self.compile(permissions, roles, grants)
+        self._version = version
+
+    def ensure_loaded(self):
+        # Read once: invalidate() may reset it from another thread meanwhile
+        loaded_at = self._loaded_at
+        stale = loaded_at is None or (self.ttl > 0 and time.monotonic() - loaded_at > self.ttl)
+        if stale or self.versions.current('permissions') != self._version:
+            self.load()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def apply(self, changes):
+        """Apply committed changes collected from a flush"""
+        with self._lock:
+            if self._loaded_at is None:
+                self.versions.bump('permissions')
+                return
+            current = self.versions.current('permissions') == self._version
+            masks = self._masks.copy()
+            touched = []
+            for change in changes:
+                kind = change[0]
+                if kind == 'permission':
+                    masks.add_permission(change[1], change[2])
+                elif kind == 'drop_permission':
+                    masks.drop_permission(change[1])
+                elif kind == 'role':
+                    masks.set_parent(change[1], change[2])
+                    touched.append(change[1])
+                elif kind == 'drop_role':
+                    touched.extend(masks.children.get(change[1], ()))
+                    masks.drop_role(change[1])
+                elif kind in ('grant', 'revoke'):
+                    role_id, bit = change[1], masks.bits.get(change[2])
+                    if bit is None:
+                        continue
+                    if role_id not in masks.parent:
+                        masks.set_parent(role_id, None)
+                    own = masks.own.get(role_id, 0)
+                    masks.own[role_id] = own | bit if kind == 'grant' else own & ~bit
+                    touched.append(role_id)
+            masks.resolve(touched)
+            self._masks = masks
+            self.versions.bump('permissions')
+            # Keep what we hold unless another worker changed something first
+            if current:
+                self._version = self.versions.current('permissions')
+
+    # Checks, answered from memory; each reads one _Masks throughout
+
+    def mask(self, role_ids):
+        """Effective permission mask of a user holding role_ids (a tuple)"""
+        self.ensure_loaded()
+        return self._masks.mask(role_ids)
+
+    def allows(self, role_ids, names):
+        """Whether role_ids together hold every named permission"""
+        self.ensure_loaded()
+        masks = self._masks
+        required = masks.required(names)
+        return required is not None and masks.mask(role_ids) & required == required
+
+    def names(self, role_ids):
+        """Sorted names of the effective permissions of role_ids"""
+        self.ensure_loaded()
+        masks = self._masks
+        mask = masks.mask(role_ids)
+        return sorted(name for name, bit in masks.by_name.items() if mask & bit)
+
+
+permission_resolver = PermissionResolver(shared_dir=os.environ.get('RESPONSE_CACHE_DIR') or None)
+
+
+def require_permission(*names):
+    """Reject requests whose bearer token lacks any of the named permissions.
+
+    The checked principal is available to the view as g.principal.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token()
+            if not token:
+                return jsonify({'error': 'Authorization token required'}), 401
+            principal = authenticate(token)
+            if principal is None:
+                return jsonify({'error': 'Invalid or expired token'}), 401
+            if not permission_resolver.allows(principal.role_ids, names):
+                return jsonify({'error': 'Permission denied'}), 403
+            g.principal = principal
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Keep the resolver in step with committed ORM changes
+
+def _collect_changes(session, flush_context):
+    changes = None
+    for obj, deleted in chain(((obj, False) for obj in chain(session.new, session.dirty)),
+                              ((obj, True) for obj in session.deleted)):
+        if isinstance(obj, Permission):
+            change = ('drop_permission', obj.permission_id) if deleted else \
+                ('permission', obj.permission_id, obj.permission_name)
+        elif isinstance(obj, UserRole):
+            change = ('drop_role', obj.role_id) if deleted else ('role', obj.role_id, obj.parent_role_id)
+        elif isinstance(obj, RolePermission):
+            change = ('revoke' if deleted else 'grant', obj.role_id, obj.permission_id)
+        else:
+            continue
+        if changes is None:
+            changes = session.info.setdefault('permission_changes', [])
+        changes.append(change)
+
+
+def _apply_changes(session):
+    changes = session.info.pop('permission_changes', None)
+    if changes:
+        # Permissions and roles first, so grants find their bits and roles
+        order = {'permission': 0, 'role': 1, 'grant': 2, 'revoke': 2, 'drop_role': 3, 'drop_permission': 4}
+        permission_resolver.apply(sorted(changes, key=lambda change: order[change[0]]))
+
+
+def _discard_changes(session):
+    session.info.pop('permission_changes', None)
+
+
+event.listen(db.session, 'after_flush', _collect_changes)
+event.listen(db.session, 'after_commit', _apply_changes)
+event.listen(db.session, 'after_rollback', _discard_changes)
@@ -0,0 +1,231 @@
+from src.models.vehicle import VehicleCategory
+from src.models.financial import PricingRule
+from bisect import bisect_right
+from collections import namedtuple
+import os
+import threading
+import time
+
+Quote = namedtuple('Quote', ['category_id', 'location_id', 'rental_days', 'base_daily_rate', 'total', 'deposit_amount'])
+
+
+class CompiledRule:
+    """A pricing rule reduced to plain Python values"""
+
+    __slots__ = ('rule_id', 'priority', 'multiplier', 'fixed_adjustment', 'start', 'end', 'day_of_week',
+                 'minimum_rental_days', 'maximum_rental_days', 'time_of_day')
+
+    def __init__(self, rule):
+        self.rule_id = rule.rule_id
+        self.priority = rule.priority or 0
+        self.multiplier = float(rule.multiplier) if rule.multiplier is not None else 1.0
+        self.fixed_adjustment = float(rule.fixed_adjustment) if rule.fixed_adjustment is not None else 0.0
+        self.start = rule.start_date.toordinal() if rule.start_date else None
+        self.end = rule.end_date.toordinal() if rule.end_date else None
+        self.day_of_week = rule.day_of_week
+        self.minimum_rental_days = rule.minimum_rental_days
+        self.maximum_rental_days = rule.maximum_rental_days
+        self.time_of_day = rule.time_of_day
+
+    @property
+    def is_duration_rule(self):
+        """Duration discounts have duration bounds but no calendar conditions"""
+        has_bounds = self.minimum_rental_days is not None or self.maximum_rental_days is not None
+        return has_bounds and self.start is None and self.end is None and self.day_of_week is None
+
+    def matches_rental(self, rental_days, pickup_time):
+        if self.minimum_rental_days is not None and rental_days < self.minimum_rental_days:
+            return False
+        if self.maximum_rental_days is not None and rental_days > self.maximum_rental_days:
+            return False
+        if self.time_of_day is not None and pickup_time < self.time_of_day:
+            return False
+        return True
+
+
+class RuleSet:
+    """Rules applicable to one (category, location) pair, bucketed by date range.
+
+    The calendar is split at every rule start/end date into segments within
+    which the set of date-range rules is constant. Each segment holds, per
+    day of week, the matching day rules in priority order, so a rental is
+    priced by counting its days per (segment, weekday) instead of visiting
+    every day.
+    """
+
+    def __init__(self, rules):
+        ordered = sorted(rules, key=lambda rule: (-rule.priority, rule.rule_id))
+        self.duration_rules = [rule for rule in ordered if rule.is_duration_rule]
+        day_rules = [rule for rule in ordered if not rule.is_duration_rule]
+
+        bounds = set()
+        for rule in day_rules:
+            if rule.start is not None:
+                bounds.add(rule.start)
+            if rule.end is not None:
+                bounds.add(rule.end + 1)
+        self.bounds = sorted(bounds)
+
+        # Segment i covers [bounds[i - 1], bounds[i]); the first and last are open-ended
+        self.segments = []
+        self.fixed_rates = []
+        for i in range(len(self.bounds) + 1):
+            if i == 0:
+                # Everything before the first boundary: only rules without a start date
+                active = [rule for rule in day_rules if rule.start is None]
+            else:
+                first_day = self.bounds[i - 1]
+                active = [
+                    rule for rule in day_rules
+                    if (rule.start is None or rule.start <= first_day)
+                    and (rule.end is None or first_day <= rule.end)
+                ]
+            candidates_by_dow = tuple(
+                tuple(rule for rule in active if rule.day_of_week is None or rule.day_of_week == dow)
+                for dow in range(7)
+            )
+            self.segments.append(candidates_by_dow)
+            # (multiplier, adjustment) per weekday when the winner does not depend on the rental
+            self.fixed_rates.append(tuple(
+                self._fixed_rate(candidates) for candidates in candidates_by_dow
+            ))
+
+    @staticmethod
+    def _fixed_rate(candidates):
+        if not candidates:
+            return (1.0, 0.0)
+        winner = candidates[0]
+        if winner.minimum_rental_days is None and winner.maximum_rental_days is None and winner.time_of_day is None:
+            return (winner.multiplier, winner.fixed_adjustment)
+        return None
+
+    def price(self, base_rate, first_day, rental_days, pickup_time):
+        """Total price for rental_days consecutive days starting at ordinal first_day"""
+        total = 0.0
+        day = first_day
+        last_day = first_day + rental_days
+        segment_index = bisect_right(self.bounds, day)
+        while day < last_day:
+            segment_end = self.bounds[segment_index] if segment_index < len(self.bounds) else last_day
+            span = min(segment_end, last_day) - day
+            full_weeks, remainder = divmod(span, 7)
+            fixed_rates = self.fixed_rates[segment_index]
+            # Day ordinals modulo 7 give the weekday with Sunday as 0
+            start_dow = day % 7
+            for offset in range(7 if full_weeks else remainder):
+                count = full_weeks + 1 if offset < remainder else full_weeks
+                dow = (start_dow + offset) % 7
+                fixed = fixed_rates[dow]
+                if fixed is not None:
+                    total += (base_rate * fixed[0] + fixed[1]) * count
+                    continue
+                rate = base_rate
+                for rule in self.segments[segment_index][dow]:
+                    if rule.matches_rental(rental_days, pickup_time):
+                        rate = base_rate * rule.multiplier + rule.fixed_adjustment
+                        break
+                total += rate * count
+            day += span
+            segment_index += 1
+
+        for rule in self.duration_rules:
+            if rule.matches_rental(rental_days, pickup_time):
+                total = total * rule.multiplier + rule.fixed_adjustment * rental_days
+                break
+        return total
+
+
+class PricingEngine:
+    """Quotes rentals from an in-memory index of the active pricing rules.
+
+    Rules and category rates are loaded once and compiled into RuleSets keyed
+    by (category, location). The cache is invalidated when rules or categories
+    are created and otherwise reloaded every PRICING_CACHE_TTL seconds so
+    other workers pick up changes.
+
+    Quotes read without the lock: compile() builds the rules, rates and an
+    empty RuleSet cache aside and swaps them in as one tuple, so a quote
+    sees a single load throughout even while another thread reloads.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else int(os.environ.get('PRICING_CACHE_TTL', 300))
+        self._lock = threading.Lock()
+        # (rules by (category, location), (base rate, deposit) by category, RuleSets by (category, location))
+        self._index = ({}, {}, {})
+        self._loaded_at = None
+
+    def compile(self, rules, categories):
+        """Build the index from PricingRule and VehicleCategory-like objects"""
+        grouped = {}
+        for rule in rules:
+            grouped.setdefault((rule.category_id, rule.location_id), []).append(CompiledRule(rule))
+        category_rates = {
+            category.category_id: (float(category.base_daily_rate or 0), float(category.deposit_amount or 0))
+            for category in categories
+        }
+        with self._lock:
+            self._index = (grouped, category_rates, {})
+            self._loaded_at = time.monotonic()
+
+    def load(self):
+        """Load active rules and categories from the database"""
+        rules = PricingRule.query.filter_by(is_active=True).all()
+        categories = VehicleCategory.query.filter_by(is_active=True).all()
+        self.compile(rules, categories)
+
+    def ensure_loaded(self):
+        # Read once: invalidate() may reset it from another thread meanwhile
+        loaded_at = self._loaded_at
+        if loaded_at is None or (self.ttl > 0 and time.monotonic() - loaded_at > self.ttl):
+            self.load()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def category_ids(self):
+        """Ids of the active categories known to the engine"""
+        self.ensure_loaded()
+        return list(self._index[1])
+
+    def _rule_set(self, index, category_id, location_id):
+        rules_by_key, _, rule_sets = index
+        key = (category_id, location_id)
+        rule_set = rule_sets.get(key)
+        if rule_set is None:
+            rules = []
+            rule_keys = dict.fromkeys(((category_id, location_id), (category_id, None), (None, location_id), (None, None)))
+            for rule_key in rule_keys:
+                rules.extend(rules_by_key.get(rule_key, ()))
+            rule_set = RuleSet(rules)
+            # Cached in the RuleSets of the load it was built from, never a newer one
+            with self._lock:
+                rule_set = rule_sets.setdefault(key, rule_set)
+        return rule_set
+
+    def quote(self, category_id, location_id, pickup_dt, return_dt):
+        """Price a rental of a category picked up at a location"""
+        self.ensure_loaded()
+        index = self._index
+        rates = index[1].get(category_id)
+        if rates is None:
+            # The category may have been created by another worker; reload at
+            # most once per second so unknown ids cannot force a reload each
+            loaded_at = self._loaded_at
+            if loaded_at is None or time.monotonic() - loaded_at > 1:
+                self.load()
+                index = self._index
+                rates = index[1].get(category_id)
+            if rates is None:
+                raise LookupError('Vehicle category not found')
+
+        base_rate, deposit = rates
+        rental_days = max(1, (return_dt - pickup_dt).days)
+        total = self._rule_set(index, category_id, location_id).price(
+            base_rate, pickup_dt.toordinal(), rental_days, pickup_dt.time()
+        )
+        return Quote(category_id, location_id, rental_days, base_rate, round(total, 2), deposit)
+
+
+pricing_engine = PricingEngine()
@@ -0,0 +1,220 @@
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from collections import OrderedDict
+from itertools import chain
+from src.models.user import db, User, UserRole, UserRoleAssignment
+from src.models.customer import Customer
+from src.services.cache import NamespaceVersions
+import hashlib
+import hmac
+import os
+import threading
+import time
+import jwt
+
+# Version stamp namespace shared by every principal; bumped when a role
+# changes, since that can affect any user
+ALL_PRINCIPALS = 'principals'
+
+
+def secret_key():
+    return os.environ.get('SECRET_KEY', 'car_rental_erp_secret_key_2025')
+
+
+def password_stamp(password_hash):
+    """Short keyed fingerprint of a password hash.
+
+    Tokens carry it as the 'pwd' claim, so changing the password revokes
+    every token issued before the change.
+    """
+    return hmac.new(secret_key().encode(), password_hash.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def bearer_token():
+    """The token from the Authorization header, without a 'Bearer ' prefix"""
+    token = request.headers.get('Authorization')
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    return token or None
+
+
+class Principal:
+    """An authenticated user as cached: identity, active roles and the
+    profile returned by GET /api/auth/profile. Permissions are checked
+    against role_ids by the permission resolver.
+
+    Shared between requests, so treat it and its profile as read-only.
+    """
+
+    __slots__ = ('user_id', 'email', 'user_type', 'status', 'customer_id', 'roles', 'role_ids',
+                 'password_stamp', 'profile')
+
+    def __init__(self, user, roles):
+        self.user_id = user.user_id
+        self.email = user.email
+        self.user_type = user.user_type
+        self.status = user.status
+        self.customer_id = user.customer.customer_id if user.customer else None
+        self.roles = roles
+        self.role_ids = tuple(role['role_id'] for role in roles)
+        self.password_stamp = password_stamp(user.password_hash)
+        self.profile = user.to_dict()
+        self.profile['roles'] = [dict(role) for role in roles]
+        if user.customer:
+            self.profile['customer'] = user.customer.to_dict()
+
+
+def load_principal(user_id):
+    """Build the Principal for user_id from the database (two queries), None if unknown"""
+    user = db.session.query(User).options(joinedload(User.customer)).filter(User.user_id == user_id).first()
+    if user is None:
+        return None
+    roles = tuple(
+        {'role_id': role_id, 'role_name': role_name}
+        for role_id, role_name in db.session.query(UserRole.role_id, UserRole.role_name).join(
+            UserRoleAssignment, UserRoleAssignment.role_id == UserRole.role_id
+        ).filter(
+            UserRoleAssignment.user_id == user_id,
+            UserRoleAssignment.is_active.is_(True)
+        ).order_by(UserRole.role_name)
+    )
+    return Principal(user, roles)
+
+
+class PrincipalCache:
+    """LRU cache of verified tokens and the principals they resolve to.
+
+    An entry lives for at most ttl seconds and never past the token's own
+    expiry. Each entry remembers the version stamps of its user and of all
+    principals it was loaded under; invalidate_users() and invalidate_all()
+    bump them. With a shared directory (RESPONSE_CACHE_DIR) the stamps are
+    files, so other gunicorn workers drop their copies on the next lookup.
+    """
+
+    def __init__(self, ttl, max_entries=10000, shared_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = NamespaceVersions(shared_dir)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def version(self, user_id):
+        return (self.versions.current(ALL_PRINCIPALS), self.versions.current(f'principal-{user_id}'))
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is not None:
+            principal, version, expires = entry
+            if expires > time.time() and self.version(principal.user_id) == version:
+                with self._lock:
+                    if token in self._entries:
+                        self._entries.move_to_end(token)
+                    self._stats['hits'] += 1
+                return principal
+        with self._lock:
+            self._entries.pop(token, None)
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, token, principal, version, expires):
+        """Store a principal loaded while its stamps were at version"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (principal, version, min(expires, time.time() + self.ttl))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate_users(self, user_ids):
+        for user_id in user_ids:
+            self.versions.bump(f'principal-{user_id}')
+        with self._lock:
+            for token in [token for token, entry in self._entries.items() if entry[0].user_id in user_ids]:
+                del self._entries[token]
+            self._stats['invalidations'] += 1
+
+    def invalidate_all(self):
+        self.versions.bump(ALL_PRINCIPALS)
+        with self._lock:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
+
+
+principal_cache = PrincipalCache(
+    ttl=int(os.environ.get('AUTH_CACHE_TTL', 60)),
+    max_entries=int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000)),
+    shared_dir=os.environ.get('RESPONSE_CACHE_DIR') or None
+)
+
+
+def authenticate(token):
+    """The Principal for a token, or None if it is invalid, expired or revoked.
+
+    A cached token skips both the signature check and the database. Tokens
+    of inactive users and tokens issued before a password change are
+    rejected.
+    """
+    if not token:
+        return None
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    try:
+        payload = jwt.decode(token, secret_key(), algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    # Read the stamps first so an invalidation during the load is not lost
+    version = principal_cache.version(payload['user_id'])
+    principal = load_principal(payload['user_id'])
+    if principal is None or principal.status != 'active':
+        return None
+    if 'pwd' in payload and not hmac.compare_digest(payload['pwd'], principal.password_stamp):
+        return None
+    principal_cache.put(token, principal, version, payload['exp'])
+    return principal
+
+
+# Invalidation: changes to users, customers and role assignments drop the
+# affected principals once the transaction commits. Bulk Core statements
+# (query.update(), executemany inserts) bypass the session and are only
+# picked up when entries expire.
+
+def _collect_changes(session, flush_context):
+    changed = session.info.setdefault('principal_changes', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.user_id)
+        elif isinstance(obj, Customer):
+            changed.add(obj.customer_id)
+        elif isinstance(obj, UserRoleAssignment):
+            changed.add(obj.user_id)
+        elif isinstance(obj, UserRole):
+            changed.add(ALL_PRINCIPALS)
+
+
+def _apply_changes(session):
+    changed = session.info.pop('principal_changes', None)
+    if not changed:
+        return
+    if ALL_PRINCIPALS in changed:
+        principal_cache.invalidate_all()
+    else:
+        principal_cache.invalidate_users(changed)
+
+
+def _discard_changes(session):
+    session.info.pop('principal_changes', None)
+
+
+event.listen(db.session, 'after_flush', _collect_changes)
+event.listen(db.session, 'after_commit', _apply_changes)
+event.listen(db.session, 'after_rollback', _discard_changes)
@@ -0,0 +1,162 @@
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, contains_eager, load_only
+from collections import namedtuple
+from src.models.user import User
+from src.models.customer import Customer
+from src.models.vehicle import VehicleCategory, Vehicle
+from src.models.location import Location
+from src.models.reservation import Reservation
+from src.models.financial import Payment, Invoice
+from src.services.serialization import encoder_for, field_keys, field_columns
+from src.services.metrics import timed_serialization
+
+# The JSON shape of a list row: the model's to_dict() plus nested relations.
+# 'always' names columns the route needs beyond the selected fields (the
+# pagination sort column). A relation with eager='contains' is already joined
+# by the route's query for filtering and is populated from that join.
+Shape = namedtuple('Shape', ['model', 'relations', 'always'])
+Relation = namedtuple('Relation', ['attribute', 'shape', 'eager'])
+
+
+def shape(model, relations=None, always=()):
+    return Shape(model, relations or {}, always)
+
+
+def relation(attribute, nested, eager='joined'):
+    return Relation(attribute, nested, eager)
+
+
+def _build_shapes():
+    user = shape(User)
+    customer_with_user = shape(Customer, {'user': relation(Customer.user, user)})
+    category = shape(VehicleCategory)
+    location = shape(Location)
+    return {
+        'vehicle.get_vehicles': shape(Vehicle, {
+            'category': relation(Vehicle.category, category, eager='contains'),
+            'current_location': relation(Vehicle.current_location, location),
+        }, always=('vehicle_number',)),
+        'reservation.get_reservations': shape(Reservation, {
+            'customer': relation(Reservation.customer, customer_with_user),
+            'vehicle_category': relation(Reservation.vehicle_category, category),
+            'pickup_location': relation(Reservation.pickup_location, location),
+            'return_location': relation(Reservation.return_location, location),
+            'assigned_vehicle': relation(Reservation.assigned_vehicle, shape(Vehicle)),
+        }, always=('pickup_datetime',)),
+        'customer.get_customers': shape(Customer, {
+            'user': relation(Customer.user, user, eager='contains'),
+        }, always=('created_at',)),
+        'financial.get_payments': shape(Payment, {
+            'customer': relation(Payment.customer, shape(Customer)),
+            'reservation': relation(Payment.reservation, shape(Reservation)),
+        }, always=('created_at',)),
+        'financial.get_invoices': shape(Invoice, {
+            'customer': relation(Invoice.customer, shape(Customer)),
+            'reservation': relation(Invoice.reservation, shape(Reservation)),
+        }, always=('created_at',)),
+    }
+
+
+_shapes = {}
+
+
+def list_shape(endpoint):
+    # Built on first use because backref attributes only exist once the mappers are configured
+    if not _shapes:
+        _shapes.update(_build_shapes())
+    return _shapes[endpoint]
+
+
+def parse_fields(list_shape_, value):
+    """Parse 'a,b,relation,relation.c' into {'a': None, 'relation': {'c': None}}.
+
+    None for a key means the whole value (all of a relation's fields).
+    Raises ValueError for names the shape does not have.
+    """
+    selection = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node, current = selection, list_shape_
+        parts = path.split('.')
+        for depth, part in enumerate(parts):
+            last = depth == len(parts) - 1
+            if part in current.relations:
+                if last:
+                    node[part] = None
+                    break
+                if part in node and node[part] is None:
+                    break
+                node = node.setdefault(part, {})
+                current = current.relations[part].shape
+            elif part in field_keys(current.model) and last:
+                node[part] = None
+            else:
+                raise ValueError(f'Unknown field: {path}')
+    if not selection:
+        raise ValueError('fields must name at least one field')
+    return selection
+
+
+def requested_fields(endpoint):
+    """The ?fields= selection for a list endpoint, or None when absent"""
+    value = request.args.get('fields')
+    if value is None:
+        return None
+    return parse_fields(list_shape(endpoint), value)
+
+
+def _columns_to_load(current, selection):
+    model = current.model
+    mapper = inspect(model)
+    names = {column.key for column in mapper.primary_key}
+    names.update(current.always)
+    names.update(field_columns(model, selection))
+    for key, rel in current.relations.items():
+        if key in selection:
+            names.update(column.key for column in rel.attribute.property.local_columns)
+    return [getattr(model, name) for name in sorted(names)]
+
+
+def _relation_options(current, selection, parent=None):
+    options = []
+    for key, rel in current.relations.items():
+        if selection is not None and key not in selection:
+            continue
+        if rel.eager == 'contains':
+            loader = parent.contains_eager(rel.attribute) if parent is not None else contains_eager(rel.attribute)
+        else:
+            loader = parent.joinedload(rel.attribute) if parent is not None else joinedload(rel.attribute)
+        # A relation named without subfields is loaded whole, nested relations included
+        nested = selection[key] if selection is not None else None
+        if nested is not None:
+            loader = loader.load_only(*_columns_to_load(rel.shape, nested))
+        options.append(loader)
+        options.extend(_relation_options(rel.shape, nested, loader))
+    return options
+
+
+def projection_options(endpoint, selection):
+    """Loader options that SELECT only the columns the selection needs"""
+    current = list_shape(endpoint)
+    return [load_only(*_columns_to_load(current, selection))] + _relation_options(current, selection)
+
+
+def _render(obj, current, selection):
+    data = encoder_for(current.model, None if selection is None else selection.keys())(obj)
+    for key, rel in current.relations.items():
+        if selection is not None and key not in selection:
+            continue
+        value = getattr(obj, key)
+        if value is not None:
+            data[key] = _render(value, rel.shape, selection[key] if selection is not None else None)
+    return data
+
+
+def render_rows(endpoint, rows, selection=None):
+    """Serialize list rows in the endpoint's shape, limited to the selection"""
+    current = list_shape(endpoint)
+    with timed_serialization():
+        return [_render(row, current, selection) for row in rows]
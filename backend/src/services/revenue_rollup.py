@@ -0,0 +1,275 @@
+from src.models.user import db
+from src.models.financial import Payment, DailyRevenueSummary, DailyReservationSummary
+from src.models.reservation import Reservation
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from sqlalchemy import func, case, select, delete, insert
+from sqlalchemy.exc import IntegrityError
+from flask.cli import AppGroup
+import click
+
+# Daily rollups behind /api/financial/reports/revenue. Revenue is bucketed by the
+# day a payment was processed and only counts completed payments; reservations
+# are bucketed by their pickup day. The routes call the record_* helpers inside
+# the same transaction as the change they summarize.
+
+
+def _as_date(value):
+    """func.date() returns strings on SQLite and dates on MySQL"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def _increment(model, keys, deltas):
+    """Add deltas to the summary row identified by keys, creating it if needed"""
+    changes = {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()}
+    for _ in range(2):
+        updated = db.session.query(model).filter_by(**keys).update(changes, synchronize_session=False)
+        if updated:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(model(**keys, **deltas))
+            return
+        except IntegrityError:
+            # Another request created the row first; retry the update
+            continue
+
+
+def record_payment_completed(payment):
+    if payment.status != 'completed' or not payment.processed_at:
+        return
+    _increment(
+        DailyRevenueSummary,
+        {'summary_date': payment.processed_at.date(), 'payment_type': payment.payment_type},
+        {'total_amount': _money(payment.amount), 'payment_count': 1}
+    )
+
+
+def record_payment_refunded(payment):
+    """Remove a payment that left the completed state from its day's revenue"""
+    if not payment.processed_at:
+        return
+    _increment(
+        DailyRevenueSummary,
+        {'summary_date': payment.processed_at.date(), 'payment_type': payment.payment_type},
+        {'total_amount': -_money(payment.amount), 'payment_count': -1}
+    )
+
+
+def record_reservation_created(reservation):
+    _increment(
+        DailyReservationSummary,
+        {'summary_date': reservation.pickup_datetime.date()},
+        {'reservations_started': 1, 'reservations_completed': 0}
+    )
+
+
+def record_reservation_completed(reservation):
+    _increment(
+        DailyReservationSummary,
+        {'summary_date': reservation.pickup_datetime.date()},
+        {'reservations_started': 0, 'reservations_completed': 1}
+    )
+
+
+def compute_daily_totals(start_date, end_date, connection=None):
+    """Aggregate the source tables for [start_date, end_date] into rollup shaped dicts"""
+    execute = (connection or db.session).execute
+    start_dt = datetime.combine(start_date, datetime.min.time())
+    end_dt = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    revenue = {}
+    payment_day = func.date(Payment.processed_at)
+    for day, payment_type, total, count in execute(select(
+        payment_day, Payment.payment_type, func.sum(Payment.amount), func.count(Payment.payment_id)
+    ).where(
+        Payment.status == 'completed',
+        Payment.processed_at >= start_dt,
+        Payment.processed_at < end_dt
+    ).group_by(payment_day, Payment.payment_type)):
+        revenue[(_as_date(day), payment_type)] = (_money(total), count)
+
+    reservations = {}
+    pickup_day = func.date(Reservation.pickup_datetime)
+    for day, started, completed in execute(select(
+        pickup_day,
+        func.count(Reservation.reservation_id),
+        func.sum(case((Reservation.status == 'completed', 1), else_=0))
+    ).where(
+        Reservation.pickup_datetime >= start_dt,
+        Reservation.pickup_datetime < end_dt
+    ).group_by(pickup_day)):
+        reservations[_as_date(day)] = (started, int(completed or 0))
+
+    return revenue, reservations
+
+
+def backfill(start_date, end_date, connection=None):
+    """Rebuild the rollup rows for [start_date, end_date] from the source tables.
+
+    Commits the session, unless run on a connection whose transaction the
+    caller owns (as migrations do).
+    """
+    revenue, reservations = compute_daily_totals(start_date, end_date, connection)
+    execute = (connection or db.session).execute
+
+    execute(delete(DailyRevenueSummary.__table__).where(
+        DailyRevenueSummary.summary_date >= start_date,
+        DailyRevenueSummary.summary_date <= end_date
+    ))
+    execute(delete(DailyReservationSummary.__table__).where(
+        DailyReservationSummary.summary_date >= start_date,
+        DailyReservationSummary.summary_date <= end_date
+    ))
+
+    if revenue:
+        execute(insert(DailyRevenueSummary.__table__), [
+            {'summary_date': day, 'payment_type': payment_type, 'total_amount': total, 'payment_count': count}
+            for (day, payment_type), (total, count) in revenue.items()
+        ])
+    if reservations:
+        execute(insert(DailyReservationSummary.__table__), [
+            {'summary_date': day, 'reservations_started': started, 'reservations_completed': completed}
+            for day, (started, completed) in reservations.items()
+        ])
+    if connection is None:
+        db.session.commit()
+    return len(revenue), len(reservations)
+
+
+def history_bounds(connection=None):
+    """(first day, last day) with payments or pickups, today for an empty database"""
+    execute = (connection or db.session).execute
+    first_payment, last_payment = execute(select(
+        func.min(Payment.processed_at), func.max(Payment.processed_at)
+    )).one()
+    first_pickup, last_pickup = execute(select(
+        func.min(Reservation.pickup_datetime), func.max(Reservation.pickup_datetime)
+    )).one()
+    starts = [value.date() for value in (first_payment, first_pickup) if value]
+    ends = [value.date() for value in (last_payment, last_pickup) if value]
+    today = date.today()
+    return (min(starts) if starts else today), (max(ends) if ends else today)
+
+
+def check_consistency(start_date, end_date):
+    """Compare the rollups with the source tables and list every difference"""
+    revenue, reservations = compute_daily_totals(start_date, end_date)
+    mismatches = []
+
+    stored_revenue = {
+        (row.summary_date, row.payment_type): (_money(row.total_amount), row.payment_count)
+        for row in DailyRevenueSummary.query.filter(
+            DailyRevenueSummary.summary_date >= start_date,
+            DailyRevenueSummary.summary_date <= end_date
+        )
+    }
+    for key in sorted(set(revenue) | set(stored_revenue)):
+        expected = revenue.get(key, (Decimal('0'), 0))
+        actual = stored_revenue.get(key, (Decimal('0'), 0))
+        if expected != actual:
+            mismatches.append({
+                'date': key[0].isoformat(),
+                'payment_type': key[1],
+                'expected': {'total_amount': float(expected[0]), 'payment_count': expected[1]},
+                'actual': {'total_amount': float(actual[0]), 'payment_count': actual[1]}
+            })
+
+    stored_reservations = {
+        row.summary_date: (row.reservations_started, row.reservations_completed)
+        for row in DailyReservationSummary.query.filter(
+            DailyReservationSummary.summary_date >= start_date,
+            DailyReservationSummary.summary_date <= end_date
+        )
+    }
+    for day in sorted(set(reservations) | set(stored_reservations)):
+        expected = reservations.get(day, (0, 0))
+        actual = stored_reservations.get(day, (0, 0))
+        if expected != actual:
+            mismatches.append({
+                'date': day.isoformat(),
+                'expected': {'reservations_started': expected[0], 'reservations_completed': expected[1]},
+                'actual': {'reservations_started': actual[0], 'reservations_completed': actual[1]}
+            })
+
+    return mismatches
+
+
+def revenue_summary(start_date, end_date):
+    """Build the revenue report for [start_date, end_date] from the rollups"""
+    revenue_rows = DailyRevenueSummary.query.filter(
+        DailyRevenueSummary.summary_date >= start_date,
+        DailyRevenueSummary.summary_date <= end_date
+    ).all()
+    reservation_totals = db.session.query(
+        func.sum(DailyReservationSummary.reservations_started),
+        func.sum(DailyReservationSummary.reservations_completed)
+    ).filter(
+        DailyReservationSummary.summary_date >= start_date,
+        DailyReservationSummary.summary_date <= end_date
+    ).one()
+
+    revenue_by_type = {}
+    daily_revenue = {}
+    for row in revenue_rows:
+        amount = float(row.total_amount or 0)
+        revenue_by_type[row.payment_type] = revenue_by_type.get(row.payment_type, 0.0) + amount
+        daily_revenue[row.summary_date] = daily_revenue.get(row.summary_date, 0.0) + amount
+
+    total_reservations = int(reservation_totals[0] or 0)
+    completed_reservations = int(reservation_totals[1] or 0)
+
+    return {
+        'total_revenue': round(sum(revenue_by_type.values()), 2),
+        'total_reservations': total_reservations,
+        'completed_reservations': completed_reservations,
+        'completion_rate': (completed_reservations / total_reservations * 100) if total_reservations > 0 else 0,
+        'revenue_by_type': [
+            {'type': payment_type, 'total': round(total, 2)}
+            for payment_type, total in sorted(revenue_by_type.items()) if total
+        ],
+        'daily_revenue': [
+            {'date': day.isoformat(), 'total': round(total, 2)}
+            for day, total in sorted(daily_revenue.items()) if total
+        ]
+    }
+
+
+def _date_range(start, end):
+    default_start, default_end = history_bounds()
+    start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else default_start
+    end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else default_end
+    return start_date, end_date
+
+
+rollup_cli = AppGroup('rollup', help='Maintain the daily revenue rollups.')
+
+
+@rollup_cli.command('backfill')
+@click.option('--start', help='First day to rebuild (YYYY-MM-DD), defaults to the oldest record')
+@click.option('--end', help='Last day to rebuild (YYYY-MM-DD), defaults to the newest record')
+def backfill_command(start, end):
+    """Rebuild the daily rollups from payments and reservations."""
+    start_date, end_date = _date_range(start, end)
+    revenue_rows, reservation_rows = backfill(start_date, end_date)
+    click.echo(f'Rebuilt {start_date} to {end_date}: {revenue_rows} revenue rows, {reservation_rows} reservation rows')
+
+
+@rollup_cli.command('check')
+@click.option('--start', help='First day to check (YYYY-MM-DD), defaults to the oldest record')
+@click.option('--end', help='Last day to check (YYYY-MM-DD), defaults to the newest record')
+def check_command(start, end):
+    """Compare the daily rollups with the source tables."""
+    start_date, end_date = _date_range(start, end)
+    mismatches = check_consistency(start_date, end_date)
+    for mismatch in mismatches:
+        click.echo(mismatch)
+    click.echo(f'{len(mismatches)} mismatches between {start_date} and {end_date}')
+    if mismatches:
+        raise SystemExit(1)
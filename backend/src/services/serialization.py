@@ -0,0 +1,234 @@
+from flask import Response
+from src.models.user import User
+from src.models.customer import Customer
+from src.models.vehicle import VehicleCategory, Vehicle
+from src.models.location import Location
+from src.models.reservation import Reservation
+from src.models.financial import Payment, Invoice
+from src.models.maintenance import MaintenanceSchedule, DamageReport
+from src.services.metrics import timed_serialization
+from collections import namedtuple
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Encoders are generated once per model from the field lists below and
+# return exactly what the model's to_dict() returns. Keep the lists in step
+# with to_dict(); benchmarks/serialization_benchmark.py compares the two.
+# Rows from a column query (e.g. session.query(*Vehicle.__table__.columns))
+# can be encoded as well as ORM instances.
+
+Field = namedtuple('Field', ['key', 'kind', 'source', 'default', 'columns'])
+
+
+def iso(name):
+    """date/datetime column rendered with isoformat(), None when empty"""
+    return Field(name, 'iso', name, None, (name,))
+
+
+def number(name, default=None):
+    """Numeric column rendered as a float, default when empty or zero"""
+    return Field(name, 'number', name, default, (name,))
+
+
+def computed(name, function, *columns):
+    """Value computed by function(row), e.g. an unbound model method, from columns"""
+    return Field(name, 'computed', function, None, columns)
+
+
+def _rental_duration_days(row):
+    return max(1, int(Reservation.calculate_rental_duration_hours(row) / 24))
+
+
+FIELDS = {
+    User: [
+        'user_id', 'email', 'first_name', 'last_name', 'phone_number', iso('date_of_birth'),
+        'user_type', 'status', 'email_verified', 'phone_verified', 'two_factor_enabled',
+        iso('last_login_at'), iso('created_at'), iso('updated_at'),
+    ],
+    Customer: [
+        'customer_id', 'customer_number', 'driver_license_number', 'driver_license_state',
+        'driver_license_country', iso('driver_license_expiry'), 'credit_score', 'preferred_language',
+        'marketing_opt_in', 'loyalty_program_member', 'loyalty_points', iso('customer_since'),
+        'total_rentals', number('total_spent', 0.00), 'risk_level', 'notes', iso('created_at'), iso('updated_at'),
+    ],
+    VehicleCategory: [
+        'category_id', 'category_name', 'category_code', 'description', number('base_daily_rate', 0.00),
+        number('base_hourly_rate'), number('mileage_rate'), number('deposit_amount', 0.00),
+        'passenger_capacity', 'luggage_capacity', 'transmission_type', 'fuel_type', 'is_active',
+        iso('created_at'), iso('updated_at'),
+    ],
+    Vehicle: [
+        'vehicle_id', 'vehicle_number', 'license_plate', 'vin', 'category_id', 'make', 'model', 'year',
+        'color', number('fuel_capacity'), 'current_mileage', iso('purchase_date'), number('purchase_price'),
+        'current_location_id', 'status', 'condition_rating', iso('last_service_date'),
+        'next_service_due_mileage', 'insurance_policy_number', iso('insurance_expiry'),
+        iso('registration_expiry'), 'gps_device_id', 'is_active', iso('created_at'), iso('updated_at'),
+    ],
+    Location: [
+        'location_id', 'location_code', 'location_name', 'location_type', 'street_address', 'city',
+        'state_province', 'postal_code', 'country', number('latitude'), number('longitude'), 'phone_number',
+        computed('operating_hours', Location.get_operating_hours, 'operating_hours'), 'capacity', 'is_pickup_location',
+        'is_return_location', 'is_active', iso('created_at'), iso('updated_at'),
+    ],
+    Reservation: [
+        'reservation_id', 'reservation_number', 'customer_id', 'vehicle_category_id', 'assigned_vehicle_id',
+        'pickup_location_id', 'return_location_id', iso('pickup_datetime'), iso('return_datetime'), 'status',
+        number('total_estimated_cost'), number('total_actual_cost'), number('deposit_amount'),
+        'special_requests', 'cancellation_reason', 'created_by', iso('created_at'), iso('updated_at'),
+        computed('rental_duration_hours', Reservation.calculate_rental_duration_hours,
+                 'pickup_datetime', 'return_datetime'),
+        computed('rental_duration_days', _rental_duration_days, 'pickup_datetime', 'return_datetime'),
+    ],
+    Payment: [
+        'payment_id', 'reservation_id', 'customer_id', 'payment_type', 'payment_method',
+        number('amount', 0.00), 'currency', 'transaction_id',
+        computed('gateway_response', Payment.get_gateway_response, 'gateway_response'), 'status', iso('processed_at'),
+        iso('refunded_at'), number('refund_amount'), 'notes', iso('created_at'), iso('updated_at'),
+    ],
+    Invoice: [
+        'invoice_id', 'invoice_number', 'reservation_id', 'customer_id', iso('invoice_date'), iso('due_date'),
+        number('subtotal', 0.00), number('tax_amount', 0.00), number('total_amount', 0.00),
+        number('paid_amount', 0.00), computed('balance_due', Invoice.calculate_balance_due, 'total_amount', 'paid_amount'), 'status',
+        computed('billing_address', Invoice.get_billing_address, 'billing_address'),
+        computed('line_items', Invoice.get_line_items, 'line_items'),
+        'payment_terms', 'notes', iso('created_at'), iso('updated_at'),
+    ],
+    MaintenanceSchedule: [
+        'schedule_id', 'vehicle_id', 'service_type', iso('scheduled_date'), 'scheduled_mileage', 'vendor_id',
+        number('estimated_cost'), number('actual_cost'),
+        computed('cost_variance', MaintenanceSchedule.calculate_cost_variance, 'estimated_cost', 'actual_cost'), 'status',
+        iso('completion_date'), 'completion_mileage', 'service_notes', iso('next_service_date'),
+        'next_service_mileage', computed('is_overdue', MaintenanceSchedule.is_overdue, 'status', 'scheduled_date'),
+        iso('created_at'), iso('updated_at'),
+    ],
+    DamageReport: [
+        'report_id', 'vehicle_id', 'reservation_id', 'reported_by', iso('incident_date'), 'damage_type',
+        'damage_severity', 'damage_description', number('estimated_repair_cost'), number('actual_repair_cost'),
+        computed('cost_variance', DamageReport.calculate_cost_variance,
+                 'estimated_repair_cost', 'actual_repair_cost'), 'insurance_claim_number',
+        computed('photos', DamageReport.get_photos, 'photos'), 'status', iso('created_at'), iso('updated_at'),
+    ],
+}
+
+
+def _normalize(field):
+    return Field(field, 'raw', field, None, (field,)) if isinstance(field, str) else field
+
+
+FIELDS = {model: [_normalize(field) for field in fields] for model, fields in FIELDS.items()}
+
+
+def compile_encoder(model, fields):
+    """Generate a function returning the to_dict() of one row as a single dict literal.
+
+    ORM instances are read straight from their __dict__, skipping the
+    instrumented attribute descriptors. If a column is not loaded (deferred
+    or expired) or the row is not an ORM instance, the generated fallback
+    reads attributes normally, which loads whatever is missing.
+    """
+    namespace = {'_float': float}
+    fast_items = []
+    slow_items = []
+    for position, field in enumerate(fields):
+        if field.kind == 'computed':
+            namespace[f'_computed{position}'] = field.source
+            fast_items.append(f'{field.key!r}: _computed{position}(row)')
+            slow_items.append(f'{field.key!r}: _computed{position}(row)')
+            continue
+        for items, read in ((fast_items, f'values[{field.source!r}]'), (slow_items, f'row.{field.source}')):
+            if field.kind == 'raw':
+                items.append(f'{field.key!r}: {read}')
+            elif field.kind == 'iso':
+                items.append(f'{field.key!r}: v.isoformat() if (v := {read}) else None')
+            else:
+                items.append(f'{field.key!r}: _float(v) if (v := {read}) else {field.default!r}')
+
+    name = model.__name__
+    source = (
+        f'def read_{name}(row):\n'
+        f'    return {{\n        ' + ',\n        '.join(slow_items) + '\n    }\n\n'
+        f'def encode_{name}(row):\n'
+        f'    try:\n'
+        f'        values = row.__dict__\n'
+        f'        return {{\n            ' + ',\n            '.join(fast_items) + '\n        }\n'
+        f'    except (KeyError, AttributeError):\n'
+        f'        return read_{name}(row)\n'
+    )
+    exec(compile(source, f'<encoder {name}>', 'exec'), namespace)
+    return namespace[f'encode_{name}']
+
+
+ENCODERS = {model: compile_encoder(model, fields) for model, fields in FIELDS.items()}
+
+_partial_encoders = {}
+
+
+def field_keys(model):
+    """Keys of the model's to_dict(), in order"""
+    return [field.key for field in FIELDS[model]]
+
+
+def field_columns(model, keys):
+    """Names of the columns read to produce the given keys"""
+    columns = set()
+    for field in FIELDS[model]:
+        if field.key in keys:
+            columns.update(field.columns)
+    return columns
+
+
+def encoder_for(model, keys=None):
+    """Encoder for the whole to_dict(), or only for keys (compiled once per key set)"""
+    if keys is None:
+        return ENCODERS[model]
+    cache_key = (model, frozenset(keys))
+    encoder = _partial_encoders.get(cache_key)
+    if encoder is None:
+        fields = [field for field in FIELDS[model] if field.key in keys]
+        encoder = _partial_encoders[cache_key] = compile_encoder(model, fields)
+    return encoder
+
+
+def serialize(obj):
+    """Equivalent of obj.to_dict() using the compiled encoder for its model"""
+    return ENCODERS[type(obj)](obj)
+
+
+def serialize_many(objects):
+    if not objects:
+        return []
+    encode = ENCODERS[type(objects[0])]
+    return [encode(obj) for obj in objects]
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(payload):
+        """Encode payload to JSON bytes"""
+        return orjson.dumps(payload, default=_default)
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+
+    def dumps(payload):
+        """Encode payload to JSON bytes"""
+        return _encoder.encode(payload).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Response with payload encoded by the fastest available backend"""
+    with timed_serialization():
+        body = dumps(payload)
+    return Response(body, status=status, mimetype='application/json')
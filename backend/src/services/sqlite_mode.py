@@ -0,0 +1,153 @@
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+
+def sqlite_database_path(database_uri):
+    """Path of the database file for a file-backed SQLite URI, otherwise None"""
+    url = make_url(database_uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+
+def apply_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers and one writer"""
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers keep reading while a write transaction is open
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only syncs at checkpoints and stays crash safe
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    # Negative cache_size is in KiB
+    cursor.execute(f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_KB', 65536))}")
+    cursor.execute(f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+class WriterLock:
+    """Serializes writers across threads and, through a lock file, processes.
+
+    SQLite allows a single writer. Without coordination, two requests that
+    read and then write inside the same transaction race to upgrade their
+    read locks and the loser fails with "database is locked" no matter how
+    long the busy timeout is. Holding this lock for the whole write request
+    queues writers instead, while GET requests never take it.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._thread_lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+
+    def acquire(self):
+        # Reentrant per thread, so code that may run inside a write request can take it too
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            return
+        self._thread_lock.acquire()
+        try:
+            if fcntl is not None:
+                if self._file is None:
+                    self._file = open(self.lock_path, 'a+')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+        except Exception:
+            self._thread_lock.release()
+            raise
+        self._local.depth = 1
+
+    def release(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            return
+        self._local.depth = depth - 1
+        if depth > 1:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def configure_sqlite(app, db):
+    """Enable SQLite production mode when the app runs on a SQLite file.
+
+    Every connection gets the WAL/synchronous/cache pragmas, and unless
+    SQLITE_SERIALIZE_WRITES=0, mutating requests run one at a time behind a
+    WriterLock shared by all workers through '<database>.writer.lock'.
+    """
+    database_path = sqlite_database_path(app.config['SQLALCHEMY_DATABASE_URI'])
+    if database_path is None:
+        return None
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', apply_pragmas)
+
+    if os.environ.get('SQLITE_SERIALIZE_WRITES', '1') == '0':
+        return None
+
+    writer_lock = WriterLock(f'{database_path}.writer.lock')
+    app.extensions['sqlite_writer_lock'] = writer_lock
+
+    @app.before_request
+    def acquire_writer_lock():
+        view = current_app.view_functions.get(request.endpoint)
+        if request.method in WRITE_METHODS and not (getattr(view, 'manages_writer_lock', False)
+                                                    or getattr(view, 'read_only', False)):
+            writer_lock.acquire()
+
+    @app.teardown_request
+    def release_writer_lock(exc):
+        # Routes commit or roll back before returning, so the write is finished here
+        writer_lock.release()
+
+    return writer_lock
+
+
+def manages_writer_lock(view):
+    """Mark a mutating view that takes writer_lock_for() itself around its writes.
+
+    For views that spend long on work that needs no lock, such as hashing a
+    password, so other writers are not kept waiting meanwhile. Place it
+    below the route decorator.
+    """
+    view.manages_writer_lock = True
+    return view
+
+
+def read_only(view):
+    """Mark a POST view that only reads, such as a quote or a token check,
+    so it runs without the writer lock. Place it below the route decorator.
+    """
+    view.read_only = True
+    return view
+
+
+def writer_lock_for(app):
+    """The app's SQLite writer lock for writes made outside a request.
+
+    Background threads must hold it around each write transaction, like
+    mutating requests do; inside a write request it is already held and
+    taking it again is free. Without serialized writes it is a no-op.
+    """
+    return app.extensions.get('sqlite_writer_lock') or contextlib.nullcontext()
@@ -0,0 +1,215 @@
+from flask import Response, current_app, request, send_file
+from flask.cli import AppGroup
+from werkzeug.utils import get_content_type
+from datetime import datetime, timezone
+import click
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compression levels used for the .gz/.br files written by `flask assets compress`
+# and for assets compressed in memory when those files are missing
+STATIC_GZIP_LEVEL = int(os.environ.get('STATIC_GZIP_LEVEL', 9))
+STATIC_BROTLI_QUALITY = int(os.environ.get('STATIC_BROTLI_QUALITY', 11))
+# Seconds browsers may reuse index.html (and the SPA routes that serve it) before revalidating
+STATIC_INDEX_MAX_AGE = int(os.environ.get('STATIC_INDEX_MAX_AGE', 60))
+# The same for other files whose names carry no content hash (favicon.ico, robots.txt)
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+# Larger files stay on disk and are sent with send_file()
+STATIC_MAX_INLINE_BYTES = int(os.environ.get('STATIC_MAX_INLINE_BYTES', 8 * 1024 * 1024))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Vite writes hashed bundles to assets/ as name-<hash>.ext; the hash is
+# base64url, so requiring a digit or capital keeps 'vehicle-overview.js' out
+FINGERPRINTED = re.compile(r'(^|/)assets/.*[.-](?=[\w-]*[0-9A-Z])[\w-]{8,}\.\w+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'application/manifest+json', 'application/wasm', 'image/svg+xml',
+                      'image/x-icon', 'image/vnd.microsoft.icon', 'font/ttf', 'font/otf')
+# Smaller files are not worth a second variant
+MIN_COMPRESS_BYTES = 256
+# Preferred first when the client accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, STATIC_GZIP_LEVEL, mtime=0)
+    if brotli is not None:
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+    return None
+
+
+def _compressible(mimetype, size):
+    return size >= MIN_COMPRESS_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def _walk(folder):
+    """(path, name relative to folder) of every file that is not a precompressed copy"""
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(('.gz', '.br')) and os.path.isfile(path[:-3]):
+                continue
+            yield path, os.path.relpath(path, folder).replace(os.sep, '/')
+
+
+class StaticAsset:
+    """One file of the static folder with its headers and encoded bodies"""
+
+    __slots__ = ('path', 'name', 'content_type', 'etag', 'last_modified', 'cache_control', 'bodies')
+
+    def __init__(self, path, name):
+        stat = os.stat(path)
+        mimetype = _mimetype(name)
+        self.path = path
+        self.name = name
+        self.content_type = get_content_type(mimetype, 'utf-8')
+        self.last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        if FINGERPRINTED.search(name):
+            self.cache_control = IMMUTABLE_CACHE_CONTROL
+        elif name == 'index.html':
+            self.cache_control = f'public, max-age={STATIC_INDEX_MAX_AGE}, must-revalidate'
+        else:
+            self.cache_control = f'public, max-age={STATIC_MAX_AGE}'
+        if stat.st_size > STATIC_MAX_INLINE_BYTES:
+            # Served from disk: no compressed variants, ETag from mtime and size
+            self.etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+            self.bodies = None
+            return
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.etag = hashlib.sha1(data).hexdigest()
+        self.bodies = {'identity': data}
+        if not _compressible(mimetype, len(data)):
+            return
+        for encoding, suffix in ENCODINGS:
+            encoded = None
+            try:
+                # A copy written at build time is used unless the file is newer
+                if os.stat(path + suffix).st_mtime_ns >= stat.st_mtime_ns:
+                    with open(path + suffix, 'rb') as f:
+                        encoded = f.read()
+            except FileNotFoundError:
+                pass
+            if encoded is None:
+                encoded = _compress(data, encoding)
+            if encoded is not None and len(encoded) < len(data):
+                self.bodies[encoding] = encoded
+
+    def select(self, accept_encodings):
+        """(encoding, body) for a request's Accept-Encoding"""
+        for encoding, _ in ENCODINGS:
+            if encoding in self.bodies and accept_encodings[encoding]:
+                return encoding, self.bodies[encoding]
+        return 'identity', self.bodies['identity']
+
+
+class StaticAssets:
+    """In-memory manifest of an app's static folder.
+
+    The folder is read once per process, on the first request: each file is
+    kept with its gzip and brotli variants (from the .gz/.br files that
+    `flask assets compress` writes, or compressed then), a content ETag and
+    its Cache-Control. Requests are answered from the manifest without
+    touching the disk. Files added later are picked up after a restart.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._assets = None
+        self._lock = threading.Lock()
+
+    @property
+    def assets(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    folder = self.app.static_folder
+                    self._assets = {} if folder is None or not os.path.isdir(folder) else {
+                        name: StaticAsset(path, name) for path, name in _walk(folder)}
+        return self._assets
+
+    def serve(self, path):
+        """Response for the catch-all route: the file, else index.html for client-side routes"""
+        asset = self.assets.get(path) if path else None
+        if asset is None:
+            if FINGERPRINTED.search(path):
+                # A bundle from an older build; index.html in its place would break the page
+                return 'Not Found', 404
+            asset = self.assets.get('index.html')
+            if asset is None:
+                return "Car Rental ERP API Server - Backend is running!", 200
+
+        if asset.bodies is None:
+            response = send_file(asset.path, mimetype=asset.content_type, conditional=True,
+                                 etag=asset.etag, last_modified=asset.last_modified)
+            response.headers['Cache-Control'] = asset.cache_control
+            return response
+
+        encoding, body = asset.select(request.accept_encodings)
+        etag = asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}'
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = bool(request.if_modified_since) and asset.last_modified <= request.if_modified_since
+        response = Response(status=304) if not_modified else Response(body, content_type=asset.content_type)
+        response.set_etag(etag)
+        response.last_modified = asset.last_modified
+        response.headers['Cache-Control'] = asset.cache_control
+        if len(asset.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+            if encoding != 'identity' and not not_modified:
+                response.content_encoding = encoding
+        return response
+
+
+def precompress(folder):
+    """Write .gz (and with brotli installed, .br) copies of the compressible
+    files in folder that lack an up-to-date one; returns the number written"""
+    written = 0
+    for path, name in _walk(folder):
+        stat = os.stat(path)
+        if stat.st_size > STATIC_MAX_INLINE_BYTES or not _compressible(_mimetype(name), stat.st_size):
+            continue
+        data = None
+        for encoding, suffix in ENCODINGS:
+            try:
+                if os.stat(path + suffix).st_mtime_ns >= stat.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            encoded = _compress(data, encoding)
+            if encoded is None:
+                continue
+            with open(path + suffix, 'wb') as f:
+                f.write(encoded)
+            written += 1
+    return written
+
+
+assets_cli = AppGroup('assets', help='Prepare the static files served by the app.')
+
+
+@assets_cli.command('compress')
+def compress_command():
+    """Write gzip and brotli copies of the static files."""
+    if brotli is None:
+        click.echo('brotli is not installed; writing gzip copies only')
+    click.echo(f'{precompress(current_app.static_folder)} files written')
@@ -0,0 +1,22 @@
+import csv
+import io
+
+
+def read_rows(request, key):
+    """Read the rows of a bulk upload from a CSV body or file, or a JSON array.
+
+    JSON may be a list of objects or an object holding the list under key.
+    Raises ValueError when the payload cannot be read.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        text = upload.read().decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+
+    data = request.get_json(silent=True)
+    rows = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValueError(f'Expected a CSV file or a JSON array of {key}')
+    return rows
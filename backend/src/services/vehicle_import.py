@@ -0,0 +1,240 @@
+from flask import current_app
+from src.models.user import db
+from src.models.vehicle import VehicleCategory, Vehicle
+from src.models.location import Location
+from src.services.sqlite_mode import writer_lock_for
+from sqlalchemy import select, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import os
+import uuid
+
+# Rows validated and inserted per transaction. Each chunk costs one
+# uniqueness query and one executemany INSERT.
+IMPORT_CHUNK_SIZE = int(os.environ.get('VEHICLE_IMPORT_CHUNK_SIZE', 500))
+MAX_IMPORT_ROWS = int(os.environ.get('VEHICLE_IMPORT_MAX_ROWS', 50000))
+
+REQUIRED_FIELDS = ['vehicle_number', 'license_plate', 'vin', 'make', 'model', 'year']
+UNIQUE_FIELDS = ['vehicle_number', 'license_plate', 'vin']
+DATE_FIELDS = ['purchase_date', 'insurance_expiry', 'registration_expiry', 'last_service_date']
+INTEGER_FIELDS = ['year', 'current_mileage', 'condition_rating', 'next_service_due_mileage']
+DECIMAL_FIELDS = ['fuel_capacity', 'purchase_price']
+TEXT_FIELDS = ['color', 'insurance_policy_number', 'gps_device_id']
+LOOKUP_FIELDS = ['category_id', 'category_code', 'current_location_id', 'location_code']
+ROW_FIELDS = (REQUIRED_FIELDS + DATE_FIELDS + INTEGER_FIELDS + DECIMAL_FIELDS + TEXT_FIELDS + LOOKUP_FIELDS
+              + ['status'])
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+class _Lookups:
+    """Categories and locations by id and by code, read once per import"""
+
+    def __init__(self):
+        self.categories = {}
+        for category_id, code in db.session.execute(select(VehicleCategory.category_id, VehicleCategory.category_code)):
+            self.categories[category_id] = category_id
+            self.categories[code.upper()] = category_id
+        self.locations = {}
+        for location_id, code in db.session.execute(select(Location.location_id, Location.location_code)):
+            self.locations[location_id] = location_id
+            self.locations[code.upper()] = location_id
+
+    def category(self, row):
+        if not _blank(row.get('category_id')):
+            return self.categories.get(_clean(row['category_id']))
+        if not _blank(row.get('category_code')):
+            return self.categories.get(_clean(row['category_code']).upper())
+        return None
+
+    def location(self, row):
+        if not _blank(row.get('current_location_id')):
+            return self.locations.get(_clean(row['current_location_id']))
+        if not _blank(row.get('location_code')):
+            return self.locations.get(_clean(row['location_code']).upper())
+        return None
+
+
+def _validate(row, lookups, now):
+    """Build the INSERT parameters for one row, or return its list of errors"""
+    if not isinstance(row, dict):
+        return None, ['Row must be an object']
+    # Objects and lists would only fail in the INSERT, ending the whole import
+    errors = [f'{field} must be a string or number' for field in ROW_FIELDS
+              if not _blank(row.get(field)) and not isinstance(row[field], (str, int, float))]
+    errors += [f'{field} must be a string' for field in LOOKUP_FIELDS
+               if isinstance(row.get(field), (int, float))]
+    if errors:
+        return None, errors
+
+    errors = [f'{field} is required' for field in REQUIRED_FIELDS if _blank(row.get(field))]
+
+    category_id = lookups.category(row)
+    if category_id is None:
+        if _blank(row.get('category_id')) and _blank(row.get('category_code')):
+            errors.append('category_id or category_code is required')
+        else:
+            errors.append('Vehicle category not found')
+
+    location_id = lookups.location(row)
+    if location_id is None and not (_blank(row.get('current_location_id')) and _blank(row.get('location_code'))):
+        errors.append('Location not found')
+
+    values = {
+        'vehicle_id': str(uuid.uuid4()),
+        'vehicle_number': _clean(row.get('vehicle_number')),
+        'license_plate': _clean(row.get('license_plate')),
+        'vin': _clean(row.get('vin')),
+        'category_id': category_id,
+        'make': _clean(row.get('make')),
+        'model': _clean(row.get('model')),
+        'current_location_id': location_id,
+        'status': _clean(row.get('status')) or 'available',
+        'is_active': True,
+        'created_at': now,
+        'updated_at': now
+    }
+
+    for field in TEXT_FIELDS:
+        values[field] = None if _blank(row.get(field)) else _clean(row[field])
+    for field in INTEGER_FIELDS:
+        value = row.get(field)
+        try:
+            values[field] = None if _blank(value) else int(value)
+        except (TypeError, ValueError):
+            errors.append(f'{field} must be an integer')
+    if values['current_mileage'] is None:
+        values['current_mileage'] = 0
+    for field in DECIMAL_FIELDS:
+        value = row.get(field)
+        try:
+            values[field] = None if _blank(value) else Decimal(str(value))
+        except InvalidOperation:
+            errors.append(f'{field} must be a number')
+    for field in DATE_FIELDS:
+        value = row.get(field)
+        try:
+            values[field] = None if _blank(value) else datetime.strptime(_clean(value), '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            errors.append(f'{field} must be a date (YYYY-MM-DD)')
+
+    if errors:
+        return None, errors
+    return values, None
+
+
+def _existing_values(chunk):
+    """Unique values of the chunk already taken, with one query"""
+    wanted = {field: [values[field] for values in chunk] for field in UNIQUE_FIELDS}
+    columns = [getattr(Vehicle, field) for field in UNIQUE_FIELDS]
+    query = select(*columns).where(or_(*(column.in_(wanted[column.key]) for column in columns)))
+    taken = {field: set() for field in UNIQUE_FIELDS}
+    for row in db.session.execute(query):
+        for field, value in zip(UNIQUE_FIELDS, row):
+            taken[field].add(value)
+    return taken
+
+
+def _insert_chunk(chunk, result, save):
+    """Insert validated rows in one transaction; rows that fail are reported individually.
+
+    save(next_row, imported) runs inside each transaction before it commits.
+    """
+    table = Vehicle.__table__
+    lock = writer_lock_for(current_app)
+    try:
+        with lock:
+            db.session.execute(table.insert(), [values for _, values in chunk])
+            save(chunk[-1][0] + 1, result['imported'] + len(chunk))
+            db.session.commit()
+        result['imported'] += len(chunk)
+        return
+    except IntegrityError:
+        # Another writer took a value since the uniqueness check; retry row by row
+        db.session.rollback()
+
+    for index, values in chunk:
+        try:
+            with lock:
+                db.session.execute(table.insert(), values)
+                save(index + 1, result['imported'] + 1)
+                db.session.commit()
+            result['imported'] += 1
+        except IntegrityError as e:
+            db.session.rollback()
+            result['errors'].append({'row': index, 'errors': [f'Integrity error: {e.orig}']})
+
+
+def import_vehicles(rows, chunk_size=None, on_progress=None, resume=None, on_commit=None):
+    """Validate and insert vehicles in chunked transactions.
+
+    Returns a summary with the number of rows imported and, for each row
+    that was rejected, its zero-based index and the reasons. Valid rows are
+    imported even when others in the same batch fail. on_progress is called
+    with the number of rows processed after each chunk.
+
+    on_commit(state) is called inside every insert transaction before it
+    commits; passing a state back as resume continues the import after the
+    rows it covers, with their results, instead of inserting them again.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    lookups = _Lookups()
+    now = datetime.utcnow()
+    next_row = resume['next_row'] if resume else 0
+    result = {'total': len(rows), 'imported': resume['imported'] if resume else 0,
+              'errors': list(resume['errors']) if resume else []}
+    seen = {field: set() for field in UNIQUE_FIELDS}
+
+    def save(committed_to, imported):
+        if on_commit:
+            on_commit({'next_row': committed_to, 'imported': imported,
+                       'errors': [error for error in result['errors'] if error['row'] < committed_to]})
+
+    for start in range(0, len(rows), chunk_size):
+        valid = []
+        for index, row in enumerate(rows[start:start + chunk_size], start):
+            values, errors = _validate(row, lookups, now)
+            done = index < next_row
+            if errors:
+                if not done:
+                    result['errors'].append({'row': index, 'errors': errors})
+                continue
+            duplicates = [field for field in UNIQUE_FIELDS if values[field] in seen[field]]
+            if duplicates:
+                if not done:
+                    result['errors'].append({'row': index, 'errors': [
+                        f'Duplicate {field} in import: {values[field]}' for field in duplicates
+                    ]})
+                continue
+            for field in UNIQUE_FIELDS:
+                seen[field].add(values[field])
+            # Rows of an earlier attempt only count towards the duplicates
+            if not done:
+                valid.append((index, values))
+
+        if valid:
+            taken = _existing_values([values for _, values in valid])
+            chunk = []
+            for index, values in valid:
+                conflicts = [field for field in UNIQUE_FIELDS if values[field] in taken[field]]
+                if conflicts:
+                    result['errors'].append({'row': index, 'errors': [
+                        f'{field} already exists: {values[field]}' for field in conflicts
+                    ]})
+                else:
+                    chunk.append((index, values))
+            if chunk:
+                _insert_chunk(chunk, result, save)
+        if on_progress:
+            on_progress(min(start + chunk_size, len(rows)))
+
+    result['failed'] = len(result['errors'])
+    result['errors'].sort(key=lambda error: error['row'])
+    return result
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Load test for proxy_server.py against the proxy it replaced.
+
+Starts a stub backend (JSON responses after a short delay, POST bodies
+echoed back as a digest), then for each proxy runs client threads that mix
+GET /, GET /api/... and POST /api/... with Accept-Encoding: gzip, and prints
+requests per second, p95 latency and bytes received. The previous proxy is
+taken from the repository's first commit of proxy_server.py, pointed at the
+stub backend and a copy of the frontend page.
+
+It also checks, against the new proxy, that bodies arrive intact (gzipped
+or not, request bodies streamed through), that the page is rewritten and
+picked up again after it changes on disk, and that backend connections are
+reused.
+
+Usage: python3 proxy_load_test.py [--clients N] [--seconds S] [--backend-delay MS]
+"""
+import argparse
+import gzip
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAGE_SOURCE = os.path.join(HERE, 'fresh_erp.html')
+OLD_BACKEND = 'http://198.91.25.229'
+OLD_PAGE = '/home/ubuntu/fresh_erp.html'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f'nothing listening on port {port}')
+
+
+def serve_backend(port, delay):
+    """Stub API: GET returns a vehicle list, POST returns the body's digest"""
+    vehicles = json.dumps({'vehicles': [
+        {'vehicle_id': f'vehicle-{i}', 'make': 'Toyota', 'model': 'Corolla', 'year': 2024,
+         'license_plate': f'ABC{i:04d}', 'status': 'available', 'daily_rate': 49.0 + i % 7}
+        for i in range(150)]}).encode()
+    connections = [0]
+
+    class Backend(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            connections[0] += 1
+
+        def reply(self, body):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(delay)
+            if self.path == '/api/connections':
+                self.reply(json.dumps({'connections': connections[0]}).encode())
+            else:
+                self.reply(vehicles)
+
+        def do_POST(self):
+            digest = hashlib.sha256()
+            length = int(self.headers.get('Content-Length') or 0)
+            while length:
+                chunk = self.rfile.read(min(length, 65536))
+                digest.update(chunk)
+                length -= len(chunk)
+            time.sleep(delay)
+            self.reply(json.dumps({'sha256': digest.hexdigest()}).encode())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Backend)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def start(args, env=None, cwd=None):
+    return subprocess.Popen([sys.executable] + args, cwd=cwd, env={**os.environ, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def old_proxy_source(backend_url, page_path, port):
+    rev = subprocess.run(['git', 'log', '--format=%H', '--diff-filter=A', '--', 'proxy_server.py'],
+                         cwd=HERE, capture_output=True, text=True, check=True).stdout.split()[-1]
+    source = subprocess.run(['git', 'show', f'{rev}:proxy_server.py'], cwd=HERE,
+                            capture_output=True, text=True, check=True).stdout
+    for old, new in ((f'"{OLD_BACKEND}', f'"{backend_url}'), (OLD_PAGE, page_path),
+                     ('PORT = 8082', f'PORT = {port}'), ("'0.0.0.0'", "'127.0.0.1'")):
+        if old not in source:
+            raise SystemExit(f'previous proxy at {rev[:8]} has no {old!r} to point elsewhere')
+        source = source.replace(old, new)
+    return source
+
+
+class Client:
+    """One keep-alive connection, reopened when the server closes it"""
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, decoded body, bytes on the wire)"""
+        headers = {'Accept-Encoding': 'gzip', **(headers or {})}
+        for attempt in (0, 1):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                raw = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        body = gzip.decompress(raw) if response.getheader('Content-Encoding') == 'gzip' else raw
+        return response.status, dict(response.getheaders()), body, len(raw)
+
+
+def load(port, clients, seconds):
+    """(requests/s, p95 seconds, bytes received, errors)"""
+    post_body = json.dumps({'notes': 'x' * 4000}).encode()
+    mix = [('GET', '/api/vehicles', None), ('GET', '/api/vehicles', None), ('GET', '/', None),
+           ('POST', '/api/reservations', post_body)]
+    latencies, received, errors = [], [0], []
+    deadline = time.monotonic() + seconds
+
+    def run(n):
+        client = Client(port)
+        i = n
+        while time.monotonic() < deadline:
+            method, path, body = mix[i % len(mix)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                status, _, _, size = client.request(method, path, body,
+                                                    {'Content-Type': 'application/json'} if body else None)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+            received[0] += size
+            if status != 200:
+                errors.append(status)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    return len(latencies) / elapsed, p95, received[0], errors
+
+
+def check(label, ok, failures):
+    failures.append(not ok)
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--backend-delay', type=float, default=5, help='milliseconds per backend request')
+    parser.add_argument('--serve-backend', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_backend:
+        serve_backend(args.serve_backend, args.backend_delay / 1000)
+        return
+
+    workdir = tempfile.mkdtemp()
+    page = os.path.join(workdir, 'fresh_erp.html')
+    with open(PAGE_SOURCE, encoding='utf-8') as f:
+        content = f.read()
+    with open(page, 'w', encoding='utf-8') as f:
+        # The page the proxies were written for points at the old backend address
+        f.write(f"<script>const API_BASE = '{OLD_BACKEND}';</script>\n" + content)
+
+    backend_port, old_port, new_port = free_port(), free_port(), free_port()
+    backend_url = f'http://127.0.0.1:{backend_port}'
+    old_script = os.path.join(workdir, 'old_proxy_server.py')
+    with open(old_script, 'w') as f:
+        f.write(old_proxy_source(backend_url, page, old_port))
+
+    processes = [
+        start([__file__, '--serve-backend', str(backend_port), '--backend-delay', str(args.backend_delay)]),
+        start([old_script], cwd=workdir),
+        start([os.path.join(HERE, 'proxy_server.py')], cwd=workdir, env={
+            'PROXY_PORT': str(new_port), 'PROXY_BACKEND_URL': backend_url, 'PROXY_FRONTEND_HTML': page}),
+    ]
+    failures = []
+    try:
+        for port in (backend_port, old_port, new_port):
+            wait_for_port(port)
+
+        client = Client(new_port)
+        direct = Client(backend_port)
+        expected = direct.request('GET', '/api/vehicles')[2]
+        status, headers, body, size = client.request('GET', '/api/vehicles')
+        check(f'API body intact through gzip: {len(body)} bytes sent as {size}',
+              status == 200 and body == expected and headers.get('Content-Encoding') == 'gzip', failures)
+        _, _, plain, _ = client.request('GET', '/api/vehicles', headers={'Accept-Encoding': 'identity'})
+        check('API body intact without gzip', plain == expected, failures)
+
+        upload = os.urandom(3 * 1024 * 1024)
+        _, _, body, _ = client.request('POST', '/api/upload', upload)
+        check('3MB request body streamed through',
+              json.loads(body)['sha256'] == hashlib.sha256(upload).hexdigest(), failures)
+
+        _, headers, body, size = client.request('GET', '/')
+        check(f'page rewritten and gzipped ({len(body)} bytes sent as {size})',
+              b'window.location.origin' in body and OLD_BACKEND.encode() not in body
+              and headers.get('Content-Encoding') == 'gzip', failures)
+        with open(page, 'a', encoding='utf-8') as f:
+            f.write('<!-- changed -->\n')
+        _, _, body, _ = client.request('GET', '/')
+        check('page picked up again after it changed on disk', body.endswith(b'<!-- changed -->\n'), failures)
+
+        before = json.loads(direct.request('GET', '/api/connections')[2])['connections']
+        for _ in range(50):
+            client.request('GET', '/api/vehicles')
+        after = json.loads(direct.request('GET', '/api/connections')[2])['connections']
+        check(f'backend connections reused: {after - before} opened for 50 requests',
+              after - before <= 1, failures)
+
+        results = {}
+        for label, port in (('previous proxy', old_port), ('proxy_server.py', new_port)):
+            rate, p95, received, errors = load(port, args.clients, args.seconds)
+            results[label] = rate
+            print(f'{label:16s} {rate:8.1f} req/s, p95 {p95 * 1000:7.1f}ms, '
+                  f'{received / 1024 / 1024:7.1f}MB received, {len(errors)} errors {errors[:3]}')
+            if label == 'proxy_server.py':
+                failures.append(bool(errors))
+        speedup = results['proxy_server.py'] / results['previous proxy']
+        check(f'{speedup:.1f}x the previous proxy with {args.clients} clients', speedup > 1, failures)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+    sys.exit(1 if any(failures) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,130 +1,436 @@
 #!/usr/bin/env python3
+"""Development proxy for the ERP frontend.
+
+Serves the frontend page with its API_BASE pointed at this proxy, other
+files from the current directory, and forwards /api/* to the backend.
+
+- One thread per client connection; clients may keep their connection alive.
+- Backend connections are kept alive and reused from a small pool.
+- Request and response bodies are streamed in chunks, never held whole.
+- The rewritten page is cached in memory until the file's mtime or size changes.
+- Text and JSON responses are gzipped for clients that accept it.
+- Files with a content hash in their name are cached by browsers for good,
+  the page and other files briefly; /api responses keep the backend's policy.
+
+Every setting can be overridden from the environment:
+
+    PROXY_PORT=8082 PROXY_BACKEND_URL=http://198.91.25.229 python3 proxy_server.py
+"""
+import gzip
+import hashlib
+import http.client
 import http.server
-import socketserver
-import urllib.request
-import urllib.parse
 import json
 import os
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+
+PORT = int(os.environ.get('PROXY_PORT', 8082))
+BACKEND_URL = os.environ.get('PROXY_BACKEND_URL', 'http://198.91.25.229')
+FRONTEND_HTML = os.environ.get('PROXY_FRONTEND_HTML', '/home/ubuntu/fresh_erp.html')
+# Directory for everything that is not the page or /api; defaults to the working directory
+STATIC_DIR = os.environ.get('PROXY_STATIC_DIR') or None
+# Idle keep-alive connections kept per backend
+BACKEND_POOL_SIZE = int(os.environ.get('PROXY_BACKEND_POOL_SIZE', 16))
+BACKEND_TIMEOUT = float(os.environ.get('PROXY_BACKEND_TIMEOUT', 30))
+# Drop idle backend connections before the backend does (gunicorn keepalive is 5s)
+BACKEND_IDLE_TIMEOUT = float(os.environ.get('PROXY_BACKEND_IDLE_TIMEOUT', 4))
+CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))
+GZIP_LEVEL = int(os.environ.get('PROXY_GZIP_LEVEL', 6))
+# Smaller bodies are sent as they are; gzip would barely shrink them
+GZIP_MIN_SIZE = int(os.environ.get('PROXY_GZIP_MIN_SIZE', 1024))
+# Seconds browsers may reuse the page, and other files without a content hash, before revalidating
+PAGE_MAX_AGE = int(os.environ.get('PROXY_PAGE_MAX_AGE', 60))
+STATIC_MAX_AGE = int(os.environ.get('PROXY_STATIC_MAX_AGE', 3600))
+
+# The page's hard-coded backend is replaced so the browser calls this proxy
+API_BASE_ORIGINAL = "const API_BASE = 'http://198.91.25.229';"
+API_BASE_REWRITTEN = "const API_BASE = window.location.origin;"
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, PATCH, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+}
+# Headers that describe one connection and must not be forwarded (RFC 9110 7.6.1)
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailer', 'transfer-encoding', 'upgrade'}
+# Bundles named name-<hash>.ext (as Vite writes them) never change under that name
+FINGERPRINTED = re.compile(r'[.-](?=[\w-]*[0-9A-Z])[\w-]{8,}\.\w+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip (q=0 refuses it)"""
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            name, _, q = params.strip().partition('=')
+            try:
+                return name.strip() != 'q' or float(q) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def compressible(content_type):
+    return (content_type or '').split(';')[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class BackendPool:
+    """Keep-alive HTTP connections to one backend, reused last in, first out.
+
+    At most max_idle connections are kept; more are opened when requests
+    need them and closed when they are handed back to a full pool.
+    """
+
+    def __init__(self, url, max_idle=BACKEND_POOL_SIZE, timeout=BACKEND_TIMEOUT,
+                 idle_timeout=BACKEND_IDLE_TIMEOUT):
+        parsed = urllib.parse.urlsplit(url)
+        self.connection_class = (http.client.HTTPSConnection if parsed.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip('/')
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self):
+        """(connection, reused)"""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, idle_since = self._idle.pop()
+                if now - idle_since < self.idle_timeout:
+                    return connection, True
+                connection.close()
+            self.opened += 1
+        return self.connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def release(self, connection, reusable=True):
+        if reusable:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((connection, time.monotonic()))
+                    return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            connection.close()
+
+
+class RewrittenPage:
+    """The frontend page with API_BASE rewritten, its gzipped form and ETag.
+
+    Each request costs one stat() of the file; it is read and rewritten
+    again only when its mtime or size has changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._body = self._gzipped = self._etag = None
+        self.last_modified = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(body, gzipped body, etag); raises OSError when the file is missing"""
+        stat = os.stat(self.path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    with open(self.path, 'rb') as f:
+                        content = f.read().decode('utf-8')
+                    body = content.replace(API_BASE_ORIGINAL, API_BASE_REWRITTEN).encode('utf-8')
+                    self._body, self._gzipped = body, gzip.compress(body, GZIP_LEVEL, mtime=0)
+                    self._etag = hashlib.sha1(body).hexdigest()
+                    self.last_modified = stat.st_mtime
+                    self._key = key
+        return self._body, self._gzipped, self._etag
+
+
+backend_pool = BackendPool(BACKEND_URL)
+frontend_page = RewrittenPage(FRONTEND_HTML)
+
 
 class ProxyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # Keep client connections open between requests
+    protocol_version = 'HTTP/1.1'
+    # Cache-Control for a file about to be sent by SimpleHTTPRequestHandler
+    static_cache_control = None
+    status = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=STATIC_DIR, **kwargs)
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
     def end_headers(self):
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        if self.static_cache_control and self.status in (200, 304):
+            self.send_header('Cache-Control', self.static_cache_control)
+        self.static_cache_control = None
         super().end_headers()
-    
+
     def do_GET(self):
         if self.path == '/' or self.path == '/index.html':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            with open('/home/ubuntu/fresh_erp.html', 'rb') as f:
-                content = f.read().decode('utf-8')
-                # Update API_BASE to use the same origin (proxy)
-                content = content.replace("const API_BASE = 'http://198.91.25.229';", "const API_BASE = window.location.origin;")
-                self.wfile.write(content.encode('utf-8'))
+            self.serve_page()
         elif self.path.startswith('/api/'):
-            # Proxy API requests to the backend
             self.proxy_api_request()
         else:
-            super().do_GET()
-    
-    def do_POST(self):
+            self.serve_static(super().do_GET)
+
+    def do_HEAD(self):
         if self.path.startswith('/api/'):
             self.proxy_api_request()
         else:
-            super().do_POST()
-    
+            self.serve_static(super().do_HEAD)
+
+    def serve_static(self, send):
+        # SimpleHTTPRequestHandler sends Last-Modified and answers If-Modified-Since
+        path = urllib.parse.urlsplit(self.path).path
+        self.static_cache_control = ('public, max-age=31536000, immutable' if FINGERPRINTED.search(path)
+                                     else f'public, max-age={STATIC_MAX_AGE}')
+        send()
+
+    def do_POST(self):
+        self.proxy_or_refuse()
+
     def do_PUT(self):
-        if self.path.startswith('/api/'):
-            self.proxy_api_request()
-        else:
-            super().do_PUT()
-    
+        self.proxy_or_refuse()
+
+    def do_PATCH(self):
+        self.proxy_or_refuse()
+
     def do_DELETE(self):
-        if self.path.startswith('/api/'):
-            self.proxy_api_request()
-        else:
-            super().do_DELETE()
-    
+        self.proxy_or_refuse()
+
     def do_OPTIONS(self):
         if self.path.startswith('/api/'):
             self.send_response(200)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            for header, value in CORS_HEADERS.items():
+                self.send_header(header, value)
+            self.send_header('Content-Length', '0')
             self.end_headers()
         else:
-            super().do_OPTIONS()
-    
-    def proxy_api_request(self):
+            self.refuse()
+
+    def proxy_or_refuse(self):
+        if self.path.startswith('/api/'):
+            self.proxy_api_request()
+        else:
+            self.refuse()
+
+    def refuse(self):
+        # The request body was not read, so the connection can't be reused
+        self.close_connection = True
+        self.send_error(405)
+
+    def wants_gzip(self):
+        return accepts_gzip(self.headers.get('Accept-Encoding'))
+
+    def serve_page(self):
         try:
-            # Backend server URL
-            backend_url = f"http://198.91.25.229{self.path}"
-            
-            # Get request body if present
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length) if content_length > 0 else None
-            
-            # Create request
-            req = urllib.request.Request(backend_url, data=request_body, method=self.command)
-            
-            # Copy headers (except Host)
-            for header, value in self.headers.items():
-                if header.lower() not in ['host', 'content-length']:
-                    req.add_header(header, value)
-            
-            # Make request to backend
-            with urllib.request.urlopen(req) as response:
-                # Send response status
-                self.send_response(response.status)
-                
-                # Copy response headers
-                for header, value in response.headers.items():
-                    if header.lower() not in ['server', 'date']:
-                        self.send_header(header, value)
-                
-                # Add CORS headers
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-                
-                self.end_headers()
-                
-                # Send response body
-                self.wfile.write(response.read())
-                
-        except urllib.error.HTTPError as e:
-            # Handle HTTP errors
-            self.send_response(e.code)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
+            body, gzipped, etag = frontend_page.get()
+        except OSError:
+            self.send_error(404, 'Frontend page not found')
+            return
+        use_gzip = self.wants_gzip() and len(body) >= GZIP_MIN_SIZE
+        if use_gzip:
+            body, etag = gzipped, f'{etag}-gzip'
+        etag = f'"{etag}"'
+        if_none_match = self.headers.get('If-None-Match', '')
+        not_modified = etag in [tag.strip() for tag in if_none_match.replace('W/', '').split(',')] \
+            or if_none_match.strip() == '*'
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(frontend_page.last_modified))
+        self.send_header('Cache-Control', f'public, max-age={PAGE_MAX_AGE}, must-revalidate')
+        self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
             self.end_headers()
-            
-            error_response = {
-                'error': f'Backend error: {e.reason}',
-                'status': e.code
-            }
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
-            
+            return
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def request_body(self):
+        """(chunks, chunked): the client's body as an iterator of chunks"""
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            return self.read_chunked(), True
+        length = int(self.headers.get('Content-Length') or 0)
+        return (self.read_length(length) if length > 0 else None), False
+
+    def read_length(self, length):
+        while length > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                raise ConnectionError('Client closed the connection mid-body')
+            length -= len(chunk)
+            yield chunk
+
+    def read_chunked(self):
+        while True:
+            size = int(self.rfile.readline().split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield from self.read_length(size)
+            self.rfile.readline()
+
+    def backend_headers(self, chunked):
+        headers = {}
+        for header, value in self.headers.items():
+            name = header.lower()
+            if name in HOP_BY_HOP or name in ('host', 'content-length'):
+                continue
+            headers[header] = value
+        if chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        elif self.headers.get('Content-Length'):
+            headers['Content-Length'] = self.headers['Content-Length']
+        return headers
+
+    def send_to_backend(self):
+        """Send the request to the backend; (connection, response)"""
+        body, chunked = self.request_body()
+        headers = self.backend_headers(chunked)
+        path = backend_pool.prefix + self.path
+        connection, reused = backend_pool.acquire()
+        try:
+            connection.request(self.command, path, body=body, headers=headers, encode_chunked=chunked)
+            return connection, connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            # A reused connection the backend had already closed; a request
+            # without a body can be sent again on a fresh one
+            if not reused or body is not None:
+                raise
+        except Exception:
+            connection.close()
+            raise
+        connection, _ = backend_pool.acquire()
+        try:
+            connection.request(self.command, path, headers=headers)
+            return connection, connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    def proxy_api_request(self):
+        try:
+            connection, response = self.send_to_backend()
         except Exception as e:
-            # Handle other errors
-            self.send_response(500)
+            # Part of the request body may still be unread
+            self.close_connection = True
+            self.send_response(502)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            error_response = {
+            error_response = json.dumps({
                 'error': f'Proxy error: {str(e)}',
-                'status': 500
-            }
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                'status': 502
+            }).encode('utf-8')
+            self.send_header('Content-Length', str(len(error_response)))
+            self.end_headers()
+            self.wfile.write(error_response)
+            return
 
-if __name__ == "__main__":
-    PORT = 8082
-    Handler = ProxyHTTPRequestHandler
-    
-    with socketserver.TCPServer(('0.0.0.0', PORT), Handler) as httpd:
-        print(f'Proxy server running on port {PORT}')
-        httpd.serve_forever()
+        try:
+            self.relay_response(response)
+        except Exception:
+            # Headers are already out; all we can do is drop both connections
+            self.close_connection = True
+            connection.close()
+        else:
+            backend_pool.release(connection, reusable=not response.will_close)
+
+    def relay_response(self, response):
+        """Copy the backend's status, headers and body to the client, in chunks"""
+        has_body = self.command != 'HEAD' and response.status not in (204, 304)
+        length = response.getheader('Content-Length')
+        use_gzip = (has_body and self.wants_gzip() and not response.getheader('Content-Encoding')
+                    and compressible(response.getheader('Content-Type'))
+                    and (length is None or int(length) >= GZIP_MIN_SIZE))
 
+        self.send_response(response.status)
+        for header, value in response.getheaders():
+            name = header.lower()
+            if name in HOP_BY_HOP or name in ('server', 'date'):
+                continue
+            if use_gzip and name == 'content-length':
+                continue
+            self.send_header(header, value)
+        for header, value in CORS_HEADERS.items():
+            self.send_header(header, value)
+        if not response.getheader('Cache-Control'):
+            # The backend sets its own policy where responses may be reused
+            self.send_header('Cache-Control', 'no-store')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Vary', 'Accept-Encoding')
+
+        # Without a length the body is sent chunked; HTTP/1.0 clients get it until close instead
+        framed = not has_body or (length is not None and not use_gzip)
+        chunked = not framed and self.request_version != 'HTTP/1.0'
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        elif not framed:
+            self.close_connection = True
+        self.end_headers()
+        if not has_body:
+            response.read()
+            return
+
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if use_gzip else None
+        while True:
+            chunk = response.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            if compressor is not None:
+                # Flush per chunk so a slowly streamed body reaches the client as it comes
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.write_chunk(chunk, chunked)
+        # read1() leaves a fully read response open; read() marks it done so the connection can be reused
+        response.read()
+        if compressor is not None:
+            self.write_chunk(compressor.flush(), chunked)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, chunk, chunked):
+        if chunked:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        else:
+            self.wfile.write(chunk)
+
+
+class ProxyServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+if __name__ == "__main__":
+    with ProxyServer(('0.0.0.0', PORT), ProxyHTTPRequestHandler) as httpd:
+        print(f'Proxy server running on port {PORT}, /api/* -> {BACKEND_URL}')
+        try:
+            httpd.serve_forever()
+        finally:
+            backend_pool.close()